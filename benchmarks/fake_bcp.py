@@ -0,0 +1,204 @@
+"""
+Stand-in de bcp queryout sur une base SQLite synthétique (voir synthetic.py).
+
+Même ligne de commande et même sortie que bcp (mode caractère): les compteurs
+"Total received" toutes les 1000 lignes puis "N rows copied.", pour mesurer le
+pipeline autour de bcp (suivi de progression, découpage, compression, COPY)
+sans SQL Server. La base est lue dans BENCH_SQLITE_DB.
+
+Format natif (-n): "format nul -n -x -f" écrit le fichier de format XML de la
+requête et "queryout -f" les valeurs binaires SQL Server correspondantes, pour
+les types des tables synthétiques uniquement (entiers, décimaux, texte en
+NVARCHAR, DATETIME2(7), bit).
+"""
+import os
+import re
+import sqlite3
+import struct
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+PROGRESS_EVERY = 1000
+FETCH_ROWS = 10_000
+
+BCP_FORMAT_NS = "http://schemas.microsoft.com/sqlserver/2004/bulkload/format"
+DATE_EPOCH = date(1, 1, 1)
+
+
+def _to_sqlite(query: str) -> str:
+    """Requête T-SQL générée par BCPExporter → SQLite (NOLOCK, TOP, crochets)"""
+    query = re.sub(r"WITH\s*\(NOLOCK\)", "", query, flags=re.IGNORECASE)
+    limit = ""
+    top = re.search(r"SELECT\s+TOP\s+(\d+)\s+", query, flags=re.IGNORECASE)
+    if top:
+        query = query[:top.start()] + "SELECT " + query[top.end():]
+        limit = f" LIMIT {top.group(1)}"
+    # CAST du SELECT natif (build_parquet_select): types SQL Server inconnus de SQLite
+    query = re.sub(r"CAST\((\[[^\]]+\]) AS \w+(\(\w+\))?\)", r"\1", query, flags=re.IGNORECASE)
+    query = re.sub(r"\[([^\]]+)\]", r'"\1"', query)
+    return query + limit
+
+
+##### FORMAT NATIF
+
+def _native_fields(conn, query: str):
+    """
+    Champs natifs de la requête d'après les types déclarés dans SQLite:
+    liste (nom, type bcp, longueur du préfixe, longueur max, échelle)
+    """
+    table = re.search(r'FROM\s+"?([\w.]+)"?', query, flags=re.IGNORECASE).group(1)
+    declared = {name: sql_type.upper() for _, name, sql_type, *_ in conn.execute(f'PRAGMA table_info("{table}")')}
+    cursor = conn.execute(f"SELECT * FROM ({query}) LIMIT 0")
+    aliases = re.findall(r'"([^"]+)" AS "([^"]+)"', query)
+    sources = {alias: name for name, alias in aliases}
+
+    fields = []
+    for (alias, *_) in cursor.description:
+        sql_type = declared[sources.get(alias, alias)]
+        decimal_type = re.match(r"DECIMAL\((\d+),(\d+)\)", sql_type)
+        if decimal_type:
+            fields.append((alias, "SQLDECIMAL", 1, 19, int(decimal_type.group(2))))
+        elif sql_type.startswith("VARCHAR"):
+            fields.append((alias, "SQLNCHAR", 2, 8000, 0))
+        elif sql_type == "DATETIME":
+            fields.append((alias, "SQLDATETIME2", 1, 8, 7))
+        elif sql_type == "BOOLEAN":
+            fields.append((alias, "SQLBIT", 1, 1, 0))
+        else:
+            fields.append((alias, "SQLBIGINT", 1, 8, 0))
+    return fields
+
+
+def _write_format_file(path: str, fields):
+    """Fichier de format XML comme bcp format nul -n -x"""
+    record = "".join(
+        f'  <FIELD ID="{i}" xsi:type="{"NativePrefix" if sql_type == "SQLNCHAR" else "NativeFixed"}" '
+        f'PREFIX_LENGTH="{prefix}" {"MAX_LENGTH" if sql_type == "SQLNCHAR" else "LENGTH"}="{length}"/>\n'
+        for i, (_, sql_type, prefix, length, _) in enumerate(fields, start=1)
+    )
+    row = "".join(
+        f'  <COLUMN SOURCE="{i}" NAME="{name}" xsi:type="{sql_type}" SCALE="{scale}"/>\n'
+        for i, (name, sql_type, _, _, scale) in enumerate(fields, start=1)
+    )
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(
+            '<?xml version="1.0"?>\n'
+            f'<BCPFORMAT xmlns="{BCP_FORMAT_NS}" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">\n'
+            f" <RECORD>\n{record} </RECORD>\n <ROW>\n{row} </ROW>\n</BCPFORMAT>\n"
+        )
+
+
+def _read_format_file(path: str):
+    """Relit le fichier de format écrit par _write_format_file"""
+    text = open(path, encoding="utf-8").read()
+    prefixes = re.findall(r'<FIELD ID="\d+" xsi:type="\w+" PREFIX_LENGTH="(\d+)"', text)
+    columns = re.findall(r'<COLUMN SOURCE="\d+" NAME="[^"]+" xsi:type="(\w+)" SCALE="(\d+)"', text)
+    return [(sql_type, int(prefix), int(scale)) for prefix, (sql_type, scale) in zip(prefixes, columns)]
+
+
+def _encode_native(value, sql_type: str, prefix: int, scale: int) -> bytes:
+    """Valeur SQLite → préfixe de longueur + représentation binaire SQL Server"""
+    if value is None:
+        return b"\xff" * prefix
+    if sql_type == "SQLNCHAR":
+        data = str(value).encode("utf-16-le")
+    elif sql_type == "SQLDECIMAL":
+        mantissa = int(Decimal(str(value)).scaleb(scale).to_integral_value())
+        data = bytes([38, scale, 1 if mantissa >= 0 else 0]) + abs(mantissa).to_bytes(16, "little")
+    elif sql_type == "SQLDATETIME2":
+        moment = datetime.fromisoformat(value)
+        midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        units = (moment - midnight) // timedelta(microseconds=1) * 10
+        days = (moment.date() - DATE_EPOCH).days
+        data = units.to_bytes(5, "little") + days.to_bytes(3, "little")
+    elif sql_type == "SQLBIT":
+        data = b"\x01" if value else b"\x00"
+    else:
+        data = struct.pack("<q", int(value))
+    return len(data).to_bytes(prefix, "little") + data
+
+
+def _option(args, flag, default=None):
+    return args[args.index(flag) + 1] if flag in args else default
+
+
+def main(argv) -> int:
+    if len(argv) >= 2 and argv[1] == "format":
+        return _format(argv)
+    if len(argv) < 3 or argv[1] != "queryout":
+        print("Error = [bench] seuls les modes queryout et format nul sont émulés")
+        return 1
+
+    query, _, output = argv[:3]
+    delimiter = _option(argv, "-t", "\t")
+    terminator = _option(argv, "-r", "\n").replace("\\n", "\n")
+    format_file = _option(argv, "-f")
+
+    print("Starting copy...", flush=True)
+    start = time.time()
+    conn = sqlite3.connect(os.environ["BENCH_SQLITE_DB"])
+    try:
+        cursor = conn.execute(_to_sqlite(query))
+    except sqlite3.Error as e:
+        print(f"Error = [bench] {e}")
+        return 1
+
+    if format_file is not None:
+        fields = _read_format_file(format_file)
+
+        def encode(rows):
+            return b"".join(
+                _encode_native(value, *field)
+                for row in rows
+                for value, field in zip(row, fields)
+            )
+    else:
+        def encode(rows):
+            return "".join(
+                delimiter.join("" if value is None else str(value) for value in row) + terminator
+                for row in rows
+            ).encode("utf-8")
+
+    total = 0
+    next_progress = PROGRESS_EVERY
+    with open(output, "wb") as f:
+        while True:
+            rows = cursor.fetchmany(FETCH_ROWS)
+            if not rows:
+                break
+            f.write(encode(rows))
+            total += len(rows)
+            while next_progress <= total:
+                print(f"{PROGRESS_EVERY} rows successfully bulk-copied to host-file. Total received: {next_progress}")
+                next_progress += PROGRESS_EVERY
+            sys.stdout.flush()
+    conn.close()
+
+    elapsed_ms = max(int((time.time() - start) * 1000), 1)
+    print()
+    print(f"{total} rows copied.")
+    print("Network packet size (bytes): 32767")
+    print(f"Clock Time (ms.) Total     : {elapsed_ms}    Average : ({total * 1000 / elapsed_ms:.2f} rows per sec.)")
+    return 0
+
+
+def _format(argv) -> int:
+    """bcp "<requête>" format nul -n -x -f <fichier>"""
+    if "-n" not in argv or "-x" not in argv:
+        print("Error = [bench] seul le fichier de format XML natif (-n -x) est émulé")
+        return 1
+    conn = sqlite3.connect(os.environ["BENCH_SQLITE_DB"])
+    try:
+        _write_format_file(_option(argv, "-f"), _native_fields(conn, _to_sqlite(argv[0])))
+    except sqlite3.Error as e:
+        print(f"Error = [bench] {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,360 @@
+"""
+Benchmarks de bout en bout des chemins d'extraction, hors ligne.
+
+Source: base SQLite synthétique (synthetic.py) enregistrée à la place de SQL
+Server pour les clés d'engine "default" et "dlt", et fake_bcp.py à la place
+de bcp. Destination: un répertoire de stage (compression du PUT) puis un COPY
+DuckDB à la place de Snowflake.
+
+Chemins mesurés:
+- bcp: export_mssql_bcp (BCPExporter, découpage) → stage .csv.gz → COPY CSV
+- dlt: ressource sql_database pyarrow de dlt_mssql_source → Parquet → COPY Parquet
+- chunked: générateur mssql_sources.extract_from_mssql (chunks à mémoire bornée) → Parquet → COPY Parquet
+- chunked_fixed: même générateur en chunks fixes de 300 000 lignes (chunk_mb=0)
+- chunked_connectorx: même générateur avec le lecteur Arrow connectorx (reader="connectorx",
+  retour au lecteur sqlalchemy si connectorx n'est pas installé)
+- native: BCPExporter.export_native (bcp -n) → décodage Python convert_bcp_native_to_parquet
+  → COPY Parquet; phase "decode" à part. Pas dans EXPORT_FORMATS (config.py): à
+  n'y ajouter que si ce chemin bat "bcp" sur la forme de table visée.
+
+Chaque scénario tourne dans un process neuf: le pic de RSS (getrusage) est
+celui du scénario. Rapport JSON: lignes/s, pic de RSS et durée par phase
+(extract, stage, load).
+
+Usage (depuis la racine du projet, paquet installé):
+    python -m benchmarks.run --rows 1000000,10000000,50000000 --output bench.json
+    python -m benchmarks.run --rows 100000 --tables V_Equipment --paths bcp,chunked
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from pathlib import Path
+
+from benchmarks.synthetic import SNOWFLAKE_TYPES, TABLE_SHAPES, duckdb_columns, generate_table
+
+logger = logging.getLogger("benchmarks")
+
+PATHS = ("bcp", "dlt", "chunked", "chunked_fixed", "chunked_connectorx", "native")
+DEFAULT_ROWS = "1000000,10000000,50000000"
+DEFAULT_DIR = Path(os.getenv("BENCH_DIR", "/tmp/mssql_export/benchmarks"))
+
+
+##### SOURCE ET DESTINATION LOCALES
+
+def _use_sqlite_source(db_path: Path):
+    """Engines "default" et "dlt" du process → base SQLite synthétique, bcp → fake_bcp.py"""
+    # Identifiants factices pour la ligne de commande bcp (lus à l'import de Config)
+    for name in ("MSSQL_DATABASE", "MSSQL_USER", "MSSQL_PASSWORD"):
+        os.environ.setdefault(name, "bench")
+    os.environ["USE_WSL"] = "false"
+
+    from sqlalchemy import create_engine
+    from mssql_data_nmbai.defs.config import mssql_engine_registry
+
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    for config_key in ("default", "dlt"):
+        mssql_engine_registry.register(config_key, engine)
+
+    bin_dir = db_path.parent / "bin"
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    wrapper = bin_dir / "bcp"
+    wrapper.write_text(
+        f'#!/bin/sh\nexec "{sys.executable}" "{Path(__file__).with_name("fake_bcp.py")}" "$@"\n'
+    )
+    wrapper.chmod(0o755)
+    os.environ["PATH"] = f"{bin_dir}{os.pathsep}{os.environ['PATH']}"
+    os.environ["BENCH_SQLITE_DB"] = str(db_path)
+
+
+def _stage_files(files, stage_dir: Path) -> float:
+    """Compression des fichiers comme pour le PUT Snowflake. Returns: taille stagée (MB)"""
+    from mssql_data_nmbai.defs.config import Config
+    from mssql_data_nmbai.defs.snowflake_dest import _compress_file
+
+    stage_dir.mkdir(parents=True, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=Config.PUT_PARALLEL) as executor:
+        staged = list(executor.map(
+            _compress_file,
+            [str(f) for f in files],
+            [str(stage_dir)] * len(files),
+            [Config.PUT_COMPRESSION] * len(files),
+        ))
+    return sum(Path(path).stat().st_size for path, _ in staged) / (1024 * 1024)
+
+
+def _duckdb_copy(sink_path: Path, stage_dir: Path, table_name: str, export_format: str) -> int:
+    """COPY des fichiers stagés dans une table DuckDB. Returns: lignes chargées"""
+    try:
+        import duckdb
+    except ImportError as e:
+        raise RuntimeError("❌ Sink des benchmarks: installer duckdb (pip install duckdb)") from e
+
+    conn = duckdb.connect(str(sink_path))
+    try:
+        if export_format == "parquet":
+            conn.execute(
+                f"CREATE OR REPLACE TABLE \"{table_name}\" AS "
+                f"SELECT * FROM read_parquet('{stage_dir}/*.parquet')"
+            )
+        else:
+            from mssql_data_nmbai.defs.config import Config
+
+            columns = ", ".join(f'"{name}" {sql_type}' for name, sql_type in duckdb_columns(table_name).items())
+            conn.execute(f'CREATE OR REPLACE TABLE "{table_name}" ({columns})')
+            conn.execute(
+                f"COPY \"{table_name}\" FROM '{stage_dir}/*' "
+                f"(FORMAT csv, DELIMITER '{Config.DELIMITER}', HEADER false, NULLSTR '')"
+            )
+        return conn.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0]
+    finally:
+        conn.close()
+
+
+##### CHEMINS D'EXTRACTION
+
+def _stream_to_parquet(chunks, stage_dir: Path, phases: dict):
+    """Écrit les tables Arrow d'un générateur en Parquet, temps d'extraction et d'écriture séparés"""
+    import pyarrow.parquet as pq
+
+    stage_dir.mkdir(parents=True, exist_ok=True)
+    iterator = iter(chunks)
+    index = 0
+    while True:
+        start = time.time()
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            phases["extract"] += time.time() - start
+            break
+        phases["extract"] += time.time() - start
+
+        start = time.time()
+        pq.write_table(chunk, stage_dir / f"part_{index:05d}.parquet")
+        index += 1
+        phases["stage"] += time.time() - start
+
+
+def _registry_spec(table_name: str):
+    from mssql_data_nmbai.defs.tables import TABLES
+
+    return next(spec for spec in TABLES if spec.source == table_name)
+
+
+def _run_bcp(table_name: str, scenario_dir: Path, phases: dict):
+    from mssql_data_nmbai.defs.config import export_mssql_bcp
+
+    export_dir = scenario_dir / "export"
+    start = time.time()
+    export_mssql_bcp(table_name, logger, output_path=export_dir / "mssql_export.csv")
+    phases["extract"] = time.time() - start
+
+    start = time.time()
+    staged_mb = _stage_files(sorted(export_dir.glob("*.csv")), scenario_dir / "stage")
+    phases["stage"] = time.time() - start
+    return "csv", staged_mb
+
+
+def _run_dlt(table_name: str, scenario_dir: Path, phases: dict):
+    from mssql_data_nmbai.defs.dlt_mssql_source import create_dlt_source
+
+    spec = _registry_spec(table_name)
+    resource = create_dlt_source(spec.source)
+    if spec.decimal_hints:
+        resource.apply_hints(columns=spec.dlt_column_hints())
+    _stream_to_parquet(resource, scenario_dir / "stage", phases)
+    return "parquet", None
+
+
+def _run_chunked(table_name: str, scenario_dir: Path, phases: dict):
+    from mssql_data_nmbai.defs.mssql_sources import extract_from_mssql
+
+    _stream_to_parquet(extract_from_mssql(table_name), scenario_dir / "stage", phases)
+    return "parquet", None
+
+
+def _run_chunked_fixed(table_name: str, scenario_dir: Path, phases: dict):
+    from mssql_data_nmbai.defs.mssql_sources import extract_from_mssql
+
+    _stream_to_parquet(extract_from_mssql(table_name, chunk_mb=0), scenario_dir / "stage", phases)
+    return "parquet", None
+
+
+def _run_chunked_connectorx(table_name: str, scenario_dir: Path, phases: dict):
+    from mssql_data_nmbai.defs.mssql_sources import extract_from_mssql
+
+    _stream_to_parquet(extract_from_mssql(table_name, reader="connectorx"), scenario_dir / "stage", phases)
+    return "parquet", None
+
+
+def _run_native(table_name: str, scenario_dir: Path, phases: dict):
+    import pyarrow as pa
+    from mssql_data_nmbai.defs.config import BCPExporter, Config
+    from mssql_data_nmbai.defs.parquet_export import (
+        build_parquet_select,
+        convert_bcp_native_to_parquet,
+        map_snowflake_to_arrow,
+    )
+
+    # Types Snowflake des colonnes synthétiques (extract_mssql_table_schema lit INFORMATION_SCHEMA)
+    columns = [(name, SNOWFLAKE_TYPES[kind]) for name, kind in TABLE_SHAPES[table_name]]
+    schema = pa.schema([pa.field(name, map_snowflake_to_arrow(sql_type)) for name, sql_type in columns])
+    exporter = BCPExporter(
+        server=Config.MSSQL_SERVER,
+        database=Config.MSSQL_DATABASE,
+        username=Config.MSSQL_USER,
+        password=Config.MSSQL_PASSWORD,
+        use_wsl=False,
+        trust_server_certificate=True,
+    )
+
+    data_path = scenario_dir / "export" / "mssql_export.dat"
+    start = time.time()
+    _, _, _, format_path = exporter.export_native(
+        table_name, data_path, build_parquet_select(table_name, columns, native=True)
+    )
+    phases["extract"] = time.time() - start
+
+    start = time.time()
+    stage_dir = scenario_dir / "stage"
+    stage_dir.mkdir(parents=True, exist_ok=True)
+    convert_bcp_native_to_parquet(data_path, format_path, schema, stage_dir / "mssql_export.parquet")
+    phases["decode"] = time.time() - start
+    return "parquet", None
+
+
+RUNNERS = {
+    "bcp": _run_bcp,
+    "dlt": _run_dlt,
+    "chunked": _run_chunked,
+    "chunked_fixed": _run_chunked_fixed,
+    "chunked_connectorx": _run_chunked_connectorx,
+    "native": _run_native,
+}
+
+
+def run_scenario(path: str, table_name: str, rows: int, db_path: str, scenario_dir: str, log_level: str) -> dict:
+    """Un chemin d'extraction sur une table synthétique (exécuté dans un process neuf)"""
+    logging.basicConfig(level=log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    scenario_dir = Path(scenario_dir)
+    phases = {"extract": 0.0, "stage": 0.0, "load": 0.0}
+    result = {"path": path, "table": table_name, "rows": rows, "status": "ok", "error": None}
+
+    try:
+        _use_sqlite_source(Path(db_path))
+        export_format, staged_mb = RUNNERS[path](table_name, scenario_dir, phases)
+        stage_dir = scenario_dir / "stage"
+        if staged_mb is None:
+            staged_mb = sum(f.stat().st_size for f in stage_dir.iterdir()) / (1024 * 1024)
+
+        start = time.time()
+        rows_loaded = _duckdb_copy(scenario_dir / "sink.duckdb", stage_dir, table_name, export_format)
+        phases["load"] = time.time() - start
+
+        total = sum(phases.values())
+        result.update({
+            "rows_loaded": rows_loaded,
+            "rows_per_sec": rows_loaded / total if total else 0.0,
+            "extract_rows_per_sec": rows_loaded / phases["extract"] if phases["extract"] else 0.0,
+            "total_seconds": total,
+            "staged_mb": staged_mb,
+        })
+        if rows_loaded != rows:
+            result["status"] = "mismatch"
+    except Exception as e:
+        logger.error(f"❌ Scénario {path} / {table_name} ({rows:,} lignes) en échec: {e}")
+        result["status"] = "error"
+        result["error"] = "".join(traceback.format_exception_only(type(e), e)).strip()
+
+    result["phases"] = phases
+    # ru_maxrss en KB sous Linux; les fils (fake bcp, compression) sont comptés à part
+    result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    result["peak_rss_children_mb"] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return result
+
+
+##### CLI
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks des chemins d'extraction MSSQL → Snowflake (stand-ins locaux)")
+    parser.add_argument("--rows", default=DEFAULT_ROWS, help=f"Tailles de table, séparées par des virgules ({DEFAULT_ROWS})")
+    parser.add_argument("--tables", default=",".join(TABLE_SHAPES), help="Tables synthétiques")
+    parser.add_argument("--paths", default=",".join(PATHS), help="Chemins d'extraction")
+    parser.add_argument("--workdir", type=Path, default=DEFAULT_DIR, help="Bases synthétiques et fichiers des scénarios")
+    parser.add_argument("--output", type=Path, help="Rapport JSON (stdout par défaut)")
+    parser.add_argument("--keep", action="store_true", help="Conserver exports, stage et sink DuckDB")
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    sizes = [int(value) for value in args.rows.split(",")]
+    tables = args.tables.split(",")
+    paths = args.paths.split(",")
+    unknown = [name for name in tables if name not in TABLE_SHAPES] + [p for p in paths if p not in PATHS]
+    if unknown:
+        raise SystemExit(f"❌ Tables / chemins inconnus: {', '.join(unknown)}")
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "host": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "sources": [],
+        "results": [],
+    }
+
+    for table_name in tables:
+        for rows in sizes:
+            db_path = args.workdir / "sources" / f"{table_name}_{rows}.sqlite"
+            report["sources"].append({
+                "table": table_name,
+                "rows": rows,
+                "columns": len(TABLE_SHAPES[table_name]),
+                "generate_seconds": generate_table(db_path, table_name, rows, logger),
+                "size_mb": db_path.stat().st_size / (1024 * 1024),
+            })
+
+            for path in paths:
+                scenario_dir = args.workdir / "runs" / f"{table_name}_{rows}_{path}"
+                shutil.rmtree(scenario_dir, ignore_errors=True)
+                logger.info(f"⏱️  {path} / {table_name} / {rows:,} lignes")
+                # Process neuf par scénario: pic de RSS et engines propres au scénario
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                    result = executor.submit(
+                        run_scenario, path, table_name, rows, str(db_path), str(scenario_dir), args.log_level
+                    ).result()
+                report["results"].append(result)
+                print(
+                    f"{path:>8} {table_name:<24} {rows:>11,} lignes: {result['status']:<8} "
+                    f"{result.get('rows_per_sec', 0):>12,.0f} rows/s  pic RSS {result['peak_rss_mb']:,.0f} MB",
+                    file=sys.stderr,
+                )
+                if not args.keep:
+                    shutil.rmtree(scenario_dir, ignore_errors=True)
+
+    report["finished_at"] = datetime.now(timezone.utc).isoformat()
+    output = json.dumps(report, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(output)
+    else:
+        print(output)
+    return 0 if all(r["status"] == "ok" for r in report["results"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
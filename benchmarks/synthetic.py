@@ -0,0 +1,163 @@
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+
+##### TABLES SYNTHÉTIQUES
+# Formes proches des vues SQL Server: V_Equipment (~150 colonnes mixtes) et
+# V_Inventory_Parts_Ops. Les valeurs sont générées en SQL (CTE récursive) dans
+# une base SQLite: 50M lignes sans passer par Python.
+
+# Types de colonnes: (type SQLite / SQLAlchemy, type DuckDB du sink)
+COLUMN_KINDS = {
+    "int": ("INTEGER", "BIGINT"),
+    "decimal": ("DECIMAL(38,6)", "DECIMAL(38,6)"),
+    "decimal0": ("DECIMAL(38,0)", "DECIMAL(38,0)"),
+    "text": ("VARCHAR(100)", "VARCHAR"),
+    "date": ("DATETIME", "TIMESTAMP"),
+    "bit": ("BOOLEAN", "BOOLEAN"),
+}
+
+# Types Snowflake équivalents (sortie de extract_mssql_table_schema), pour le chemin bcp natif
+SNOWFLAKE_TYPES = {
+    "int": "NUMBER(38,0)",
+    "decimal": "NUMBER(38,6)",
+    "decimal0": "NUMBER(38,0)",
+    "text": "VARCHAR(100)",
+    "date": "TIMESTAMP_NTZ",
+    "bit": "BOOLEAN",
+}
+
+_EQUIPMENT_NAMED = [
+    ("Equipment_Id", "int"),
+    ("Serial_Number", "text"),
+    ("Model", "text"),
+    ("Customer_Name", "text"),
+    ("Delivery_Date", "date"),
+    ("Eqcat_Part_Sales_Previous_12m", "decimal"),
+    ("Eqcat_Labor_Sales_Previous_12m", "decimal"),
+    ("Eqcat_Total_Sales_Previous_12m", "decimal"),
+    ("Eqcat_Part_Opportunity_Previous_12m", "decimal"),
+    ("Eqcat_Labor_Opportunity_Previous_12m", "decimal"),
+    ("Eqcat_Total_Opportunity_Previous_12m", "decimal"),
+    ("Eqcat_Part_Opportunity_Future_12m", "decimal"),
+    ("Eqcat_Labor_Opportunity_Future_12m", "decimal"),
+    ("Eqcat_Total_Opportunity_Future_12m", "decimal"),
+    ("Eqcat_Boost_Previous_12m", "decimal"),
+    ("Eqcat_Base_Previous_12_m", "decimal"),
+    ("Eqcat_Base_Future_12_m", "decimal"),
+    ("Op_Cat_Labor_Hours", "decimal0"),
+    ("Op_Cat_Labor_Value", "decimal0"),
+    ("Op_Cat_Base", "decimal0"),
+    ("Op_Cat_Total_Value", "decimal0"),
+    ("Op_Cat_Confidence_Index_pctg", "decimal0"),
+]
+
+# Colonnes génériques: répartition proche de V_Equipment (surtout texte et montants)
+_EQUIPMENT_FILL = ["text", "text", "decimal", "int", "text", "date", "decimal", "bit"]
+
+TABLE_SHAPES: Dict[str, List[Tuple[str, str]]] = {
+    "V_Equipment": _EQUIPMENT_NAMED + [
+        (f"Col_{i:03d}", _EQUIPMENT_FILL[i % len(_EQUIPMENT_FILL)])
+        for i in range(150 - len(_EQUIPMENT_NAMED))
+    ],
+    "V_Inventory_Parts_Ops": [
+        ("Part_Id", "int"),
+        ("Part_Number", "text"),
+        ("Part_Description", "text"),
+        ("Warehouse", "text"),
+        ("Location", "text"),
+        ("Supplier", "text"),
+        ("Product_Family", "text"),
+        ("Date_Entree_Stock", "date"),
+        ("Date_Derniere_Sortie", "date"),
+        ("Age_Stock", "decimal"),
+        ("Qte_En_Stock", "decimal"),
+        ("Prix_Unitaire", "decimal"),
+        ("Valeur_Stock", "decimal"),
+        ("Qte_Reservee", "int"),
+        ("Is_Obsolete", "bit"),
+        ("Is_Critical", "bit"),
+        ("Devise", "text"),
+        ("Agence", "text"),
+    ],
+}
+
+
+def _column_expression(index: int, kind: str) -> str:
+    """Expression SQLite d'une colonne en fonction du numéro de ligne n"""
+    # Multiplicateur premier propre à la colonne: colonnes peu corrélées
+    factor = 7919 + 104729 * index
+    if index == 0:
+        return "n"
+    if kind == "int":
+        expression = f"(n * {factor}) % 1000003"
+    elif kind == "decimal":
+        expression = f"ROUND(((n * {factor}) % 10000000) / 100.0, 2)"
+    elif kind == "decimal0":
+        expression = f"(n * {factor}) % 100000"
+    elif kind == "text":
+        # Cardinalité variable selon la colonne (codes, libellés, clients...)
+        cardinality = (50, 1000, 100000)[index % 3]
+        expression = f"'val_{index}_' || ((n * {factor}) % {cardinality})"
+    elif kind == "date":
+        expression = f"datetime('2020-01-01', '+' || ((n * {factor}) % 2400) || ' days')"
+    elif kind == "bit":
+        expression = f"(n * {factor}) % 2"
+    else:
+        raise ValueError(f"❌ Type de colonne inconnu: {kind}")
+    # Une colonne sur 5 contient des NULL
+    if index % 5 == 0:
+        expression = f"CASE WHEN n % 13 = 0 THEN NULL ELSE {expression} END"
+    return expression
+
+
+def generate_table(db_path: Path, table_name: str, rows: int, logger) -> float:
+    """
+    Crée (ou réutilise) une base SQLite contenant table_name avec rows lignes
+    Returns: durée de génération en secondes (0 si la base existait déjà)
+    """
+    columns = TABLE_SHAPES[table_name]
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("CREATE TABLE IF NOT EXISTS _bench_meta (table_name TEXT PRIMARY KEY, row_count INTEGER)")
+        existing = conn.execute(
+            "SELECT row_count FROM _bench_meta WHERE table_name = ?", (table_name,)
+        ).fetchone()
+        if existing and existing[0] == rows:
+            logger.info(f"♻️  Table synthétique réutilisée: {table_name} ({rows:,} lignes) dans {db_path}")
+            return 0.0
+
+        logger.info(f"🧪 Génération de {table_name}: {rows:,} lignes, {len(columns)} colonnes")
+        start = time.time()
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+        conn.execute(
+            f'CREATE TABLE "{table_name}" ('
+            + ", ".join(f'"{name}" {COLUMN_KINDS[kind][0]}' for name, kind in columns)
+            + ")"
+        )
+        conn.execute(
+            f'INSERT INTO "{table_name}" '
+            f"WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < {int(rows)}) "
+            "SELECT "
+            + ", ".join(_column_expression(i, kind) for i, (_, kind) in enumerate(columns))
+            + " FROM seq"
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO _bench_meta (table_name, row_count) VALUES (?, ?)", (table_name, rows)
+        )
+        conn.commit()
+        duration = time.time() - start
+        logger.info(f"✅ {table_name} généré en {duration:.1f}s ({db_path.stat().st_size / 1024**2:,.0f} MB)")
+        return duration
+    finally:
+        conn.close()
+
+
+def duckdb_columns(table_name: str) -> Dict[str, str]:
+    """Colonnes de la table cible DuckDB du sink: {nom: type DuckDB}"""
+    return {name: COLUMN_KINDS[kind][1] for name, kind in TABLE_SHAPES[table_name]}
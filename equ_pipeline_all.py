@@ -7,6 +7,7 @@ from dlt.sources.credentials import ConnectionStringCredentials
 from dlt.sources.sql_database import sql_database
 import urllib.parse
 import os
+from mssql_data_nmbai.defs.config import get_mssql_engine
 
 
 # To return a subset of columns
@@ -36,34 +37,6 @@ def table_adapter_callback(table):
     return table
 
 
-def get_mssql_engine():
-
-    driver   = os.getenv("MSSQL_DRIVER")
-    server   = os.getenv("MSSQL_SERVER")
-    port     = os.getenv("MSSQL_PORT")
-    database = os.getenv("MSSQL_DATABASE")
-    username = os.getenv("MSSQL_USER")
-    password = os.getenv("MSSQL_PASSWORD")
-
-    conn_str = (
-        f"DRIVER={driver};"
-        f"SERVER={server};"
-        f"DATABASE={database};"
-        f"UID={username};"
-        f"PWD={password};"
-        "Encrypt=yes;"
-        "TrustServerCertificate=yes;"
-        "MARS_Connection=yes;"   # allows parallel queries
-        "Packet Size=32767;"     # larger network packets
-        "Connection Timeout=60;"  # Increase timeout
-        "Command Timeout=300;"    # Increase command timeout
-    )
-    conn_str_encoded = urllib.parse.quote_plus(conn_str)
-
-    engine_url = f"mssql+pyodbc:///?odbc_connect={conn_str_encoded}&arraysize=50000"
-    return engine_url
-
-
 ##### EXTRACT V_facture_dashboard_am #############
 
 @dlt.resource(
@@ -79,7 +52,7 @@ def get_mssql_engine():
 def get_facture_data():
     
     source_sta = sql_database(
-        get_mssql_engine(),
+        get_mssql_engine("dlt"),
         backend="pyarrow",
         chunk_size=300_000,
         reflection_level="minimal",
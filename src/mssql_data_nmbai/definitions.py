@@ -1,90 +1,72 @@
 from pathlib import Path
 
-from dagster import Definitions, load_from_defs_folder, ScheduleDefinition, define_asset_job
+from dagster import AssetSelection, Definitions, load_from_defs_folder, RunRequest, ScheduleDefinition, ScheduleEvaluationContext, define_asset_job, schedule
 from dagster_embedded_elt.dlt import DagsterDltResource
-from mssql_data_nmbai.defs.assets import(
-    equipment_dashboard_assets, 
-    facture_dashboard_assets,
-    tiers_dashboard_assets,
-    gcm_retour_donnees_olga_assets,
-    inventory_parts_ops_assets,
-    v_lean_pse_facture_comm_devis_assets,
+from mssql_data_nmbai.defs.assets import bcp_assets, out_of_range_rows_job, partitioned_assets, table_jobs, table_schedules, time_partitions_def
+from mssql_data_nmbai.defs.config import Config
+from mssql_data_nmbai.defs.resources import SnowflakeSessionResource
+from mssql_data_nmbai.defs.scheduling import nightly_executor_config
+
+
+# Job de nuit: tous les assets BCP + COPY INTO dans un seul run, étapes limitées
+# par les pools SQL Server / Snowflake de l'instance et ordonnées par durée attendue
+# (scheduling.py). Les trois jobs de nuit partent à des heures décalées.
+# Les tables en chargement complet CSV ont deux étapes (export + PUT, puis COPY INTO):
+# le COPY d'une table tourne pendant l'export des suivantes.
+# Les jobs par table (registre tables.py) restent disponibles pour les lancements manuels.
+nightly_extract_job = define_asset_job(
+    name="nightly_extract_job",
+    selection=AssetSelection.groups("data_for_nmbai") - AssetSelection.assets(*partitioned_assets),
+    config=nightly_executor_config(),
 )
 
-
-#jobs
-equipment_dashboard_job = define_asset_job(
-    name="equipment_dashboard_job",
-    selection=[equipment_dashboard_assets],
-)
-
-facture_dashboard_job = define_asset_job(
-    name="facture_dashboard_job",
-    selection=[facture_dashboard_assets],
-)
-
-tiers_dashboard_job = define_asset_job(
-    name="tiers_dashboard_job",
-    selection=[tiers_dashboard_assets],
-)
-
-gcm_retour_donnees_olga_job = define_asset_job(
-    name="gcm_retour_donnees_olga_job",
-    selection=[gcm_retour_donnees_olga_assets],
-)
-
-inventory_parts_ops_job = define_asset_job(
-    name="inventory_parts_ops_job",
-    selection=[inventory_parts_ops_assets],
-)
-
-v_lean_pse_facture_comm_devis_assets_job = define_asset_job(
-    name="v_lean_pse_facture_comm_devis_assets_job",
-    selection=[v_lean_pse_facture_comm_devis_assets],
+# Assets partitionnés par mois: une run par partition (backfills répartis sur
+# plusieurs workers); la nuit, seuls les derniers mois sont rechargés
+recent_partitions_job = define_asset_job(
+    name="recent_partitions_job",
+    selection=AssetSelection.assets(*partitioned_assets),
+    partitions_def=time_partitions_def,
+    config=nightly_executor_config(),
 )
 
 
 #schedule : every day
-equipment_dashboard_schedule = ScheduleDefinition(
-    job=equipment_dashboard_job,
-    cron_schedule="0 0 * * *", ## every day
+nightly_extract_schedule = ScheduleDefinition(
+    job=nightly_extract_job,
+    cron_schedule=Config.NIGHTLY_CRON, ## every day
 )
 
-facture_dashboard_schedule = ScheduleDefinition(
-    job= facture_dashboard_job,
-    cron_schedule="0 0 * * *", ## every day
+# Lignes des tables partitionnées hors de toutes les partitions (date NULL ou hors plage)
+out_of_range_rows_schedule = ScheduleDefinition(
+    job=out_of_range_rows_job,
+    cron_schedule=Config.OUT_OF_RANGE_CRON,
 )
 
-tiers_dashboard_schedule = ScheduleDefinition(
-    job= tiers_dashboard_job,
-    cron_schedule="0 0 * * *", ## every day
-)
 
-gcm_retour_donnees_olga_schedule = ScheduleDefinition(
-    job= gcm_retour_donnees_olga_job,
-    cron_schedule="0 0 * * *", ## every day
-)
+@schedule(job=recent_partitions_job, cron_schedule=Config.RECENT_PARTITIONS_CRON)
+def recent_partitions_schedule(context: ScheduleEvaluationContext):
+    """Recharge les Config.TIME_PARTITION_REFRESH derniers mois (mois en cours compris)"""
+    partition_keys = time_partitions_def.get_partition_keys(
+        current_time=context.scheduled_execution_time,
+    )
+    for partition_key in partition_keys[-Config.TIME_PARTITION_REFRESH:]:
+        yield RunRequest(
+            run_key=f"{partition_key}_{context.scheduled_execution_time:%Y%m%d}",
+            partition_key=partition_key,
+        )
 
-inventory_parts_ops_schedule = ScheduleDefinition(
-    job= inventory_parts_ops_job,
-    cron_schedule="0 0 * * *", ## every day
-)
-
-
-v_lean_pse_facture_comm_devis_schedule = ScheduleDefinition(
-    job= v_lean_pse_facture_comm_devis_assets_job,
-    cron_schedule="0 0 * * *", ## every day
-)
 
+# Jobs des partitions seulement si une table du registre a une time_partition_column
+partition_jobs = [recent_partitions_job, out_of_range_rows_job] if partitioned_assets else []
+partition_schedules = [recent_partitions_schedule, out_of_range_rows_schedule] if partitioned_assets else []
 
 
 defs = Definitions(
-    jobs= [equipment_dashboard_job,facture_dashboard_job,tiers_dashboard_job,inventory_parts_ops_job,gcm_retour_donnees_olga_job,v_lean_pse_facture_comm_devis_assets_job],
-    assets=[equipment_dashboard_assets,facture_dashboard_assets,tiers_dashboard_assets,inventory_parts_ops_assets,gcm_retour_donnees_olga_assets, v_lean_pse_facture_comm_devis_assets],
+    jobs= [nightly_extract_job, *partition_jobs, *table_jobs],
+    assets=[*bcp_assets.values()],
     resources={
         "dlt":DagsterDltResource(),
+        "snowflake":SnowflakeSessionResource(),
     },
-    schedules = [equipment_dashboard_schedule,facture_dashboard_schedule,tiers_dashboard_schedule,inventory_parts_ops_schedule,gcm_retour_donnees_olga_schedule, v_lean_pse_facture_comm_devis_schedule]
+    schedules = [nightly_extract_schedule, *partition_schedules, *table_schedules]
 )
-
-
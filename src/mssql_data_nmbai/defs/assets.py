@@ -3,9 +3,14 @@ from dagster import AssetExecutionContext, RetryPolicy
 from dagster_embedded_elt.dlt import DagsterDltResource, dlt_assets
 import dlt
 import logging
+import time
 from mssql_data_nmbai.defs.dlt_mssql_source import make_inventory_parts_ops_source,equipment_source, facture_source, tiers_source, gcm_retour_donnees_olga_source##, inventory_parts_ops_source, devis_source, commande_source
 #from mssql_data_nmbai.defs.load_bcp_copy_into import run_pipeline, Config
-from mssql_data_nmbai.defs.load_bcp_copy_into import Config, extract_mssql_data
+from mssql_data_nmbai.defs.load_bcp_copy_into import Config, export_to_stage, extract_mssql_data, extract_mssql_data_slice, load_from_stage
+from mssql_data_nmbai.defs.instrumentation import SpanRecorder, recording, write_metrics_file
+from mssql_data_nmbai.defs.resources import SnowflakeSessionResource
+from mssql_data_nmbai.defs.scheduling import MSSQL_EXTRACT_POOL, SNOWFLAKE_LOAD_POOL, bcp_asset_tags
+from mssql_data_nmbai.defs.tables import TableSpec, bcp_tables, full_load_tables, partitioned_tables
 # Pipeline DLT
 pipeline = dlt.pipeline(
     pipeline_name="mssql_to_snowflake_pipeline",
@@ -22,140 +27,198 @@ retry_policy = RetryPolicy(
 
 
 ##### ASSETS USING BCP + COPY INTO
-@dg.asset(
-    name="v_Inventory_Parts_Ops",
-    group_name="data_for_nmbai",
-    description="Inventory Parts Ops from MSSQL → Snowflake via BCP + COPY INTO",
+# Partitions mensuelles des tables avec time_partition_column (mois en cours compris)
+time_partitions_def = dg.MonthlyPartitionsDefinition(
+    start_date=Config.TIME_PARTITION_START,
+    end_offset=1,
 )
-def inventory_parts_ops_assets(context: dg.AssetExecutionContext) -> dg.MaterializeResult:
-    """Inventory Parts Ops from MSSQL"""
-    
-    result = extract_mssql_data(
-        ##snowflake_database = "NEEMBA",
-        snowflake_schema = "EQUIPEMENT", 
-        mssql_table_name = "V_Inventory_Parts_Ops",
-        snowflake_table_name = "AI_V_Inventory_Parts_Ops",
-        logger = context.log,
-    )
 
-    return dg.MaterializeResult(
-        metadata={
-            "rows_loaded": dg.MetadataValue.int(result["rows_loaded"]),
-        }
-    )
 
+# Un asset par entrée "bcp" du registre (tables.py)
+def build_bcp_asset(spec: TableSpec) -> dg.AssetsDefinition:
+    """
+    Asset BCP + COPY INTO d'une table du registre; avec time_partition_column,
+    asset partitionné par mois dont chaque partition ne recharge que sa tranche
+    """
 
-@dg.asset(
-    name="V_Equipment",
-    group_name="data_for_nmbai",
-    description="Equipment from MSSQL → Snowflake via BCP + COPY INTO",
-)
-def equipment_dashboard_assets(context: dg.AssetExecutionContext) -> dg.MaterializeResult:
-    """Equipment from MSSQL"""
-    result = extract_mssql_data(
-        #snowflake_database = "NEEMBA",
-        snowflake_schema = "EQUIPEMENT", 
-        mssql_table_name = "V_Equipment",
-        snowflake_table_name = "AI_V_Equipment",
-        logger = context.log,
+    @dg.asset(
+        name=spec.asset_name,
+        group_name=spec.group_name,
+        op_tags=bcp_asset_tags(spec.expected_duration),
+        pool=MSSQL_EXTRACT_POOL,
+        description=spec.description or f"{spec.asset_name} from MSSQL → Snowflake via BCP + COPY INTO",
+        partitions_def=time_partitions_def if spec.time_partition_column else None,
     )
+    def _bcp_asset(context: dg.AssetExecutionContext, snowflake: SnowflakeSessionResource) -> dg.MaterializeResult:
+        start_time = time.time()
+        # Spans des phases (export, compression, PUT, COPY, DDL, MERGE) de la matérialisation
+        with recording(spec.asset_name) as recorder:
+            if spec.time_partition_column:
+                window = context.partition_time_window
+                result = extract_mssql_data_slice(
+                    mssql_table_name = spec.source,
+                    snowflake_table_name = spec.target,
+                    logger = context.log,
+                    date_column = spec.time_partition_column,
+                    start = window.start,
+                    end = window.end,
+                    snowflake_schema = spec.snowflake_schema,
+                    run_id = context.run_id,
+                )
+            else:
+                result = extract_mssql_data(
+                    **spec.extract_kwargs(),
+                    logger = context.log,
+                    run_id = context.run_id,
+                )
+        duration = time.time() - start_time
+        write_metrics_file(
+            recorder,
+            Config.METRICS_DIR,
+            partition_key = context.partition_key if spec.time_partition_column else None,
+        )
 
-    return dg.MaterializeResult(
-        metadata={
-            "rows_loaded": dg.MetadataValue.int(result["rows_loaded"]),
-        }
-    )  
+        return dg.MaterializeResult(
+            metadata={
+                "rows_loaded": dg.MetadataValue.int(result["rows_loaded"]),
+                "export_rows_per_sec": dg.MetadataValue.float(float(result.get("export_rows_per_sec", 0.0))),
+                "duration_seconds": dg.MetadataValue.float(duration),
+                **phase_metadata(recorder),
+            }
+        )
 
+    return _bcp_asset
 
-@dg.asset(
-    name="V_facture_dashboard_am",
-    group_name="data_for_nmbai",
-    description="Facture_dashboard_am from MSSQL → Snowflake via BCP + COPY INTO",
-)
-def facture_dashboard_assets(context: dg.AssetExecutionContext) -> dg.MaterializeResult:
-    """Facture_dashboard_am from MSSQL"""
-    
-    result = extract_mssql_data(
-        #snowflake_database = "NEEMBA",
-        snowflake_schema = "EQUIPEMENT", 
-        mssql_table_name="V_facture_dashboard_am",
-        snowflake_table_name="AI_V_facture_dashboard_am",
-        logger=context.log,
+
+# Lignes hors des partitions mensuelles (date NULL, antérieure à TIME_PARTITION_START
+# ou postérieure à la dernière partition): aucune partition ne les recharge
+@dg.op(tags=bcp_asset_tags(Config.DEFAULT_ASSET_DURATION), pool=MSSQL_EXTRACT_POOL)
+def reload_out_of_range_rows(context: dg.OpExecutionContext, snowflake: SnowflakeSessionResource):
+    """Tranche complémentaire des partitions de chaque table partitionnée"""
+    end = time_partitions_def.get_last_partition_window().end
+    for spec in partitioned_tables():
+        extract_mssql_data_slice(
+            mssql_table_name = spec.source,
+            snowflake_table_name = spec.target,
+            logger = context.log,
+            date_column = spec.time_partition_column,
+            start = time_partitions_def.start,
+            end = end,
+            snowflake_schema = spec.snowflake_schema,
+            run_id = context.run_id,
+            outside = True,
+        )
+
+
+@dg.job(name="out_of_range_rows_job")
+def out_of_range_rows_job():
+    reload_out_of_range_rows()
+
+
+# Tables en chargement complet CSV: un asset par table en deux ops. L'export
+# (bcp + PUT) rend son créneau SQL Server dès la fin du PUT; le COPY INTO tourne
+# dans l'op suivante (pool Snowflake) pendant que l'export d'une autre table démarre
+def build_full_load_asset(spec: TableSpec) -> dg.AssetsDefinition:
+    """
+    Asset d'une table de full_load_tables(): export_to_stage puis load_from_stage
+    (COPY INTO asynchrone, AsyncCopyMonitor). Les spans des deux ops sont réunis
+    dans l'enregistreur de la table, publié avec la matérialisation.
+    """
+
+    @dg.op(name=f"{spec.asset_name}_export", tags=bcp_asset_tags(spec.expected_duration), pool=MSSQL_EXTRACT_POOL)
+    def _export(context: dg.OpExecutionContext, snowflake: SnowflakeSessionResource) -> dict:
+        start_time = time.time()
+        with recording(spec.asset_name) as recorder:
+            staged = export_to_stage(
+                mssql_table_name = spec.source,
+                snowflake_table_name = spec.target,
+                logger = context.log,
+                snowflake_schema = spec.snowflake_schema,
+                run_id = context.run_id,
+            )
+        # Spans transmis à l'op de chargement (autre process avec l'executor multiprocess)
+        return {**staged, "start_time": start_time, "spans": recorder.spans}
+
+    @dg.op(
+        name=f"{spec.asset_name}_load",
+        out=dg.Out(dg.Nothing),
+        tags=bcp_asset_tags(spec.expected_duration),
+        pool=SNOWFLAKE_LOAD_POOL,
     )
+    def _load(context: dg.OpExecutionContext, snowflake: SnowflakeSessionResource, staged: dict):
+        with recording(spec.asset_name) as recorder:
+            for exported in staged["spans"]:
+                recorder.add(exported)
+            result = load_from_stage(
+                snowflake_table_name = spec.target,
+                load_table = staged["load_table"],
+                stage_path = staged["stage_path"],
+                logger = context.log,
+                snowflake_schema = spec.snowflake_schema,
+                run_id = context.run_id,
+            )
+        duration = time.time() - staged["start_time"]
+        write_metrics_file(recorder, Config.METRICS_DIR)
 
-    return dg.MaterializeResult(
-        metadata={
-            "rows_loaded": dg.MetadataValue.int(result["rows_loaded"]),
-        }
-    )  
+        return dg.Output(
+            None,
+            metadata={
+                "rows_loaded": dg.MetadataValue.int(result["rows_loaded"]),
+                "export_rows_per_sec": dg.MetadataValue.float(float(staged["export_rows_per_sec"])),
+                "copy_seconds": dg.MetadataValue.float(float(result["duration"])),
+                "duration_seconds": dg.MetadataValue.float(duration),
+                **phase_metadata(recorder),
+            },
+        )
 
-@dg.asset(
-    name="V_tiers_dashboard_am",
-    group_name="data_for_nmbai",
-    description="Tiers_dashboard_am from MSSQL → Snowflake via BCP + COPY INTO",
-)
-def tiers_dashboard_assets(context: dg.AssetExecutionContext) -> dg.MaterializeResult:
-    """Tiers_dashboard_am from MSSQL"""
-    
-    result = extract_mssql_data(
-        #snowflake_database = "NEEMBA",
-        snowflake_schema = "EQUIPEMENT", 
-        mssql_table_name="V_tiers_dashboard_am",
-        snowflake_table_name="AI_V_tiers_dashboard_am",
-        logger=context.log,
+    @dg.graph_asset(
+        name=spec.asset_name,
+        group_name=spec.group_name,
+        description=spec.description or f"{spec.asset_name} from MSSQL → Snowflake via BCP + COPY INTO",
     )
+    def _full_load_asset():
+        return _load(_export())
 
-    return dg.MaterializeResult(
-        metadata={
-            "rows_loaded": dg.MetadataValue.int(result["rows_loaded"]),
-        }
-    )  
+    return _full_load_asset
 
 
-@dg.asset(
-    name="GCM_Retour_Donnees_OLGA",
-    group_name="data_for_nmbai",
-    description="GCM_Retour_Donnees_OLGA from MSSQL → Snowflake via BCP + COPY INTO",
-)
-def gcm_retour_donnees_olga_assets(context: dg.AssetExecutionContext) -> dg.MaterializeResult:
-    """GCM_Retour_Donnees_OLGA from MSSQL"""
-    
-    result = extract_mssql_data(
-        #snowflake_database = "NEEMBA",
-        snowflake_schema = "EQUIPEMENT", 
-        mssql_table_name="GCM_Retour_Donnees_OLGA",
-        snowflake_table_name="AI_GCM_Retour_Donnees_OLGA",
-        logger=context.log,
-    )
+def phase_metadata(recorder: SpanRecorder) -> dict:
+    """Métadonnées des phases: valeurs à plat (graphes Dagster) + détail JSON"""
+    metadata = {
+        key: dg.MetadataValue.int(value) if isinstance(value, int) else dg.MetadataValue.float(value)
+        for key, value in recorder.metadata().items()
+    }
+    metadata["phases"] = dg.MetadataValue.json(recorder.phases())
+    return metadata
 
-    return dg.MaterializeResult(
-        metadata={
-            "rows_loaded": dg.MetadataValue.int(result["rows_loaded"]),
-        }
-    )  
 
+def build_table_job(spec: TableSpec):
+    """Job de lancement manuel d'une table"""
+    return dg.define_asset_job(name=spec.job_name, selection=dg.AssetSelection.assets(spec.asset_name))
 
-@dg.asset(
-    name="V_LEAD_PSE_Facture_Comm_Devis",
-    group_name="data_for_nmbai",
-    description="V_LEAD_PSE_Facture_Comm_Devis from MSSQL → Snowflake via BCP + COPY INTO",
-)
-def gcm_retour_donnees_olga_assets(context: dg.AssetExecutionContext) -> dg.MaterializeResult:
-    """V_LEAD_PSE_Facture_Comm_Devis from MSSQL"""
-    
-    result = extract_mssql_data(
-        #snowflake_database = "NEEMBA",
-        snowflake_schema = "EQUIPEMENT", 
-        mssql_table_name="V_LEAD_PSE_Facture_Comm_Devis",
-        snowflake_table_name="V_LEAD_PSE_Facture_Comm_Devis",
-        logger=context.log,
+
+def build_table_schedule(spec: TableSpec, job) -> dg.ScheduleDefinition:
+    """Schedule propre à une table (spec.schedule), en plus du job de nuit"""
+    return dg.ScheduleDefinition(
+        name=f"{spec.job_name}_schedule",
+        job=job,
+        cron_schedule=spec.schedule,
     )
 
-    return dg.MaterializeResult(
-        metadata={
-            "rows_loaded": dg.MetadataValue.int(result["rows_loaded"]),
-        }
-    )  
+
+full_load_names = {spec.asset_name for spec in full_load_tables()}
+bcp_assets = {
+    spec.asset_name: build_full_load_asset(spec) if spec.asset_name in full_load_names else build_bcp_asset(spec)
+    for spec in bcp_tables()
+}
+partitioned_assets = [bcp_assets[spec.asset_name] for spec in partitioned_tables()]
+table_jobs = [build_table_job(spec) for spec in bcp_tables()]
+table_schedules = [
+    build_table_schedule(spec, job)
+    for spec, job in zip(bcp_tables(), table_jobs)
+    if spec.schedule
+]
+
 
 ###### ASSET USING DLT
 ##@dlt_assets(
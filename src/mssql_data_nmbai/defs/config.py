@@ -1,20 +1,36 @@
+import gzip
+import hashlib
+import json
 import os
+import re
 import subprocess
+import threading
 import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from datetime import datetime
+from datetime import date, datetime
+from decimal import Decimal
 
 from dotenv import load_dotenv
 import logging
 #from bcp_wsl import BCPExporter
 import logging
 from dotenv import load_dotenv
-from typing import Tuple, Optional
+from typing import Callable, Tuple, Optional
 from typing import Dict, List, Tuple
 import urllib.parse
 from sqlalchemy import create_engine, event, pool, text
 from sqlalchemy.engine import Engine
 
+from mssql_data_nmbai.defs.instrumentation import span
+
+try:
+    import fcntl
+except ImportError:  # Windows: verrou du cache limité aux threads du process
+    fcntl = None
+
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -28,12 +44,20 @@ class Config:
     MSSQL_USER = os.getenv("MSSQL_USER")
     MSSQL_PASSWORD = os.getenv("MSSQL_PASSWORD")
     
+    # Pool SQLAlchemy des engines SQL Server (par process et par clé de configuration)
+    MSSQL_POOL_SIZE = int(os.getenv("MSSQL_POOL_SIZE", "5"))
+    MSSQL_MAX_OVERFLOW = int(os.getenv("MSSQL_MAX_OVERFLOW", "10"))
+    MSSQL_POOL_RECYCLE = int(os.getenv("MSSQL_POOL_RECYCLE", "1800"))
+    MSSQL_ODBC_POOLING = os.getenv("MSSQL_ODBC_POOLING", "true").lower() == "true"
+    
     # Query
     TABLE_NAME = "v_Inventory_Parts_Ops"
     QUERY = f"SELECT TOP 10000000 * FROM {TABLE_NAME} WITH (NOLOCK)"
     
     # Fichier de sortie
     OUTPUT_PATH = Path(os.getenv("OUTPUT_PATH", "/tmp/mssql_export.csv"))    
+    # Répertoire de travail par run (un sous-dossier <run_id>/<table> par asset)
+    WORK_DIR = Path(os.getenv("WORK_DIR", "/tmp/mssql_export"))
     DELIMITER = "|"
     
     # Snowflake
@@ -44,10 +68,26 @@ class Config:
     SF_DATABASE = os.getenv("SNOWFLAKE_DATABASE", "NEEMBA")
     SF_SCHEMA = os.getenv("SNOWFLAKE_SCHEMA", "EQUIPEMENT")
     SF_ROLE = os.getenv("SNOWFLAKE_ROLE", "transform")
+    # Pool de sessions Snowflake (par process)
+    SF_POOL_MAX_IDLE = int(os.getenv("SNOWFLAKE_POOL_MAX_IDLE", "4"))  # sessions inactives gardées par base/schéma
+    SF_POOL_IDLE_TIMEOUT = int(os.getenv("SNOWFLAKE_POOL_IDLE_TIMEOUT", "1800"))  # secondes
     
     # Stage et File Format
     FILE_FORMAT_NAME = "mssql_csv_file_format"
+    PARQUET_FILE_FORMAT_NAME = "mssql_parquet_file_format"
+
+    # Format d'export (EXPORT_FORMATS): "csv" (bcp) ou "parquet" (colonnes typées, lecture pyodbc).
+    # Le décodage bcp natif (-n) n'est pas proposé: décodé valeur par valeur en Python, il est
+    # plus lent que l'export CSV (python -m benchmarks.run --paths bcp,native)
+    EXPORT_FORMAT = os.getenv("EXPORT_FORMAT", "csv").lower()
+    PARQUET_BATCH_ROWS = int(os.getenv("PARQUET_BATCH_ROWS", "100000"))
+    PARQUET_ROWS_PER_FILE = int(os.getenv("PARQUET_ROWS_PER_FILE", "2000000"))
     STAGE_NAME = "MSSQL_DIRECT_STAGE"
+
+    # PUT: compression côté client + upload parallèle
+    PUT_COMPRESSION = os.getenv("PUT_COMPRESSION", "gzip").lower()  # gzip, zstd ou none
+    PUT_PARALLEL = int(os.getenv("PUT_PARALLEL", "8"))
+    COMPRESS_WORKERS = int(os.getenv("COMPRESS_WORKERS", str(os.cpu_count() or 1)))
     
     # BCP executable path
     #BCP_PATH = r"C:\Program Files\Microsoft SQL Server\Client SDK\ODBC\170\Tools\Binn\bcp.exe"
@@ -65,6 +105,287 @@ class Config:
 
     BCP_PATH = r"/opt/mssql-tools/bin/bcp"
 
+    # Suivi de bcp: progression dans les logs, arrêt si plus aucune ligne reçue
+    BCP_PROGRESS_INTERVAL = int(os.getenv("BCP_PROGRESS_INTERVAL", "30"))  # secondes
+    BCP_STALL_TIMEOUT = int(os.getenv("BCP_STALL_TIMEOUT", "1800"))  # secondes, 0 = désactivé
+
+    # Export partitionné (plusieurs bcp en parallèle)
+    BCP_PARTITIONS = int(os.getenv("BCP_PARTITIONS", "1"))
+    BCP_MAX_PARALLEL = int(os.getenv("BCP_MAX_PARALLEL", "4"))
+
+    # bcp queryout n'écrit pas de ligne d'en-tête
+    CSV_SKIP_HEADER = int(os.getenv("CSV_SKIP_HEADER", "0"))
+
+    # Cache local des schémas SQL Server (colonnes + empreinte), hors des dossiers de run
+    SCHEMA_CACHE_PATH = Path(os.getenv("SCHEMA_CACHE_PATH", str(WORK_DIR / "schema_cache.json")))
+    SCHEMA_CACHE_ENABLED = os.getenv("SCHEMA_CACHE_ENABLED", "true").lower() == "true"
+
+    # Chargement complet: "swap" (table de staging + ALTER TABLE SWAP WITH, la cible
+    # reste lisible) ou "replace" (DDL CREATE OR REPLACE / TRUNCATE puis COPY)
+    LOAD_MODE = os.getenv("LOAD_MODE", "swap").lower()
+
+    # Export complet repris après échec: tranches de clé + manifeste des tranches terminées,
+    # hors des dossiers de run (une relance Dagster a un autre run_id)
+    RESUME_DIR = Path(os.getenv("RESUME_DIR", str(WORK_DIR / "resumable")))
+    RESUME_CHUNK_ROWS = int(os.getenv("RESUME_CHUNK_ROWS", "5000000"))
+    RESUME_MAX_AGE_HOURS = int(os.getenv("RESUME_MAX_AGE_HOURS", "24"))  # manifeste plus ancien: export repris de zéro
+
+    # COPY INTO asynchrone (AsyncCopyMonitor): suivi des query ids
+    COPY_POLL_INTERVAL = int(os.getenv("COPY_POLL_INTERVAL", "5"))  # secondes entre deux statuts
+    COPY_PROGRESS_INTERVAL = int(os.getenv("COPY_PROGRESS_INTERVAL", "60"))  # secondes entre deux résumés
+
+    # Jobs de nuit (voir scheduling.py): heures décalées, étapes limitées par les pools de l'instance
+    NIGHTLY_CRON = os.getenv("NIGHTLY_CRON", "0 0 * * *")
+    RECENT_PARTITIONS_CRON = os.getenv("RECENT_PARTITIONS_CRON", "0 2 * * *")
+    OUT_OF_RANGE_CRON = os.getenv("OUT_OF_RANGE_CRON", "0 4 * * *")
+    NIGHTLY_MAX_CONCURRENT = int(os.getenv("NIGHTLY_MAX_CONCURRENT", "4"))  # étapes simultanées d'une run
+    MSSQL_EXTRACT_SLOTS = int(os.getenv("MSSQL_EXTRACT_SLOTS", "2"))  # étapes simultanées sur SQL Server, toutes runs
+    SNOWFLAKE_LOAD_SLOTS = int(os.getenv("SNOWFLAKE_LOAD_SLOTS", "4"))  # COPY INTO séparés simultanés, toutes runs
+    # Durée attendue d'un asset sans TableSpec.expected_duration (ordre du job, les plus longs d'abord)
+    DEFAULT_ASSET_DURATION = int(os.getenv("DEFAULT_ASSET_DURATION", "3600"))  # secondes
+
+    # Partitions mensuelles des vues de faits (TableSpec.time_partition_column)
+    TIME_PARTITION_START = os.getenv("TIME_PARTITION_START", "2020-01-01")
+    TIME_PARTITION_REFRESH = int(os.getenv("TIME_PARTITION_REFRESH", "2"))  # derniers mois rechargés chaque nuit
+
+    # Instrumentation: fichiers OpenMetrics des phases par asset (désactivé si non défini)
+    METRICS_DIR = Path(os.getenv("METRICS_DIR")) if os.getenv("METRICS_DIR") else None
+
+    # Extraction incrémentale: dernier watermark par table (table Snowflake)
+    WATERMARK_TABLE = os.getenv("WATERMARK_TABLE", "ETL_WATERMARKS")
+
+    # Découpage des exports pour paralléliser COPY INTO (taille cible compressée)
+    SPLIT_TARGET_MB = int(os.getenv("SPLIT_TARGET_MB", "150"))  # 0 = pas de découpage
+
+    # Pipeline en flux: export en chunks + PUT/COPY en arrière-plan
+    BCP_STREAMING = os.getenv("BCP_STREAMING", "false").lower() == "true"
+    STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "1000000"))
+    STREAM_CHUNK_MB = int(os.getenv("STREAM_CHUNK_MB", "256"))
+    STREAM_COPY_EVERY = int(os.getenv("STREAM_COPY_EVERY", "4"))  # COPY tous les N chunks
+    STREAM_MAX_PENDING_CHUNKS = int(os.getenv("STREAM_MAX_PENDING_CHUNKS", "4"))  # chunks fermés en attente de PUT, l'export attend au-delà
+
+    # Extraction dlt à mémoire bornée (mssql_sources.extract_from_mssql)
+    DLT_CHUNK_MB = int(os.getenv("DLT_CHUNK_MB", "64"))  # taille Arrow cible d'un chunk, 0 = chunk_size fixe
+    DLT_QUEUE_CHUNKS = int(os.getenv("DLT_QUEUE_CHUNKS", "2"))  # chunks prêts en attente de dlt
+    DLT_FETCH_ROWS = int(os.getenv("DLT_FETCH_ROWS", "1000"))  # premier fetch, avant mesure des octets par ligne
+    # Lecteur Arrow: "sqlalchemy" (pyodbc via SQLAlchemy), "connectorx" ou "turbodbc"
+    # (lecture directe en colonnes Arrow, retour à "sqlalchemy" s'il n'est pas installé)
+    DLT_READER = os.getenv("DLT_READER", "sqlalchemy").lower()
+    MSSQL_PORT = int(os.getenv("MSSQL_PORT", "1433"))  # URL connectorx (pas d'ODBC)
+
+
+# Formats d'export du chemin BCP + COPY INTO (Config.EXPORT_FORMAT, TableSpec.export_format)
+EXPORT_FORMATS = ("csv", "parquet")
+
+
+# ===EXPORT BCP (équivalent code PowerShell) ============
+def windows_to_wsl_path(windows_path: str) -> str:
+    """Convertit un chemin Windows en chemin WSL (/mnt/c/... style)."""
+    path = Path(windows_path)
+    if ":" in str(path):
+        drive, rest = str(path).split(":", 1)
+        drive = drive.lower()
+        rest = rest.replace("\\", "/").lstrip("/")
+        return f"/mnt/{drive}/{rest}"
+    else:
+        return str(path)
+
+
+def get_run_output_path(table_name: str, run_id: Optional[str] = None) -> Path:
+    """
+    Fichier de sortie isolé par run et par table:
+    WORK_DIR/<run_id>/<table>/mssql_export.csv
+    Sans run_id (exécution manuelle): Config.OUTPUT_PATH
+    """
+    if run_id is None:
+        return Config.OUTPUT_PATH
+    return Config.WORK_DIR / run_id / table_name / Config.OUTPUT_PATH.name
+
+
+def get_resumable_output_path(table_name: str) -> Path:
+    """
+    Fichier de sortie d'un export repris après échec, indépendant du run:
+    RESUME_DIR/<table>/mssql_export.csv (+ manifeste des tranches)
+    """
+    return Config.RESUME_DIR / table_name / Config.OUTPUT_PATH.name
+
+
+def get_stage_path(table_name: str, run_id: Optional[str] = None) -> str:
+    """
+    Préfixe du stage isolé par table et par run: MSSQL_DIRECT_STAGE/<table>/<run_id>/
+    Sans run_id (exécution manuelle): MSSQL_DIRECT_STAGE/<table>/
+    PUT, COPY et PURGE ne touchent que ce préfixe. Le "/" final est nécessaire:
+    sans lui, COPY / REMOVE sur AI_V_Equipment prendraient aussi AI_V_Equipment_Hist.
+    """
+    if run_id is None:
+        return f"{Config.STAGE_NAME}/{table_name}/"
+    return f"{Config.STAGE_NAME}/{table_name}/{run_id}/"
+
+
+def watermark_to_text(value) -> Tuple[str, str]:
+    """
+    Sérialise une valeur de watermark (MAX de la colonne) pour la persister.
+    Returns: Tuple (valeur texte, type: "timestamp", "date", "number" ou "string")
+    """
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" "), "timestamp"
+    if isinstance(value, date):
+        return value.isoformat(), "date"
+    if isinstance(value, (int, float, Decimal)):
+        return str(value), "number"
+    return str(value), "string"
+
+
+def get_run_table_suffix(run_id: Optional[str] = None) -> str:
+    """
+    Suffixe des tables de travail Snowflake (staging, __SWAP) propre au run:
+    deux runs simultanés sur la même cible (job de nuit et job manuel, relance)
+    n'écrasent pas la table de l'autre. Vide sans run_id (exécution manuelle)
+    """
+    if run_id is None:
+        return ""
+    return "_" + run_id.replace("-", "_")
+
+
+def watermark_literal(value: str, value_type: str, column_type: Optional[str] = None) -> str:
+    """
+    Littéral SQL Server d'un watermark persisté (pour le WHERE col > ...)
+    column_type: type SQL Server de la colonne (get_mssql_column_type), DATETIME2(7)
+    par défaut. Le timestamp est converti dans ce type: un DATETIME (1/300 s) est
+    persisté en .xx3 dans Snowflake mais lu en .xx33333 contre un DATETIME2(7), la
+    ligne du watermark serait alors sélectionnée à chaque run.
+    """
+    if value_type == "number":
+        return value
+    if value_type == "timestamp":
+        # DATETIME2(7) d'abord: il accepte les microsecondes, pas DATETIME ni SMALLDATETIME
+        literal = f"CAST('{value}' AS DATETIME2(7))"
+        if column_type and column_type.upper() != "DATETIME2(7)":
+            literal = f"CAST({literal} AS {column_type.upper()})"
+        return literal
+    escaped = value.replace("'", "''")
+    return f"'{escaped}'"
+
+
+def get_partition_path(output_path: Path, partition: int) -> Path:
+    """Chemin du fichier d'une partition (ex: /tmp/mssql_export_part003.csv)."""
+    return output_path.with_name(f"{output_path.stem}_part{partition:03d}{output_path.suffix}")
+
+
+def estimate_compression_ratio(path: Path, sample_mb: int = 4) -> float:
+    """Ratio brut/gzip estimé sur le début du fichier."""
+    with open(path, "rb") as f:
+        sample = f.read(sample_mb * 1024 * 1024)
+    if not sample:
+        return 1.0
+    return len(sample) / len(gzip.compress(sample, compresslevel=6))
+
+
+def split_export_file(
+    path: Path,
+    target_mb: int = Config.SPLIT_TARGET_MB,
+    skip_header: int = Config.CSV_SKIP_HEADER,
+) -> List[Path]:
+    """
+    Découpe un export CSV en fichiers d'environ target_mb MB une fois compressés,
+    pour que COPY INTO charge les fichiers en parallèle sur le warehouse.
+    - coupe uniquement sur une fin de ligne (terminateur bcp "\n")
+    - les skip_header premières lignes sont recopiées en tête de chaque
+      fichier, puisque le file format les saute dans chaque fichier
+    Le fichier d'origine est remplacé par path_split000, path_split001, ...
+    Returns: liste des fichiers produits (le fichier d'origine s'il est assez petit)
+    """
+    if not target_mb or not path.exists():
+        return [path]
+
+    raw_target = int(target_mb * 1024 * 1024 * estimate_compression_ratio(path))
+    if path.stat().st_size <= raw_target:
+        return [path]
+
+    pieces = []
+    piece = None
+    piece_size = 0
+    line_start = True
+
+    def new_piece():
+        nonlocal piece, piece_size, line_start
+        if piece is not None:
+            piece.close()
+        piece_path = path.with_name(f"{path.stem}_split{len(pieces):03d}{path.suffix}")
+        pieces.append(piece_path)
+        piece = open(piece_path, "wb")
+        piece.write(header)
+        piece_size = len(header)
+        line_start = True
+
+    def write(data: bytes):
+        nonlocal piece_size, line_start
+        piece.write(data)
+        piece_size += len(data)
+        line_start = data.endswith(b"\n")
+
+    try:
+        with open(path, "rb") as src:
+            header = b"".join(src.readline() for _ in range(skip_header))
+            new_piece()
+            for block in iter(lambda: src.read(8 * 1024 * 1024), b""):
+                while piece_size + len(block) > raw_target:
+                    cut = block.rfind(b"\n", 0, max(raw_target - piece_size, 0)) + 1
+                    if cut == 0:
+                        if line_start and piece_size > len(header):
+                            # Pas de fin de ligne avant la cible: on ferme ce fichier
+                            new_piece()
+                            continue
+                        # Terminer la ligne en cours (plus longue que la cible)
+                        cut = block.find(b"\n") + 1
+                        if cut == 0:
+                            break
+                    write(block[:cut])
+                    block = block[cut:]
+                    new_piece()
+                if block:
+                    write(block)
+    finally:
+        if piece is not None:
+            piece.close()
+
+    # Un dernier fichier vide (export terminé pile sur une coupe) n'est pas utile
+    if pieces and pieces[-1].stat().st_size <= len(header):
+        pieces.pop().unlink()
+
+    path.unlink()
+    logger.info(f"✂️  {path.name} découpé en {len(pieces)} fichiers (~{target_mb} MB compressés)")
+    return pieces
+
+
+def load_export_manifest(path: Path) -> Optional[dict]:
+    """Manifeste d'un export par tranches (voir BCPExporter.export_resumable), None s'il n'existe pas"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def save_export_manifest(path: Path, manifest: dict) -> None:
+    """Écriture atomique du manifeste: un arrêt brutal ne laisse jamais un JSON tronqué"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# Compteurs affichés par bcp: "... Total received: 1000" (queryout), "Total sent: 1000" (in),
+# puis "25000 rows copied." en fin d'export
+BCP_ROWS_PATTERN = re.compile(r"Total (?:received|sent):\s*(\d+)|(\d+) rows copied")
+
+
+def format_progress(label: str, rows: int, rows_per_sec: float, eta_seconds: Optional[float]) -> str:
+    """Ligne de progression bcp pour les logs"""
+    eta = f", ETA {eta_seconds / 60:.1f} min" if eta_seconds is not None else ""
+    return f"⏳ {label}: {rows:,} lignes, {rows_per_sec:,.0f} rows/sec{eta}"
+
 
 class BCPExporter:
     """Exporter BCP SQL Server → CSV, compatible WSL et Linux natif."""
@@ -78,6 +399,8 @@ class BCPExporter:
         use_wsl: bool = False,
         bcp_path: str = None,
         trust_server_certificate: bool = True,
+        on_progress: Optional[Callable[[str, int, float, Optional[float]], None]] = None,
+        stall_timeout: int = Config.BCP_STALL_TIMEOUT,
     ):
         self.server = server
         self.database = database
@@ -85,6 +408,11 @@ class BCPExporter:
         self.password = password
         self.use_wsl = use_wsl
         self.trust_server_certificate = trust_server_certificate
+        # on_progress(fichier, lignes, rows/sec, ETA en secondes ou None)
+        self.on_progress = on_progress or (lambda *progress: logger.info(format_progress(*progress)))
+        self.stall_timeout = stall_timeout
+        self.rows_exported = 0
+        self._rows_lock = threading.Lock()
 
         # Chemin BCP par défaut
         if bcp_path is None:
@@ -96,41 +424,19 @@ class BCPExporter:
         logger.info(f"   Mode: {'WSL' if use_wsl else 'Natif'}")
         logger.info(f"   BCP: {self.bcp_path}")
         #logger.info(f"   Serveur: {self.server}")
-    
-    # ===EXPORT BCP (équivalent code PowerShell) ============
-    def windows_to_wsl_path(windows_path: str) -> str:
-        """Convertit un chemin Windows en chemin WSL (/mnt/c/... style)."""
-        path = Path(windows_path)
-        if ":" in str(path):
-            drive, rest = str(path).split(":", 1)
-            drive = drive.lower()
-            rest = rest.replace("\\", "/").lstrip("/")
-            return f"/mnt/{drive}/{rest}"
-        else:
-            return str(path)
 
-    def export(
+    def _build_command(
         self,
-        table_name: str,
+        query: str,
         output_path: Path,
-        query: str = None,
-        delimiter: str = "|",
-        top_n: int = 10000000,
-    ) -> Tuple[bool, float, float]:
+        delimiter: str,
+        format_file: Optional[Path] = None,
+    ) -> List[str]:
         """
-        Export BCP SQL Server → CSV à partir du nom de la table.
-        - table_name: nom complet avec schéma (ex: v_Inventory_Parts_Ops)
-        - output_path: chemin du fichier CSV
-        - delimiter: séparateur CSV
-        - top_n: nombre maximal de lignes à exporter
-        Returns: Tuple (success, duration_seconds, file_size_MB)
+        Construit la ligne de commande bcp queryout (WSL ou natif).
+        format_file: export en format natif (-n) décrit par ce fichier de format,
+        au lieu du mode caractère
         """
-        # Construire la requête automatiquement
-        if query == None:
-            query = f"SELECT TOP {top_n} * FROM {table_name} WITH (NOLOCK)"
-
-        start = time.time()
-        output_path.parent.mkdir(parents=True, exist_ok=True)
         #connection_string = r"bodsql\bi01" ##self.server  # ton serveur MSSQL
         server = self.server  # ton serveur MSSQL
         connection_string = f"{server};Encrypt=no;TrustServerCertificate=yes"
@@ -140,16 +446,23 @@ class BCPExporter:
             logger.info(f"   Chemin Windows: {output_path}")
             logger.info(f"   Chemin WSL: {wsl_output}")
 
-            cmd = [
+            if format_file is not None:
+                data_options = ["-f", windows_to_wsl_path(str(format_file))]
+            else:
+                data_options = [
+                    "-c",              # caractère standard
+                    "-C", "65001",     # UTF-8
+                    "-t", delimiter,
+                    "-r", "\\n",
+                ]
+
+            return [
                 "wsl",
                 self.bcp_path,
                 query,
                 "queryout",
                 wsl_output,
-                "-c",              # caractère standard
-                "-C", "65001",     # UTF-8
-                "-t", delimiter,
-                "-r", "\\n",
+                *data_options,
                 "-b", "100000",          # Batch de 100k rows
                 "-a", "32767",           # Packet size max
                 "-S", connection_string,
@@ -157,86 +470,956 @@ class BCPExporter:
                 "-U", self.username,
                 "-P", self.password,
             ]
+
+        logger.info("💻 Mode natif")
+        if format_file is not None:
+            data_options = ["-f", str(format_file)]
         else:
-            logger.info("💻 Mode natif")
-            cmd = [
-                self.bcp_path,
-                query,
-                "queryout",
-                str(output_path),
+            data_options = [
                 "-c",              # caractère standard
                 "-C", "65001",     # UTF-8
                 "-t", delimiter,
                 "-r", "\n",
-                "-b", "100000",          # Batch de 100k rows
-                "-a", "32767",           # Packet size max
-                "-S", connection_string,
-                "-d", self.database,
-                "-U", self.username,
-                "-P", self.password,    
             ]
-        # Masquer le mot de passe dans les logs
+        return [
+            self.bcp_path,
+            query,
+            "queryout",
+            str(output_path),
+            *data_options,
+            "-b", "100000",          # Batch de 100k rows
+            "-a", "32767",           # Packet size max
+            "-S", connection_string,
+            "-d", self.database,
+            "-U", self.username,
+            "-P", self.password,    
+        ]
+
+    def _build_format_command(self, query: str, format_path: Path) -> List[str]:
+        """Ligne de commande bcp format: fichier de format XML du mode natif (-n) pour la requête"""
+        connection_string = f"{self.server};Encrypt=no;TrustServerCertificate=yes"
+        prefix = ["wsl", self.bcp_path] if self.use_wsl else [self.bcp_path]
+        target = windows_to_wsl_path(str(format_path)) if self.use_wsl else str(format_path)
+        return [
+            *prefix,
+            query,
+            "format", "nul",
+            "-n",              # format natif
+            "-x",              # fichier de format XML
+            "-f", target,
+            "-S", connection_string,
+            "-d", self.database,
+            "-U", self.username,
+            "-P", self.password,
+        ]
+
+    @staticmethod
+    def _mask_command(cmd: List[str]) -> str:
+        """Masquer serveur, base et identifiants dans les logs"""
         cmd_display = cmd.copy()
-        if "-S" in cmd_display:
-            pwd_index = cmd_display.index("-S") + 1
-            cmd_display[pwd_index] = "***"
+        for flag in ("-S", "-P", "-U", "-d"):
+            if flag in cmd_display:
+                cmd_display[cmd_display.index(flag) + 1] = "***"
+        return " ".join(cmd_display)
+
+    def _run(
+        self,
+        cmd: List[str],
+        output_path: Path,
+        expected_rows: Optional[int] = None,
+        count_rows: bool = True,
+        stall_paused: Optional[threading.Event] = None,
+        cancel: Optional[threading.Event] = None,
+    ) -> Tuple[float, float]:
+        """
+        Lance bcp, lit sa sortie au fil de l'eau et vérifie le fichier produit.
+        - progression (lignes, rows/sec, ETA si expected_rows) toutes les
+          Config.BCP_PROGRESS_INTERVAL secondes via on_progress
+        - bcp est tué si aucune ligne n'arrive pendant stall_timeout secondes,
+          sauf pendant que stall_paused est levé (lecteur du FIFO occupé ailleurs)
+        - bcp est tué dès que cancel est levé (échec d'un bcp voisin)
+        - count_rows: lignes de bcp ajoutées à rows_exported (False si l'appelant
+          les compte lui-même)
+        Returns: Tuple (duration_seconds, file_size_MB), taille 0 pour un FIFO
+        """
+        logger.info(f"🔄 Commande BCP: {self._mask_command(cmd)}")
 
-        if "-P" in cmd_display:
-            pwd_index = cmd_display.index("-P") + 1
-            cmd_display[pwd_index] = "***"
+        start = time.time()
+        process = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            text=True, errors="replace", bufsize=1,
+        )
+        state = {"rows": 0, "last_progress": start}
+        tail = deque(maxlen=50)
 
-        if "-U" in cmd_display:
-            pwd_index = cmd_display.index("-U") + 1
-            cmd_display[pwd_index] = "***"
+        def read_output():
+            # Lecture continue: bcp ne bloque jamais sur un pipe plein
+            for line in process.stdout:
+                tail.append(line.rstrip())
+                match = BCP_ROWS_PATTERN.search(line)
+                if match:
+                    rows = int(match.group(1) or match.group(2))
+                    if rows > state["rows"]:
+                        state["rows"] = rows
+                        state["last_progress"] = time.time()
 
-        if "-d" in cmd_display:
-            pwd_index = cmd_display.index("-d") + 1
-            cmd_display[pwd_index] = "***"
-        logger.info(f"🔄 Commande BCP: {' '.join(cmd_display)}")
+        reader = threading.Thread(target=read_output, daemon=True)
+        reader.start()
 
+        last_report = start
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True, check=False)
-            duration = time.time() - start
+            while True:
+                try:
+                    process.wait(timeout=1)
+                    break
+                except subprocess.TimeoutExpired:
+                    pass
 
-            if result.returncode != 0:
-                logger.error(f"❌ BCP a échoué (code {result.returncode})")
-                logger.error(f"STDOUT: {result.stdout}")
-                logger.error(f"STDERR: {result.stderr}")
-                raise subprocess.CalledProcessError(
-                    result.returncode, cmd, output=result.stdout, stderr=result.stderr
-                )
+                if cancel is not None and cancel.is_set():
+                    raise RuntimeError(f"bcp annulé ({state['rows']:,} lignes exportées dans {output_path.name})")
+                now = time.time()
+                if stall_paused is not None and stall_paused.is_set():
+                    state["last_progress"] = now
+                if self.stall_timeout and now - state["last_progress"] > self.stall_timeout:
+                    raise TimeoutError(
+                        f"bcp bloqué: aucune ligne reçue depuis {self.stall_timeout}s "
+                        f"({state['rows']:,} lignes exportées dans {output_path.name})"
+                    )
+                if now - last_report >= Config.BCP_PROGRESS_INTERVAL:
+                    last_report = now
+                    rows_per_sec = state["rows"] / (now - start)
+                    eta = None
+                    if expected_rows and rows_per_sec > 0:
+                        eta = max(expected_rows - state["rows"], 0) / rows_per_sec
+                    self.on_progress(output_path.name, state["rows"], rows_per_sec, eta)
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            reader.join(timeout=10)
+
+        duration = time.time() - start
+        if count_rows:
+            with self._rows_lock:
+                self.rows_exported += state["rows"]
+
+        if process.returncode != 0:
+            output = "\n".join(tail)
+            logger.error(f"❌ BCP a échoué (code {process.returncode})")
+            logger.error(f"SORTIE: {output}")
+            raise subprocess.CalledProcessError(process.returncode, cmd, output=output)
+
+        if not output_path.exists():
+            raise FileNotFoundError(f"Le fichier de sortie n'a pas été créé: {output_path}")
 
-            if not output_path.exists():
-                raise FileNotFoundError(f"Le fichier de sortie n'a pas été créé: {output_path}")
+        size_mb = output_path.stat().st_size / (1024 * 1024) if output_path.is_file() else 0.0
+        logger.info(
+            f"   {output_path.name}: {state['rows']:,} lignes, "
+            f"{state['rows'] / duration if duration else 0:,.0f} rows/sec"
+        )
+        return duration, size_mb
 
-            size_mb = output_path.stat().st_size / (1024 * 1024)
+    def export(
+        self,
+        table_name: str,
+        output_path: Path,
+        query: str = None,
+        delimiter: str = "|",
+        top_n: Optional[int] = None,
+        where: Optional[str] = None,
+        expected_rows: Optional[int] = None,
+    ) -> Tuple[bool, float, float]:
+        """
+        Export BCP SQL Server → CSV à partir du nom de la table.
+        - table_name: nom complet avec schéma (ex: v_Inventory_Parts_Ops)
+        - output_path: chemin du fichier CSV
+        - delimiter: séparateur CSV
+        - top_n: nombre maximal de lignes à exporter (None: pas de limite)
+        - where: filtre optionnel (ex: "[DateModif] > '2024-01-01'")
+        - expected_rows: nombre de lignes attendu, pour l'ETA de la progression
+        Returns: Tuple (success, duration_seconds, file_size_MB)
+        """
+        # Construire la requête automatiquement
+        if query == None:
+            top = f"TOP {top_n} " if top_n else ""
+            query = f"SELECT {top}* FROM {table_name} WITH (NOLOCK)"
+            if where:
+                query += f" WHERE {where}"
+
+        start = time.time()
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        cmd = self._build_command(query, output_path, delimiter)
+
+        try:
+            _, size_mb = self._run(cmd, output_path, expected_rows)
+            duration = time.time() - start
             logger.info(f"✅ Export BCP réussi: Durée {duration:.2f}s, Taille {size_mb:.2f} MB")
             return True, duration, size_mb
 
         except subprocess.CalledProcessError as e:
             logger.error(f"❌ Erreur subprocess: code {e.returncode}")
-            logger.error(f"STDOUT: {e.stdout}")
-            logger.error(f"STDERR: {e.stderr}")
             raise
         except Exception as e:
             logger.error(f"❌ Erreur inattendue: {e}")
             raise
 
+    def export_native(
+        self,
+        table_name: str,
+        output_path: Path,
+        query: str,
+    ) -> Tuple[bool, float, float, Path]:
+        """
+        Export BCP en format natif (-n): valeurs binaires, sans formatage texte
+        des dates / décimaux, sans délimiteur ni encodage.
+        Le fichier de format XML est généré pour la requête puis utilisé par l'export
+        (et par le décodage, voir parquet_export.convert_bcp_native_to_parquet).
+        Returns: Tuple (success, duration_seconds, file_size_MB, format_file)
+        """
+        start = time.time()
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        format_path = output_path.with_suffix(".xml")
+
+        try:
+            self._run(self._build_format_command(query, format_path), format_path)
+            _, size_mb = self._run(
+                self._build_command(query, output_path, "", format_file=format_path),
+                output_path,
+            )
+            duration = time.time() - start
+            logger.info(f"✅ Export BCP natif réussi: Durée {duration:.2f}s, Taille {size_mb:.2f} MB")
+            return True, duration, size_mb, format_path
+
+        except subprocess.CalledProcessError as e:
+            logger.error(f"❌ Erreur subprocess: code {e.returncode}")
+            raise
+
+    def build_partition_queries(
+        self,
+        table_name: str,
+        partition_column: str,
+        num_partitions: int,
+        strategy: str = "hash",
+        where: Optional[str] = None,
+    ) -> List[str]:
+        """
+        Découpe l'export d'une table en N requêtes disjointes (voir build_partition_conditions)
+        - where: filtre optionnel appliqué à toutes les partitions
+        Returns: une requête SELECT par partition
+        """
+        filtered = f" WHERE ({where})" if where else ""
+        base = f"SELECT * FROM {table_name} WITH (NOLOCK){filtered}"
+        base = f"{base} AND" if where else f"{base} WHERE"
+        return [
+            f"{base} {condition}"
+            for condition in build_partition_conditions(table_name, partition_column, num_partitions, strategy, where)
+        ]
+
+    def export_partitioned(
+        self,
+        table_name: str,
+        output_path: Path,
+        partition_column: str,
+        num_partitions: int = Config.BCP_PARTITIONS,
+        strategy: str = "hash",
+        max_parallel: int = Config.BCP_MAX_PARALLEL,
+        delimiter: str = "|",
+        where: Optional[str] = None,
+        expected_rows: Optional[int] = None,
+    ) -> Tuple[bool, float, float, List[Path]]:
+        """
+        Export BCP partitionné: N processus bcp en parallèle, un fichier par partition.
+        - partition_column: colonne de découpage (clé ou colonne numérique)
+        - num_partitions: nombre de partitions N
+        - strategy: "hash" ou "range" (voir build_partition_queries)
+        - max_parallel: nombre maximal de bcp simultanés
+        Pas de TOP N ici: chaque partition exporte toute sa tranche.
+        Returns: Tuple (success, duration_seconds, total_size_MB, partition_files)
+        """
+        start = time.time()
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+
+        queries = self.build_partition_queries(
+            table_name, partition_column, num_partitions, strategy, where
+        )
+        files = [get_partition_path(output_path, i) for i in range(len(queries))]
+
+        logger.info(
+            f"🔀 Export partitionné de {table_name}: {len(queries)} partitions "
+            f"({strategy} sur {partition_column}), {max_parallel} bcp en parallèle"
+        )
+
+        total_size_mb = 0.0
+        # Levé au premier échec: les bcp en cours sont tués (pas d'attente de leur fin)
+        cancel = threading.Event()
+        with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+            futures = {
+                executor.submit(
+                    self._run,
+                    self._build_command(query, path, delimiter),
+                    path,
+                    expected_rows // len(queries) if expected_rows else None,
+                    cancel=cancel,
+                ): path
+                for query, path in zip(queries, files)
+            }
+            try:
+                for future in as_completed(futures):
+                    duration, size_mb = future.result()
+                    total_size_mb += size_mb
+                    logger.info(
+                        f"   ✓ {futures[future].name}: {duration:.2f}s, {size_mb:.2f} MB"
+                    )
+            except Exception as e:
+                logger.error(f"❌ Partition en échec, arrêt des partitions restantes: {e}")
+                cancel.set()
+                for pending in futures:
+                    pending.cancel()
+                raise
+
+        duration = time.time() - start
+        logger.info(
+            f"✅ Export BCP partitionné réussi: Durée {duration:.2f}s, "
+            f"Taille {total_size_mb:.2f} MB, {len(files)} fichiers"
+        )
+        return True, duration, total_size_mb, files
+
+    def build_key_boundaries(
+        self,
+        table_name: str,
+        key_column: str,
+        chunk_rows: int = Config.RESUME_CHUNK_ROWS,
+        where: Optional[str] = None,
+    ) -> List[List[str]]:
+        """
+        Bornes des tranches d'un export par plage de clé: une valeur de key_column
+        toutes les chunk_rows lignes (ROW_NUMBER sur la clé, lecture de l'index seul
+        si la clé est indexée).
+        Returns: bornes hautes [valeur texte, type] croissantes (voir watermark_to_text)
+        """
+        filtered = f" AND ({where})" if where else ""
+        engine = get_mssql_engine()
+        with engine.connect() as conn:
+            result = conn.execute(text(
+                f"SELECT k.[{key_column}] FROM ("
+                f"SELECT [{key_column}], ROW_NUMBER() OVER (ORDER BY [{key_column}]) AS rn "
+                f"FROM {table_name} WITH (NOLOCK) WHERE [{key_column}] IS NOT NULL{filtered}"
+                f") AS k WHERE k.rn % :chunk_rows = 0 ORDER BY k.rn"
+            ), {"chunk_rows": chunk_rows})
+
+            boundaries = []
+            for (value,) in result:
+                boundary = list(watermark_to_text(value))
+                # Clé non unique: une même valeur ne borne qu'une seule tranche
+                if not boundaries or boundaries[-1] != boundary:
+                    boundaries.append(boundary)
+        return boundaries
+
+    @staticmethod
+    def build_key_range_queries(
+        table_name: str,
+        key_column: str,
+        boundaries: List[List[str]],
+        where: Optional[str] = None,
+    ) -> List[str]:
+        """
+        Une requête par tranche ]borne précédente, borne]: la première prend aussi les
+        NULL, la dernière tout ce qui dépasse la dernière borne. Les tranches sont
+        disjointes et couvrent toute la table, quelle que soit la répartition des clés.
+        """
+        filtered = f" AND ({where})" if where else ""
+        column = f"[{key_column}]"
+        literals = [watermark_literal(value, value_type) for value, value_type in boundaries]
+
+        conditions = []
+        for i in range(len(literals) + 1):
+            if i == 0:
+                conditions.append(f"({column} IS NULL OR {column} <= {literals[0]})" if literals else "1 = 1")
+            elif i < len(literals):
+                conditions.append(f"{column} > {literals[i - 1]} AND {column} <= {literals[i]}")
+            else:
+                conditions.append(f"{column} > {literals[-1]}")
+
+        return [
+            f"SELECT * FROM {table_name} WITH (NOLOCK) WHERE {condition}{filtered}"
+            for condition in conditions
+        ]
+
+    def export_resumable(
+        self,
+        table_name: str,
+        output_path: Path,
+        key_column: str,
+        chunk_rows: int = Config.RESUME_CHUNK_ROWS,
+        manifest_path: Optional[Path] = None,
+        max_parallel: int = Config.BCP_MAX_PARALLEL,
+        delimiter: str = "|",
+        where: Optional[str] = None,
+        split_target_mb: int = Config.SPLIT_TARGET_MB,
+    ) -> Tuple[bool, float, float, List[Path]]:
+        """
+        Export complet par tranches de clé (~chunk_rows lignes, un fichier par tranche),
+        repris là où il s'est arrêté après un échec ou une relance Dagster.
+        - les bornes des tranches et les tranches terminées (fichiers produits, déjà
+          découpés pour COPY INTO) sont enregistrées dans le manifeste JSON
+        - au passage suivant, une tranche terminée dont les fichiers existent n'est
+          pas réexportée; une tranche interrompue est refaite entièrement
+        - un manifeste d'un autre export (clé, filtre, taille de tranche) ou plus
+          ancien que Config.RESUME_MAX_AGE_HOURS est ignoré: export repris de zéro
+        output_path doit survivre au run (voir get_resumable_output_path).
+        Returns: Tuple (success, duration_seconds, total_size_MB, files)
+        """
+        start = time.time()
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        manifest_path = manifest_path or output_path.with_name(f"{output_path.stem}.manifest.json")
+        signature = {
+            "table": table_name,
+            "key_column": key_column,
+            "where": where,
+            "chunk_rows": chunk_rows,
+        }
+
+        manifest = load_export_manifest(manifest_path)
+        if manifest is not None:
+            age_hours = (time.time() - manifest.get("created_at", 0)) / 3600
+            if any(manifest.get(k) != v for k, v in signature.items()):
+                logger.info(f"♻️  Manifeste d'un autre export ignoré: {manifest_path.name}")
+                manifest = None
+            elif age_hours > Config.RESUME_MAX_AGE_HOURS:
+                logger.info(f"♻️  Manifeste de plus de {Config.RESUME_MAX_AGE_HOURS}h ignoré: {manifest_path.name}")
+                manifest = None
 
-def export_mssql_bcp(table_name: str, logger, top_n: int = 10000000) -> bool:
-    """Export BCP depuis SQL Server avec support WSL."""
+        if manifest is None:
+            for existing in output_path.parent.glob(f"{output_path.stem}_*{output_path.suffix}"):
+                existing.unlink()
+            boundaries = self.build_key_boundaries(table_name, key_column, chunk_rows, where)
+            manifest = {**signature, "created_at": time.time(), "boundaries": boundaries, "chunks": {}}
+            save_export_manifest(manifest_path, manifest)
+
+        queries = self.build_key_range_queries(table_name, key_column, manifest["boundaries"], where)
+        chunk_files = {
+            int(index): [output_path.with_name(name) for name in chunk["files"]]
+            for index, chunk in manifest["chunks"].items()
+            if all(output_path.with_name(name).exists() for name in chunk["files"])
+        }
+        total_size_mb = sum(
+            manifest["chunks"][str(index)]["size_mb"] for index in chunk_files
+        )
+        pending = [i for i in range(len(queries)) if i not in chunk_files]
+
+        if chunk_files:
+            logger.info(
+                f"🔁 Reprise de l'export de {table_name}: {len(chunk_files)}/{len(queries)} "
+                f"tranches déjà exportées, {len(pending)} restantes"
+            )
+        else:
+            logger.info(
+                f"🧩 Export de {table_name} en {len(queries)} tranches de ~{chunk_rows:,} lignes "
+                f"(clé {key_column}), {max_parallel} bcp en parallèle"
+            )
+
+        manifest_lock = threading.Lock()
+
+        def export_chunk(index: int) -> Tuple[float, float]:
+            path = get_partition_path(output_path, index)
+            # Fichiers d'une tentative interrompue de cette tranche
+            for leftover in [path, *output_path.parent.glob(f"{path.stem}_split*{path.suffix}")]:
+                leftover.unlink(missing_ok=True)
+
+            duration, size_mb = self._run(
+                self._build_command(queries[index], path, delimiter), path, chunk_rows
+            )
+            pieces = split_export_file(path, split_target_mb)
+            with manifest_lock:
+                chunk_files[index] = pieces
+                manifest["chunks"][str(index)] = {
+                    "files": [piece.name for piece in pieces],
+                    "size_mb": size_mb,
+                }
+                save_export_manifest(manifest_path, manifest)
+            return duration, size_mb
+
+        with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+            futures = {executor.submit(export_chunk, index): index for index in pending}
+            try:
+                for future in as_completed(futures):
+                    duration, size_mb = future.result()
+                    total_size_mb += size_mb
+                    logger.info(
+                        f"   ✓ tranche {futures[future] + 1}/{len(queries)}: {duration:.2f}s, {size_mb:.2f} MB"
+                    )
+            except Exception as e:
+                logger.error(
+                    f"❌ Tranche en échec, annulation des tranches restantes "
+                    f"(reprise possible depuis {manifest_path}): {e}"
+                )
+                for waiting in futures:
+                    waiting.cancel()
+                raise
+
+        files = [path for index in sorted(chunk_files) for path in chunk_files[index]]
+        duration = time.time() - start
+        logger.info(
+            f"✅ Export BCP par tranches réussi: Durée {duration:.2f}s, "
+            f"Taille {total_size_mb:.2f} MB, {len(files)} fichiers"
+        )
+        return True, duration, total_size_mb, files
+
+    def export_chunked(
+        self,
+        table_name: str,
+        output_path: Path,
+        on_chunk: Callable[[Path], None],
+        chunk_rows: int = Config.STREAM_CHUNK_ROWS,
+        chunk_mb: int = Config.STREAM_CHUNK_MB,
+        query: str = None,
+        delimiter: str = "|",
+        top_n: Optional[int] = None,
+    ) -> Tuple[bool, float, float, int]:
+        """
+        Export BCP en fichiers tournants: bcp écrit dans un FIFO, lu ici et
+        découpé en fichiers de chunk_rows lignes au plus (ou ~chunk_mb MB, en
+        coupant toujours sur une fin de ligne). on_chunk est appelé avec le chemin
+        de chaque fichier fermé, pendant que l'export continue.
+        bcp tourne via _run (progression, arrêt après stall_timeout sans ligne reçue);
+        le temps passé dans on_chunk ne compte pas comme un blocage de bcp.
+        Non disponible en mode WSL (FIFO Linux uniquement).
+        Returns: Tuple (success, duration_seconds, total_size_MB, nb_chunks)
+        """
+        if self.use_wsl:
+            raise ValueError("❌ L'export en chunks nécessite bcp natif (FIFO), pas WSL")
+
+        if query == None:
+            top = f"TOP {top_n} " if top_n else ""
+            query = f"SELECT {top}* FROM {table_name} WITH (NOLOCK)"
+
+        start = time.time()
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        fifo_path = output_path.with_suffix(".fifo")
+        if fifo_path.exists():
+            fifo_path.unlink()
+        os.mkfifo(fifo_path)
+
+        cmd = self._build_command(query, fifo_path, delimiter)
+        errors = []
+        reading_done = threading.Event()
+        # Levé pendant on_chunk: bcp attend le lecteur du FIFO, il n'est pas bloqué
+        in_callback = threading.Event()
+
+        def wait_bcp():
+            try:
+                # Lignes comptées ici à la fermeture de chaque chunk
+                self._run(cmd, fifo_path, count_rows=False, stall_paused=in_callback)
+            except BaseException as e:
+                errors.append(e)
+            # Si bcp échoue avant d'ouvrir le FIFO, le lecteur resterait bloqué sur open():
+            # on ouvre puis referme un écrivain factice tant que la lecture n'est pas finie
+            while not reading_done.is_set():
+                try:
+                    os.close(os.open(fifo_path, os.O_WRONLY | os.O_NONBLOCK))
+                    break
+                except OSError:
+                    time.sleep(0.1)
+
+        waiter = threading.Thread(target=wait_bcp, daemon=True)
+        waiter.start()
+
+        chunk_bytes_max = chunk_mb * 1024 * 1024
+        chunk_index = 0
+        total_bytes = 0
+        chunk_file = None
+        chunk_path = None
+        rows = 0
+        written = 0
+        remainder = b""
+
+        def open_chunk():
+            nonlocal chunk_file, chunk_path, rows, written
+            chunk_path = output_path.with_name(
+                f"{output_path.stem}_chunk{chunk_index:05d}{output_path.suffix}"
+            )
+            chunk_file = open(chunk_path, "wb")
+            rows = written = 0
+
+        def close_chunk():
+            nonlocal chunk_file, chunk_index
+            chunk_file.close()
+            chunk_file = None
+            chunk_index += 1
+            with self._rows_lock:
+                self.rows_exported += rows
+            logger.info(f"   ✓ {chunk_path.name}: {rows:,} lignes, {written / (1024 * 1024):.2f} MB")
+            in_callback.set()
+            try:
+                on_chunk(chunk_path)
+            finally:
+                in_callback.clear()
+
+        try:
+            with open(fifo_path, "rb") as fifo:
+                while True:
+                    block = fifo.read(4 * 1024 * 1024)
+                    if not block:
+                        break
+                    block = remainder + block
+                    cut = block.rfind(b"\n") + 1
+                    block, remainder = block[:cut], block[cut:]
+
+                    while block:
+                        if chunk_file is None:
+                            open_chunk()
+
+                        # Couper sur le chunk_rows-ième saut de ligne si le bloc déborde
+                        part = block
+                        missing_rows = chunk_rows - rows
+                        if part.count(b"\n") > missing_rows:
+                            pos = -1
+                            for _ in range(missing_rows):
+                                pos = part.index(b"\n", pos + 1)
+                            part = part[:pos + 1]
+                        block = block[len(part):]
+
+                        chunk_file.write(part)
+                        rows += part.count(b"\n")
+                        written += len(part)
+                        total_bytes += len(part)
+
+                        if rows >= chunk_rows or written >= chunk_bytes_max:
+                            close_chunk()
+
+            reading_done.set()
+
+            if remainder:
+                # Dernière ligne sans terminateur
+                if chunk_file is None:
+                    open_chunk()
+                chunk_file.write(remainder)
+                rows += 1
+                written += len(remainder)
+                total_bytes += len(remainder)
+
+            waiter.join()
+            if errors:
+                # Échec ou blocage de bcp (déjà journalisé par _run)
+                raise errors[0]
+
+            if chunk_file is not None:
+                close_chunk()
+
+        finally:
+            reading_done.set()
+            if chunk_file is not None:
+                chunk_file.close()
+            fifo_path.unlink(missing_ok=True)
+
+        duration = time.time() - start
+        size_mb = total_bytes / (1024 * 1024)
+        logger.info(
+            f"✅ Export BCP (chunks) réussi: Durée {duration:.2f}s, "
+            f"Taille {size_mb:.2f} MB, {chunk_index} fichiers"
+        )
+        return True, duration, size_mb, chunk_index
+
+
+def build_partition_conditions(
+    table_name: str,
+    partition_column: str,
+    num_partitions: int,
+    strategy: str = "hash",
+    where: Optional[str] = None,
+) -> List[str]:
+    """
+    Conditions T-SQL de N partitions disjointes d'une table (export bcp partitionné,
+    lectures dlt parallèles)
+    - strategy "hash": ABS(CHECKSUM(col)) % N, fonctionne sur tout type de colonne
+    - strategy "range": tranches égales entre MIN et MAX d'une colonne numérique
+      (ValueError sur une colonne date ou texte: bornes non calculables)
+    - where: filtre des lignes concernées, pour le MIN / MAX de "range"
+    Returns: une condition par partition
+    """
+    if strategy == "hash":
+        # CAST en BIGINT: ABS(-2147483648) déborde sur un INT
+        return [
+            f"ABS(CAST(CHECKSUM([{partition_column}]) AS BIGINT)) % {num_partitions} = {i}"
+            for i in range(num_partitions)
+        ]
+
+    if strategy == "range":
+        filtered = f" WHERE ({where})" if where else ""
+        engine = get_mssql_engine()
+        with engine.connect() as conn:
+            min_value, max_value = conn.execute(text(
+                f"SELECT MIN([{partition_column}]), MAX([{partition_column}]) "
+                f"FROM {table_name} WITH (NOLOCK){filtered}"
+            )).one()
+
+        if min_value is None:
+            # Table vide (ou colonne entièrement NULL): une seule partition
+            return ["1 = 1"]
+        if isinstance(min_value, bool) or not isinstance(min_value, (int, float, Decimal)):
+            raise ValueError(
+                f"❌ Partitionnement \"range\" sur {table_name}.{partition_column}: "
+                f"colonne {type(min_value).__name__}, colonne numérique attendue (ou strategy \"hash\")"
+            )
+
+        step = (max_value - min_value) / num_partitions
+        conditions = []
+        for i in range(num_partitions):
+            lower = min_value + step * i
+            bounds = [] if i == 0 else [f"[{partition_column}] >= {lower}"]
+            if i < num_partitions - 1:
+                bounds.append(f"[{partition_column}] < {min_value + step * (i + 1)}")
+            condition = " AND ".join(bounds)
+            if i == 0:
+                # Les NULL ne tombent dans aucune tranche: on les rattache à la première
+                condition = f"([{partition_column}] IS NULL OR {condition})" if condition else "1 = 1"
+            conditions.append(condition)
+        return conditions
+
+    raise ValueError(f"Stratégie de partitionnement inconnue: {strategy}")
+
+
+def split_table_name(table_name: str) -> Tuple[str, str]:
+    """Sépare schéma et table (dbo par défaut)"""
+    if '.' in table_name:
+        schema_name, table_only = table_name.split('.', 1)
+        return schema_name, table_only
+    return 'dbo', table_name
+
+
+def get_mssql_column_type(table_name: str, column_name: str) -> str:
+    """
+    Type SQL Server d'une colonne, précision comprise pour les types date / heure
+    (ex: DATETIME, DATETIME2(3), DATETIMEOFFSET(7), INT), pour watermark_literal
+    """
+    schema_name, table_only = split_table_name(table_name)
+
+    engine = get_mssql_engine()
+    with engine.connect() as conn:
+        row = conn.execute(text("""
+            SELECT DATA_TYPE, DATETIME_PRECISION
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = :schema_name
+              AND TABLE_NAME = :table_name
+              AND COLUMN_NAME = :column_name
+        """), {"schema_name": schema_name, "table_name": table_only, "column_name": column_name}).first()
+
+    if row is None:
+        raise ValueError(f"❌ Colonne {column_name} absente de {schema_name}.{table_only}")
+    data_type, precision = row[0].upper(), row[1]
+    if data_type in ("DATETIME2", "DATETIMEOFFSET", "TIME") and precision is not None:
+        return f"{data_type}({precision})"
+    return data_type
+
+
+def get_primary_key_columns(table_name: str) -> List[str]:
+    """
+    Colonnes de la clé primaire d'une table SQL Server, dans l'ordre
+    (Change Tracking exige une clé primaire)
+    """
+    schema_name, table_only = split_table_name(table_name)
+
+    engine = get_mssql_engine()
+    with engine.connect() as conn:
+        result = conn.execute(text("""
+            SELECT kcu.COLUMN_NAME
+            FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS tc
+            JOIN INFORMATION_SCHEMA.KEY_COLUMN_USAGE kcu
+              ON kcu.CONSTRAINT_NAME = tc.CONSTRAINT_NAME
+             AND kcu.TABLE_SCHEMA = tc.TABLE_SCHEMA
+            WHERE tc.CONSTRAINT_TYPE = 'PRIMARY KEY'
+              AND tc.TABLE_SCHEMA = :schema_name
+              AND tc.TABLE_NAME = :table_name
+            ORDER BY kcu.ORDINAL_POSITION
+        """), {"schema_name": schema_name, "table_name": table_only})
+        keys = [row[0] for row in result]
+
+    if not keys:
+        raise ValueError(f"❌ Table '{schema_name}.{table_only}' sans clé primaire")
+    return keys
+
+
+def estimate_row_count(table_name: str, config_key: str = "default") -> Optional[int]:
+    """
+    Nombre de lignes d'une table (ou vue indexée) d'après les métadonnées, sans scan:
+    sys.dm_db_partition_stats, ou sys.partitions sans le droit VIEW DATABASE STATE.
+    Returns: None pour une vue non indexée ou une table inconnue
+    """
+    schema_name, table_only = split_table_name(table_name)
+    params = {"object_name": f"{schema_name}.{table_only}"}
+    try:
+        engine = get_mssql_engine(config_key)
+        with engine.connect() as conn:
+            try:
+                return conn.execute(text("""
+                    SELECT SUM(ps.row_count) FROM sys.dm_db_partition_stats ps
+                    WHERE ps.object_id = OBJECT_ID(:object_name) AND ps.index_id IN (0, 1)
+                """), params).scalar()
+            except Exception:
+                conn.rollback()
+                return conn.execute(text("""
+                    SELECT SUM(p.rows) FROM sys.partitions p
+                    WHERE p.object_id = OBJECT_ID(:object_name) AND p.index_id IN (0, 1)
+                """), params).scalar()
+    except Exception as e:
+        logger.warning(f"⚠️  Estimation du nombre de lignes impossible pour {table_name}: {e}")
+        return None
+
+
+def get_mssql_row_count(table_name: str, exact: bool = False, config_key: str = "default") -> Optional[int]:
+    """
+    Nombre de lignes d'une table / vue SQL Server.
+    - par défaut: estimation par les métadonnées (estimate_row_count), None pour une vue
+    - exact=True: COUNT_BIG(*), qui évalue toute la vue: à réserver aux contrôles
+    """
+    if not exact:
+        return estimate_row_count(table_name, config_key)
+
+    engine = get_mssql_engine(config_key)
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT_BIG(*) FROM {table_name} WITH (NOLOCK)")).scalar()
+
+
+class ChangeTrackingExporter(BCPExporter):
+    """
+    Export du delta d'une table via SQL Server Change Tracking:
+    lignes insérées / modifiées et clés supprimées depuis une version donnée.
+    Pré-requis côté source:
+        ALTER DATABASE ... SET CHANGE_TRACKING = ON (CHANGE_RETENTION = 2 DAYS, AUTO_CLEANUP = ON)
+        ALTER TABLE ... ENABLE CHANGE_TRACKING
+    """
+
+    def current_version(self) -> int:
+        """Version Change Tracking courante de la base"""
+        engine = get_mssql_engine()
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT CHANGE_TRACKING_CURRENT_VERSION()")).scalar()
+
+    def min_valid_version(self, table_name: str) -> Optional[int]:
+        """
+        Plus ancienne version encore exploitable pour la table
+        (None si Change Tracking n'est pas activé sur la table)
+        """
+        schema_name, table_only = split_table_name(table_name)
+        engine = get_mssql_engine()
+        with engine.connect() as conn:
+            return conn.execute(
+                text("SELECT CHANGE_TRACKING_MIN_VALID_VERSION(OBJECT_ID(:object_name))"),
+                {"object_name": f"{schema_name}.{table_only}"},
+            ).scalar()
+
+    @staticmethod
+    def build_changes_query(
+        table_name: str,
+        columns: List[str],
+        keys: List[str],
+        since_version: int,
+    ) -> str:
+        """
+        SELECT du delta: colonnes de la table dans l'ordre du DDL Snowflake,
+        puis SYS_CHANGE_OPERATION (I, U ou D).
+        Les clés viennent de CHANGETABLE (présentes aussi pour les suppressions),
+        les autres colonnes de la table (NULL pour une ligne supprimée).
+        """
+        schema_name, table_only = split_table_name(table_name)
+        source = f"[{schema_name}].[{table_only}]"
+
+        select_list = [
+            f"CT.[{col}]" if col in keys else f"T.[{col}]"
+            for col in columns
+        ]
+        # Ligne modifiée puis supprimée avant la lecture: on la traite comme une suppression
+        select_list.append(
+            f"CASE WHEN T.[{keys[0]}] IS NULL THEN 'D' ELSE CT.SYS_CHANGE_OPERATION END"
+        )
+        join = " AND ".join(f"T.[{key}] = CT.[{key}]" for key in keys)
+
+        return (
+            f"SELECT {', '.join(select_list)} "
+            f"FROM CHANGETABLE(CHANGES {source}, {int(since_version)}) AS CT "
+            f"LEFT JOIN {source} AS T ON {join}"
+        )
+
+    def export_changes(
+        self,
+        table_name: str,
+        output_path: Path,
+        since_version: int,
+        delimiter: str = "|",
+    ) -> Tuple[bool, float, float, int]:
+        """
+        Export BCP des changements depuis since_version.
+        La version courante est lue avant l'export: un changement commité pendant
+        l'export peut être relu au passage suivant, ce que le MERGE absorbe.
+        Returns: Tuple (success, duration_seconds, file_size_MB, version à persister)
+        """
+        min_version = self.min_valid_version(table_name)
+        if min_version is None:
+            raise ValueError(f"❌ Change Tracking non activé sur la table {table_name}")
+        if since_version < min_version:
+            raise ValueError(
+                f"❌ Version {since_version} purgée par la rétention Change Tracking "
+                f"(minimum {min_version}): rechargement complet nécessaire"
+            )
+
+        to_version = self.current_version()
+        columns = [col_name for col_name, _ in extract_mssql_table_schema(table_name)]
+        keys = get_primary_key_columns(table_name)
+        query = self.build_changes_query(table_name, columns, keys, since_version)
+
+        success, duration, size_mb = self.export(
+            table_name=table_name,
+            output_path=output_path,
+            query=query,
+            delimiter=delimiter,
+        )
+        logger.info(f"📌 Changements {since_version} → {to_version}")
+        return success, duration, size_mb, to_version
+
+
+def export_mssql_bcp(
+    table_name: str,
+    logger,
+    top_n: Optional[int] = None,
+    partition_column: Optional[str] = None,
+    num_partitions: int = Config.BCP_PARTITIONS,
+    partition_strategy: str = "hash",
+    max_parallel: int = Config.BCP_MAX_PARALLEL,
+    output_path: Optional[Path] = None,
+    split_target_mb: int = Config.SPLIT_TARGET_MB,
+    where: Optional[str] = None,
+    resume_key: Optional[str] = None,
+    chunk_rows: int = Config.RESUME_CHUNK_ROWS,
+) -> dict:
+    """
+    Export BCP depuis SQL Server avec support WSL.
+    Si partition_column est fourni et num_partitions > 1, l'export est
+    découpé en num_partitions fichiers produits en parallèle.
+    resume_key: export par tranches de chunk_rows lignes sur cette clé, repris
+    après échec (voir BCPExporter.export_resumable); les fichiers déjà exportés
+    dans output_path ne sont pas supprimés
+    top_n: limite optionnelle du nombre de lignes (None: table complète)
+    output_path: fichier de sortie (voir get_run_output_path), Config.OUTPUT_PATH par défaut
+    split_target_mb: taille cible compressée des fichiers pour COPY INTO (0 = pas de découpage)
+    where: filtre optionnel de l'export (ex: extraction incrémentale)
+    La progression de bcp (lignes, rows/sec, ETA) est envoyée au logger.
+    Returns: dict (success, rows, duration, rows_per_sec, size_mb)
+    """
+    output_path = output_path or Config.OUTPUT_PATH
     
     logger.info("=" * 80)
     logger.info(f"📤 Export BCP depuis SQL Server pour la table {table_name}")
     logger.info("=" * 80)
     
     # Créer le répertoire de sortie si nécessaire
-    Config.OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
     
-    # Supprimer le fichier existant
-    if Config.OUTPUT_PATH.exists():
-        Config.OUTPUT_PATH.unlink()
-        logger.info(f"🗑️  Fichier existant supprimé: {Config.OUTPUT_PATH}")
+    # Supprimer le fichier existant (et les partitions / découpes d'un export précédent)
+    previous_glob = f"{output_path.stem}_*{output_path.suffix}"
+    for existing in [output_path, *output_path.parent.glob(previous_glob)]:
+        if existing.exists() and not resume_key:
+            existing.unlink()
+            logger.info(f"🗑️  Fichier existant supprimé: {existing}")
     
     # Créer l'exporter BCP
     exporter = BCPExporter(
@@ -245,68 +1428,346 @@ def export_mssql_bcp(table_name: str, logger, top_n: int = 10000000) -> bool:
         username=Config.MSSQL_USER,
         password=Config.MSSQL_PASSWORD,
         use_wsl=Config.USE_WSL,
-        trust_server_certificate=True
+        trust_server_certificate=True,
+        on_progress=lambda *progress: logger.info(format_progress(*progress)),
     )
     
+    # Estimation pour l'ETA (tables uniquement, pas pour un export filtré)
+    expected_rows = None if where else estimate_row_count(table_name)
+    if expected_rows and top_n:
+        expected_rows = min(expected_rows, top_n)
+    
     logger.info(f"🔄 Exécution BCP...")
     start_time = time.time()
     
     try:
-        # Export BCP (retourne success, durée, taille)
-        success, bcp_duration, file_size_mb = exporter.export(
-            table_name=table_name,
-            output_path=Config.OUTPUT_PATH,
-            delimiter=Config.DELIMITER,
-            top_n=top_n
-        )
+        with span("export") as export_span:
+            if resume_key:
+                # Les tranches sont découpées pour COPY INTO au fil de l'export
+                success, bcp_duration, file_size_mb, files = exporter.export_resumable(
+                    table_name=table_name,
+                    output_path=output_path,
+                    key_column=resume_key,
+                    chunk_rows=chunk_rows,
+                    max_parallel=max_parallel,
+                    delimiter=Config.DELIMITER,
+                    where=where,
+                    split_target_mb=split_target_mb,
+                )
+            elif partition_column and num_partitions > 1:
+                success, bcp_duration, file_size_mb, files = exporter.export_partitioned(
+                    table_name=table_name,
+                    output_path=output_path,
+                    partition_column=partition_column,
+                    num_partitions=num_partitions,
+                    strategy=partition_strategy,
+                    max_parallel=max_parallel,
+                    delimiter=Config.DELIMITER,
+                    where=where,
+                    expected_rows=expected_rows,
+                )
+            else:
+                # Export BCP (retourne success, durée, taille)
+                success, bcp_duration, file_size_mb = exporter.export(
+                    table_name=table_name,
+                    output_path=output_path,
+                    delimiter=Config.DELIMITER,
+                    top_n=top_n,
+                    where=where,
+                    expected_rows=expected_rows,
+                )
+                files = [output_path]
+        
+            # Découper les gros fichiers pour paralléliser COPY INTO
+            if not resume_key:
+                files = [piece for f in files for piece in split_export_file(f, split_target_mb)]
+            export_span.rows = exporter.rows_exported
+            export_span.bytes = int(file_size_mb * 1024 * 1024)
         
         total_duration = time.time() - start_time
         
         # Log des informations
         logger.info(f"✅ Export BCP terminé en {total_duration:.2f}s")
         logger.info(f"   Temps BCP: {bcp_duration:.2f}s")
-        logger.info(f"   Fichier: {Config.OUTPUT_PATH}")
+        logger.info(f"   Fichiers: {', '.join(str(f) for f in files)}")
         logger.info(f"   Taille: {file_size_mb:.2f} MB")
+        rows_per_sec = exporter.rows_exported / bcp_duration if bcp_duration else 0.0
+        logger.info(f"   Lignes: {exporter.rows_exported:,} ({rows_per_sec:,.0f} rows/sec)")
         
-        return success
+        return {
+            'success': success,
+            'rows': exporter.rows_exported,
+            'duration': bcp_duration,
+            'rows_per_sec': rows_per_sec,
+            'size_mb': file_size_mb,
+        }
     
     except Exception as e:
         logger.error(f"❌ Erreur BCP: {e}")
         raise
 
-def get_mssql_engine():
-
-    driver   = os.getenv("MSSQL_DRIVER")
-    server   = os.getenv("MSSQL_SERVER")
-    port     = os.getenv("MSSQL_PORT")
-    database = os.getenv("MSSQL_DATABASE")
-    username = os.getenv("MSSQL_USER")
-    password = os.getenv("MSSQL_PASSWORD")
-
-    conn_str = (
-        f"DRIVER={driver};"
-        f"SERVER={server};"
-        f"DATABASE={database};"
-        f"UID={username};"
-        f"PWD={password};"
+
+def export_mssql_bcp_chunked(
+    table_name: str,
+    logger,
+    on_chunk: Callable[[Path], None],
+    top_n: Optional[int] = None,
+    chunk_rows: int = Config.STREAM_CHUNK_ROWS,
+    chunk_mb: int = Config.STREAM_CHUNK_MB,
+    output_path: Optional[Path] = None,
+) -> bool:
+    """
+    Export BCP en fichiers tournants (voir BCPExporter.export_chunked).
+    on_chunk reçoit chaque fichier fermé, par ex. pour le PUT en arrière-plan.
+    """
+    output_path = output_path or Config.OUTPUT_PATH
+
+    logger.info("=" * 80)
+    logger.info(f"📤 Export BCP en chunks depuis SQL Server pour la table {table_name}")
+    logger.info("=" * 80)
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Supprimer les chunks d'un export précédent
+    chunk_glob = f"{output_path.stem}_chunk*{output_path.suffix}"
+    for existing in output_path.parent.glob(chunk_glob):
+        existing.unlink()
+        logger.info(f"🗑️  Fichier existant supprimé: {existing}")
+
+    exporter = BCPExporter(
+        server=f"{Config.MSSQL_SERVER}",
+        database=Config.MSSQL_DATABASE,
+        username=Config.MSSQL_USER,
+        password=Config.MSSQL_PASSWORD,
+        use_wsl=Config.USE_WSL,
+        trust_server_certificate=True
+    )
+
+    try:
+        with span("export") as export_span:
+            success, bcp_duration, file_size_mb, nb_chunks = exporter.export_chunked(
+                table_name=table_name,
+                output_path=output_path,
+                on_chunk=on_chunk,
+                chunk_rows=chunk_rows,
+                chunk_mb=chunk_mb,
+                delimiter=Config.DELIMITER,
+                top_n=top_n,
+            )
+            export_span.rows = exporter.rows_exported
+            export_span.bytes = int(file_size_mb * 1024 * 1024)
+
+        logger.info(f"✅ Export BCP en chunks terminé en {bcp_duration:.2f}s")
+        logger.info(f"   Chunks: {nb_chunks}")
+        logger.info(f"   Taille: {file_size_mb:.2f} MB")
+
+        return success
+
+    except Exception as e:
+        logger.error(f"❌ Erreur BCP: {e}")
+        raise
+
+
+def export_mssql_changes(
+    table_name: str,
+    logger,
+    since_version: int,
+    output_path: Optional[Path] = None,
+    split_target_mb: int = Config.SPLIT_TARGET_MB,
+) -> int:
+    """
+    Export BCP du delta Change Tracking (voir ChangeTrackingExporter).
+    Returns: version Change Tracking à persister pour le prochain passage
+    """
+    output_path = output_path or Config.OUTPUT_PATH
+
+    logger.info("=" * 80)
+    logger.info(f"📤 Export des changements depuis SQL Server pour la table {table_name}")
+    logger.info("=" * 80)
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    previous_glob = f"{output_path.stem}_*{output_path.suffix}"
+    for existing in [output_path, *output_path.parent.glob(previous_glob)]:
+        if existing.exists():
+            existing.unlink()
+            logger.info(f"🗑️  Fichier existant supprimé: {existing}")
+
+    exporter = ChangeTrackingExporter(
+        server=f"{Config.MSSQL_SERVER}",
+        database=Config.MSSQL_DATABASE,
+        username=Config.MSSQL_USER,
+        password=Config.MSSQL_PASSWORD,
+        use_wsl=Config.USE_WSL,
+        trust_server_certificate=True
+    )
+
+    try:
+        with span("export") as export_span:
+            success, bcp_duration, file_size_mb, to_version = exporter.export_changes(
+                table_name=table_name,
+                output_path=output_path,
+                since_version=since_version,
+                delimiter=Config.DELIMITER,
+            )
+            files = split_export_file(output_path, split_target_mb)
+            export_span.rows = exporter.rows_exported
+            export_span.bytes = int(file_size_mb * 1024 * 1024)
+
+        logger.info(f"✅ Export des changements terminé en {bcp_duration:.2f}s")
+        logger.info(f"   Fichiers: {', '.join(str(f) for f in files)}")
+        logger.info(f"   Taille: {file_size_mb:.2f} MB")
+
+        return to_version
+
+    except Exception as e:
+        logger.error(f"❌ Erreur BCP: {e}")
+        raise
+
+
+## ENGINES SQL SERVER (un par clé de configuration et par process) ==============
+
+# Options ODBC par clé de configuration
+MSSQL_ENGINE_PROFILES = {
+    # Requêtes de métadonnées, schéma, exports Parquet
+    "default": (
+        "Encrypt=yes;"
+        "TrustServerCertificate=yes;"
+        "Connection Timeout=60;"
+    ),
+    # Extraction dlt: requêtes parallèles et gros paquets réseau
+    "dlt": (
         "Encrypt=yes;"
         "TrustServerCertificate=yes;"
+        "MARS_Connection=yes;"
+        "Packet Size=32767;"
         "Connection Timeout=60;"
+    ),
+}
+
+# Lignes par aller-retour des curseurs pyodbc (cursor.arraysize) par clé de configuration.
+# Appliqué au curseur: un "arraysize" dans l'URL odbc_connect est ignoré par SQLAlchemy.
+MSSQL_ENGINE_ARRAYSIZE = {
+    "dlt": 50_000,
+}
+
+
+def build_odbc_connection_string(config_key: str = "default") -> str:
+    """Chaîne de connexion ODBC pour une clé de MSSQL_ENGINE_PROFILES (pyodbc, turbodbc)"""
+    return (
+        f"DRIVER={os.getenv('MSSQL_DRIVER')};"
+        f"SERVER={os.getenv('MSSQL_SERVER')};"
+        f"DATABASE={os.getenv('MSSQL_DATABASE')};"
+        f"UID={os.getenv('MSSQL_USER')};"
+        f"PWD={os.getenv('MSSQL_PASSWORD')};"
+        f"{MSSQL_ENGINE_PROFILES[config_key]}"
     )
 
-    conn_str_encoded = urllib.parse.quote_plus(conn_str)
 
-    engine = create_engine(
-        f"mssql+pyodbc:///?odbc_connect={conn_str_encoded}",
-        pool_pre_ping=True,
-        pool_recycle=1800,
-        pool_size=5,
-        max_overflow=10,
-        connect_args={"timeout": 60},
-        fast_executemany=True,
+def build_mssql_url(config_key: str = "default") -> str:
+    """URL SQLAlchemy mssql+pyodbc pour une clé de MSSQL_ENGINE_PROFILES"""
+    conn_str = build_odbc_connection_string(config_key)
+    return f"mssql+pyodbc:///?odbc_connect={urllib.parse.quote_plus(conn_str)}"
+
+
+def build_connectorx_url(config_key: str = "default") -> str:
+    """
+    URL connectorx (client TDS natif, sans ODBC) de la base de l'engine config_key.
+    Un engine enregistré sur une autre base (SQLite des benchmarks) donne sa propre URL.
+    """
+    engine = get_mssql_engine(config_key)
+    if engine.dialect.name != "mssql":
+        return engine.url.render_as_string(hide_password=False)
+
+    # Instance nommée (serveur\instance): résolue par connectorx via SQL Browser
+    host, _, instance = os.getenv("MSSQL_SERVER", Config.MSSQL_SERVER).partition("\\")
+    user = urllib.parse.quote_plus(os.getenv("MSSQL_USER") or "")
+    password = urllib.parse.quote_plus(os.getenv("MSSQL_PASSWORD") or "")
+    # Même chiffrement que les connexions ODBC (Encrypt=yes;TrustServerCertificate=yes)
+    params = {"encrypt": "true", "trust_server_certificate": "true", "trusted_connection": "false"}
+    if instance:
+        params["instance_name"] = instance
+    return (
+        f"mssql://{user}:{password}@{host}:{Config.MSSQL_PORT}/{os.getenv('MSSQL_DATABASE')}"
+        f"?{urllib.parse.urlencode(params)}"
     )
 
-    return engine
+
+class MssqlEngineRegistry:
+    """
+    Engines SQLAlchemy SQL Server construits une seule fois par process et par clé
+    de configuration: les assets d'un même process partagent le pool de connexions.
+    Un process fils (fork) reconstruit ses propres engines.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = Config.MSSQL_POOL_SIZE,
+        max_overflow: int = Config.MSSQL_MAX_OVERFLOW,
+        pool_recycle: int = Config.MSSQL_POOL_RECYCLE,
+        odbc_pooling: bool = Config.MSSQL_ODBC_POOLING,
+    ):
+        self._lock = threading.Lock()
+        self._engines: Dict[Tuple[str, int], Engine] = {}
+        self.configure(pool_size, max_overflow, pool_recycle, odbc_pooling)
+
+    def configure(self, pool_size: int, max_overflow: int, pool_recycle: int, odbc_pooling: bool):
+        """Paramètres des prochains engines (Config.MSSQL_POOL_* par défaut)"""
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_recycle = pool_recycle
+        self.odbc_pooling = odbc_pooling
+
+    def get_engine(self, config_key: str = "default") -> Engine:
+        key = (config_key, os.getpid())
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is None:
+                # Pooling du driver ODBC: à fixer avant la première connexion pyodbc
+                import pyodbc
+                pyodbc.pooling = self.odbc_pooling
+
+                engine = create_engine(
+                    build_mssql_url(config_key),
+                    pool_pre_ping=True,
+                    pool_recycle=self.pool_recycle,
+                    pool_size=self.pool_size,
+                    max_overflow=self.max_overflow,
+                    connect_args={"timeout": 60},
+                    fast_executemany=True,
+                )
+                arraysize = MSSQL_ENGINE_ARRAYSIZE.get(config_key)
+                if arraysize:
+                    @event.listens_for(engine, "before_cursor_execute")
+                    def set_arraysize(conn, cursor, statement, parameters, context, executemany):
+                        cursor.arraysize = arraysize
+                self._engines[key] = engine
+                logger.info(f"🔌 Engine SQL Server '{config_key}' créé (pool {self.pool_size}+{self.max_overflow})")
+            return engine
+
+    def register(self, config_key: str, engine: Engine):
+        """
+        Engine déjà construit pour une clé, dans ce process (ex: base SQLite
+        synthétique des benchmarks à la place de SQL Server)
+        """
+        with self._lock:
+            self._engines[(config_key, os.getpid())] = engine
+
+    def dispose_all(self):
+        """Ferme les connexions de tous les engines du process"""
+        with self._lock:
+            for (config_key, pid), engine in list(self._engines.items()):
+                if pid == os.getpid():
+                    engine.dispose()
+                del self._engines[(config_key, pid)]
+
+
+mssql_engine_registry = MssqlEngineRegistry()
+
+
+def get_mssql_engine(config_key: str = "default") -> Engine:
+    """Engine SQL Server partagé du process (voir MssqlEngineRegistry)"""
+    return mssql_engine_registry.get_engine(config_key)
 
 
 ## Mapping Mssql to SNOWFLAKE ==========================
@@ -385,13 +1846,111 @@ def map_mssql_to_snowflake(
     return type_mapping.get(sql_type, 'VARCHAR(500)')
 
 
+## CACHE DES SCHÉMAS ==============
+_schema_cache_lock = threading.Lock()
+
+
+def load_schema_cache() -> dict:
+    """Cache des schémas: {"tables": {table: {fingerprint, columns}}, "ddl": {table snowflake: empreinte du DDL}}"""
+    try:
+        with open(Config.SCHEMA_CACHE_PATH, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        cache = {}
+    cache.setdefault("tables", {})
+    cache.setdefault("ddl", {})
+    return cache
+
+
+@contextmanager
+def schema_cache_lock():
+    """
+    Verrou exclusif du cache, entre threads et entre process (flock sur un fichier
+    .lock voisin): les runs du job de nuit et des partitions tournent dans des
+    process distincts, chacun relit, modifie puis remplace le même fichier
+    """
+    with _schema_cache_lock:
+        Config.SCHEMA_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        lock_path = Config.SCHEMA_CACHE_PATH.with_name(f"{Config.SCHEMA_CACHE_PATH.name}.lock")
+        with open(lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def update_schema_cache(section: str, key: str, value) -> None:
+    """
+    Écrit une entrée du cache: lecture, modification et remplacement sous
+    schema_cache_lock (sinon la mise à jour d'un autre process serait perdue),
+    écriture atomique (un lecteur ne voit jamais un fichier à moitié écrit)
+    """
+    with schema_cache_lock():
+        cache = load_schema_cache()
+        cache[section][key] = value
+        tmp_path = Config.SCHEMA_CACHE_PATH.with_name(f"{Config.SCHEMA_CACHE_PATH.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_path, Config.SCHEMA_CACHE_PATH)
+
+
+def get_table_fingerprint(table_name: str) -> Optional[str]:
+    """
+    Empreinte de la structure d'une table / vue: sys.objects.modify_date +
+    CHECKSUM_AGG sur sys.columns (nom, type, taille, précision, nullabilité).
+    Une seule requête légère, sans lecture de INFORMATION_SCHEMA.
+    Returns: empreinte, None si l'objet n'existe pas
+    """
+    schema_name, table_only = split_table_name(table_name)
+
+    engine = get_mssql_engine()
+    with engine.connect() as conn:
+        row = conn.execute(text("""
+            SELECT
+                CONVERT(VARCHAR(33), o.modify_date, 126),
+                (SELECT CHECKSUM_AGG(CHECKSUM(
+                            c.name, c.column_id, c.system_type_id, c.max_length,
+                            c.precision, c.scale, c.is_nullable))
+                   FROM sys.columns c
+                  WHERE c.object_id = o.object_id),
+                (SELECT COUNT(*) FROM sys.columns c WHERE c.object_id = o.object_id)
+            FROM sys.objects o
+            WHERE o.object_id = OBJECT_ID(:object_name)
+        """), {"object_name": f"{schema_name}.{table_only}"}).first()
+
+    if row is None:
+        return None
+    return f"{row[0]}|{row[1]}|{row[2]}"
+
+
+def ddl_digest(ddl: str) -> str:
+    """Empreinte d'un DDL Snowflake"""
+    return hashlib.md5(ddl.encode("utf-8")).hexdigest()
+
+
+def get_cached_ddl_digest(snowflake_table_name: str) -> Optional[str]:
+    """Empreinte du dernier DDL exécuté pour une table Snowflake"""
+    return load_schema_cache()["ddl"].get(snowflake_table_name.upper())
+
+
+def set_cached_ddl_digest(snowflake_table_name: str, ddl: str) -> None:
+    """Mémorise l'empreinte du DDL exécuté pour une table Snowflake"""
+    update_schema_cache("ddl", snowflake_table_name.upper(), ddl_digest(ddl))
+
+
 ## EXTRACTION DU SCHÉMA ==============
-def extract_mssql_table_schema(table_name: str) -> List[Tuple[str, str]]:
+def extract_mssql_table_schema(table_name: str, use_cache: bool = Config.SCHEMA_CACHE_ENABLED) -> List[Tuple[str, str]]:
     """
     Extrait le schéma d'une table SQL Server
+    Avec use_cache, le résultat est relu depuis Config.SCHEMA_CACHE_PATH tant que
+    l'empreinte de la table (get_table_fingerprint) n'a pas changé.
     
     Args:
         table_name: Nom de la table (ex: "v_Inventory_Parts_Ops" ou "dbo.MyTable")
+        use_cache: utiliser le cache des schémas
     
     Returns:
         Liste de tuples (column_name, snowflake_type)
@@ -404,11 +1963,16 @@ def extract_mssql_table_schema(table_name: str) -> List[Tuple[str, str]]:
     logger.info(f"📋 Extraction du schéma: {table_name}")
     
     # Séparer schéma et table si nécessaire
-    if '.' in table_name:
-        schema_name, table_only = table_name.split('.', 1)
-    else:
-        schema_name = 'dbo'
-        table_only = table_name
+    schema_name, table_only = split_table_name(table_name)
+    cache_key = f"{Config.MSSQL_DATABASE}.{schema_name}.{table_only}".upper()
+    
+    fingerprint = None
+    if use_cache:
+        fingerprint = get_table_fingerprint(table_name)
+        cached = load_schema_cache()["tables"].get(cache_key)
+        if fingerprint is not None and cached and cached["fingerprint"] == fingerprint:
+            logger.info(f"✅ {len(cached['columns'])} colonnes (cache, schéma inchangé)")
+            return [tuple(column) for column in cached["columns"]]
     
     engine = get_mssql_engine()
     
@@ -465,16 +2029,25 @@ def extract_mssql_table_schema(table_name: str) -> List[Tuple[str, str]]:
         
         logger.info(f"✅ {len(columns)} colonnes extraites")
         
+        if fingerprint is not None:
+            update_schema_cache("tables", cache_key, {"fingerprint": fingerprint, "columns": columns})
+        
         return columns
 
 
+def normalize_column_name(col_name: str) -> str:
+    """Nom de colonne côté Snowflake (accents é/è retirés, comme dans le DDL)"""
+    return col_name.replace("é","e").replace("è","e")
+
+
 ## Génére le schéma snowflake ==============
 
 def generate_snowflake_ddl(
     mssql_table_name: str,
     snowflake_table_name: str,
     snowflake_database: str = "NEEMBA",
-    snowflake_schema: str = "EQUIPEMENT"
+    snowflake_schema: str = "EQUIPEMENT",
+    if_not_exists: bool = False,
 ) -> str:
     """
     Génère le DDL Snowflake
@@ -484,6 +2057,8 @@ def generate_snowflake_ddl(
         snowflake_table: Nom table Snowflake
         snowflake_database: Base Snowflake
         snowflake_schema: Schéma Snowflake
+        if_not_exists: CREATE TABLE IF NOT EXISTS au lieu de CREATE OR REPLACE
+            (table existante jamais remplacée, ex: runs de partitions simultanées)
     
     Returns:
         DDL CREATE TABLE
@@ -502,14 +2077,14 @@ def generate_snowflake_ddl(
     columns = extract_mssql_table_schema(mssql_table_name)
     
     # Construire le DDL
+    create = "CREATE TABLE IF NOT EXISTS" if if_not_exists else "CREATE OR REPLACE TABLE"
     ddl_lines = [
-        f"CREATE OR REPLACE TABLE {snowflake_database}.{snowflake_schema}.{snowflake_table_name} (",
+        f"{create} {snowflake_database}.{snowflake_schema}.{snowflake_table_name} (",
     ]
     
     # Colonnes de la source
     for col_name, col_type in columns:
-        col_name = col_name.replace("é","e")
-        col_name = col_name.replace("è","e")
+        col_name = normalize_column_name(col_name)
 
         ddl_lines.append(f"    {col_name} {col_type},")
     
@@ -2,64 +2,46 @@ import dagster as dg
 from dagster import AssetExecutionContext
 from dagster_embedded_elt.dlt import DagsterDltResource, dlt_assets
 import dlt
-from dlt.sources.sql_database import sql_database
+from dlt.sources.sql_database import sql_database, sql_table
 from dlt.extract.resource import DltResource
-from sqlalchemy import create_engine, event, pool
-from sqlalchemy.engine import Engine
-import urllib.parse
-import os
+from sqlalchemy import text
 import time
 import logging
 import unicodedata
 import re
+from typing import List, Optional
+from mssql_data_nmbai.defs.config import Config, build_partition_conditions, get_mssql_engine
 from mssql_data_nmbai.defs.load_bcp_copy_into import extract_mssql_data
+from mssql_data_nmbai.defs.mssql_sources import extract_from_mssql, resolve_reader
+from mssql_data_nmbai.defs.tables import TABLES, TableSpec
 
 logger = logging.getLogger(__name__)
 
 
 
-def get_mssql_engine():
-
-    driver   = os.getenv("MSSQL_DRIVER")
-    server   = os.getenv("MSSQL_SERVER")
-    port     = os.getenv("MSSQL_PORT")
-    database = os.getenv("MSSQL_DATABASE")
-    username = os.getenv("MSSQL_USER")
-    password = os.getenv("MSSQL_PASSWORD")
-
-    conn_str = (
-        f"DRIVER={driver};"
-        f"SERVER={server};"
-        f"DATABASE={database};"
-        f"UID={username};"
-        f"PWD={password};"
-        "Encrypt=yes;"
-        "TrustServerCertificate=yes;"
-        "Connection Timeout=60;"
-    )
-
-    conn_str_encoded = urllib.parse.quote_plus(conn_str)
-
-    engine = create_engine(
-        f"mssql+pyodbc:///?odbc_connect={conn_str_encoded}",
-        pool_pre_ping=True,
-        pool_recycle=1800,
-        pool_size=5,
-        max_overflow=10,
-        connect_args={"timeout": 60},
-        fast_executemany=True,
-    )
-
-    return engine
-
 def create_dlt_source(
     table_name: str,
     max_retries: int = 3,
-    retry_delay: int = 5
+    retry_delay: int = 5,
+    reader: str = Config.DLT_READER,
+    partition_column: Optional[str] = None,
+    num_partitions: int = 1,
 ) -> DltResource:
     """
     Créer une source DLT mssql
+    - reader "sqlalchemy": sql_database dlt (backend pyarrow)
+    - reader "connectorx" / "turbodbc": chunks Arrow lus directement par le lecteur
+      natif (mssql_sources.extract_from_mssql), partitionnés si partition_column est
+      défini; retour à "sqlalchemy" si le lecteur n'est pas installé
     """
+    if resolve_reader(reader) != "sqlalchemy":
+        logger.info(f"✅ Source DLT créée pour {table_name} (lecteur {reader})")
+        return dlt.resource(extract_from_mssql, name=table_name)(
+            table_name,
+            reader=reader,
+            partition_column=partition_column,
+            num_partitions=num_partitions,
+        )
 
     for attempt in range(max_retries):
         try:
@@ -85,136 +67,120 @@ def create_dlt_source(
             
             if attempt < max_retries - 1:
                 logger.info(f"⏳ Retry dans {retry_delay}s...")
+                # Pas de dispose: l'engine est partagé par le process, et pool_pre_ping
+                # remplace déjà les connexions mortes (voir MssqlEngineRegistry)
                 time.sleep(retry_delay)
-                # Fermer l'engine pour éviter les connexions mortes
-                if 'engine' in locals():
-                    engine.dispose()
             else:
                 raise Exception(f"Échec après {max_retries} tentatives pour {table_name}") from e
 
 
-#####Resources
-
-#####V_Equipment
-@dlt.resource(
-    name="V_Equipment",
-    write_disposition="replace",            
-)
-def get_equipment_data() -> DltResource:
-    resource = create_dlt_source("V_Equipment")
-     # Apply hints pour les colonnes décimales
-    resource.apply_hints(
-        columns={
-            "Eqcat_Part_Sales_Previous_12m": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "Eqcat_Labor_Sales_Previous_12m": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "Eqcat_Total_Sales_Previous_12m": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "Eqcat_Part_Opportunity_Previous_12m": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "Eqcat_Labor_Opportunity_Previous_12m": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "Eqcat_Total_Opportunity_Previous_12m": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "Eqcat_Part_Opportunity_Future_12m": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "Eqcat_Labor_Opportunity_Future_12m": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "Eqcat_Total_Opportunity_Future_12m": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "Eqcat_Boost_Previous_12m": {"data_type": "decimal", "precision": 38, "scale": 3},
-            "Eqcat_Base_Previous_12_m": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "Eqcat_Base_Future_12_m": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "Op_Cat_Labor_Hours": {"data_type": "decimal", "precision": 38, "scale": 0},
-            "Op_Cat_Labor_Value": {"data_type": "decimal", "precision": 38, "scale": 0},
-            "Op_Cat_Base": {"data_type": "decimal", "precision": 38, "scale": 0},
-            "Op_Cat_Total_Value": {"data_type": "decimal", "precision": 38, "scale": 0},
-            "Op_Cat_Confidence_Index_pctg": {"data_type": "decimal", "precision": 38, "scale": 0},
-        }
+def create_partitioned_dlt_resources(
+    table_name: str,
+    partition_column: str,
+    num_partitions: int,
+    strategy: str = "range",
+    chunk_size: int = 100_000,
+) -> List[DltResource]:
+    """
+    Lecture parallèle d'une vue par partitions: une ressource dlt par condition de
+    build_partition_conditions ("range": tranches de valeurs, "hash": modulo de CHECKSUM),
+    chacune avec sa requête filtrée (query_adapter_callback) sur sa propre connexion
+    du pool dlt. Les ressources tournent dans les threads d'extraction de dlt et
+    écrivent toutes dans la table table_name.
+    "range" suppose une colonne numérique indexée (clé): chaque partition est un
+    seek. "hash" n'est pas sargable: chaque partition relit toute la vue (N scans).
+    Aucune entrée du registre ne définit encore partition_column.
+    """
+    engine = get_mssql_engine("dlt")
+    conditions = build_partition_conditions(table_name, partition_column, num_partitions, strategy)
+
+    def where(condition: str):
+        return lambda query, table: query.where(text(condition))
+
+    resources = []
+    for index, condition in enumerate(conditions):
+        resource = sql_table(
+            engine,
+            table=table_name,
+            backend="pyarrow",
+            chunk_size=chunk_size,
+            reflection_level="minimal",
+            query_adapter_callback=where(condition),
+        ).with_name(f"{table_name}__part{index:03d}")
+        resource.apply_hints(table_name=table_name)
+        resources.append(resource.parallelize())
+
+    logger.info(
+        f"✅ Source DLT créée pour {table_name}: {len(resources)} partitions "
+        f"({strategy} sur {partition_column})"
     )
+    return resources
 
-    return resource
 
+#####Resources
+# Une ressource (et une source) dlt par table du registre (tables.py),
+# avec les hints des colonnes décimales de l'entrée
 
-@dlt.source
-def equipment_source():
-    return get_equipment_data()
+def make_dlt_resource(spec: TableSpec):
+    """Ressource dlt d'une table du registre"""
 
-##### V_facture_dashboard_am
-@dlt.resource(
-    name="V_facture_dashboard_am",
-    write_disposition="replace",
-)
-def get_facture_data() -> DltResource:
-    resource = create_dlt_source("V_facture_dashboard_am")
-     # Apply hints pour les colonnes décimales
-    resource.apply_hints(
-        columns={
-            "gfd_prix_unitaire_achat_euro": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "gfd_prix_unitaire_vente_euros": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "gfd_quantite": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "gfd_montant_achat_euros": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "gfd_montant_vente_euros": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "gfd_montant_vente_devise_locale": {"data_type": "decimal", "precision": 38, "scale": 6},
-        }
+    @dlt.resource(
+        name=spec.asset_name,
+        write_disposition="replace",
     )
+    def get_table_data() -> DltResource:
+        resource = create_dlt_source(
+            spec.source,
+            partition_column=spec.partition_column,
+            num_partitions=spec.num_partitions,
+        )
+        # Apply hints pour les colonnes décimales
+        if spec.decimal_hints:
+            resource.apply_hints(columns=spec.dlt_column_hints())
+        return resource
 
-    return resource
+    return get_table_data
 
 
-@dlt.source
-def facture_source():
-    return get_facture_data()
+def make_partitioned_dlt_resources(spec: TableSpec) -> List[DltResource]:
+    """Ressources dlt par partition (partition_column) d'une table du registre, table cible commune"""
+    resources = create_partitioned_dlt_resources(spec.source, spec.partition_column, spec.num_partitions)
+    for resource in resources:
+        resource.apply_hints(table_name=spec.asset_name, write_disposition="replace")
+        # Apply hints pour les colonnes décimales
+        if spec.decimal_hints:
+            resource.apply_hints(columns=spec.dlt_column_hints())
+    return resources
 
-##### V_tiers_dashboard_am
-@dlt.resource(
-    name="V_tiers_dashboard_am",
-    write_disposition="replace",
-)
-def get_tiers_data() -> DltResource:
-    resource = create_dlt_source("V_tiers_dashboard_am")
-     # Apply hints pour les colonnes décimales
-    resource.apply_hints(
-        columns={
-            "gfd_prix_unitaire_achat_euro": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "gfd_prix_unitaire_vente_euros": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "gfd_quantite": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "gfd_montant_achat_euros": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "gfd_montant_vente_euros": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "gfd_montant_vente_devise_locale": {"data_type": "decimal", "precision": 38, "scale": 6},
-        }
-    )
-
-    return resource
 
+def make_dlt_source(spec: TableSpec):
+    """
+    Source dlt d'une table du registre: une seule ressource, ou une par partition
+    lue en parallèle si partition_column est défini (les lecteurs natifs
+    connectorx / turbodbc lisent les partitions dans une seule ressource)
+    """
+    resource = make_dlt_resource(spec)
 
-@dlt.source
-def tiers_source():
-    return get_tiers_data()
+    @dlt.source(name=f"{spec.asset_name.lower()}_source")
+    def table_source():
+        if spec.partition_column and spec.num_partitions > 1 and resolve_reader(Config.DLT_READER) == "sqlalchemy":
+            return make_partitioned_dlt_resources(spec)
+        return resource()
 
-##### GCM_Retour_Donnees_OLGA
+    return table_source
 
-@dlt.resource(
-    name="GCM_Retour_Donnees_OLGA",
-    write_disposition="replace",
-)
-def get_gcm_retour_donnees_olga_data() -> DltResource:
-    return create_dlt_source("GCM_Retour_Donnees_OLGA")
 
+dlt_sources = {spec.asset_name: make_dlt_source(spec) for spec in TABLES}
 
-@dlt.source
-def gcm_retour_donnees_olga_source():
-    return get_gcm_retour_donnees_olga_data()
+equipment_source = dlt_sources["V_Equipment"]
+facture_source = dlt_sources["V_facture_dashboard_am"]
+tiers_source = dlt_sources["V_tiers_dashboard_am"]
+gcm_retour_donnees_olga_source = dlt_sources["GCM_Retour_Donnees_OLGA"]
+devis_source = dlt_sources["V_devis_dashboard_am"]
+commande_source = dlt_sources["V_commande_dashboard_am"]
 
 
 ##### v_Inventory_Parts_Ops
-##@dlt.resource(
-##    name="v_Inventory_Parts_Ops",
-##    write_disposition="replace",
-##)
-##def get_inventory_parts_ops_data() -> DltResource:
-##    resource = create_dlt_source("v_Inventory_Parts_Ops")
-##     # Apply hints pour les colonnes décimales
-##    resource.apply_hints(
-##        columns={
-##            "Age_Stock": {"data_type": "decimal", "precision": 38, "scale": 6},
-##            "Qte_En_Stock": {"data_type": "decimal", "precision": 38, "scale": 6},
-##        }
-##    )
-##
-##    return resource
 def make_inventory_parts_ops_resource(logger):
     @dlt.resource(
         name="v_Inventory_Parts_Ops",
@@ -242,43 +208,3 @@ def make_inventory_parts_ops_source(logger):
         return make_inventory_parts_ops_resource(logger)
 
     return inventory_parts_ops_source()
-##### V_devis_dashboard_am
-@dlt.resource(
-    name="V_devis_dashboard_am",
-    write_disposition="replace",
-)
-def get_devis_data() -> DltResource:
-    resource = create_dlt_source("V_devis_dashboard_am")
-    
-    # Apply hints pour les colonnes décimales
-    resource.apply_hints(
-        columns={
-            "quantite_devis": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "quantite_restante_a_facturer": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "montant_vente_euros": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "gcd_quantite_commande": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "gcd_montant_vente_euros": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "gfd_quantite_facture": {"data_type": "decimal", "precision": 38, "scale": 6},
-            "gfd_montant_vente_euros": {"data_type": "decimal", "precision": 38, "scale": 6},
-        }
-    )
-    
-    return resource
-
-
-@dlt.source
-def devis_source():
-    return get_devis_data()
-
-##### V_commande_dashboard_am
-@dlt.resource(
-    name="V_commande_dashboard_am",
-    write_disposition="replace",
-)
-def get_commande_data() -> DltResource:
-    return create_dlt_source("V_commande_dashboard_am")
-
-
-@dlt.source
-def commande_source():
-    return get_commande_data()
\ No newline at end of file
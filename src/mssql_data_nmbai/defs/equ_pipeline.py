@@ -8,42 +8,7 @@ from dlt.sources.sql_database import sql_database
 import urllib.parse
 import os
 from dlt.extract.resource import DltResource
-from sqlalchemy import create_engine
-
-def get_mssql_engine():
-
-    driver   = os.getenv("MSSQL_DRIVER")
-    server   = os.getenv("MSSQL_SERVER")
-    port     = os.getenv("MSSQL_PORT")
-    database = os.getenv("MSSQL_DATABASE")
-    username = os.getenv("MSSQL_USER")
-    password = os.getenv("MSSQL_PASSWORD")
-
-    conn_str = (
-        f"DRIVER={driver};"
-        f"SERVER={server};"
-        f"DATABASE={database};"
-        f"UID={username};"
-        f"PWD={password};"
-        "Encrypt=yes;"
-        "TrustServerCertificate=yes;"
-        "Connection Timeout=60;"
-    )
-
-    conn_str_encoded = urllib.parse.quote_plus(conn_str)
-
-    engine = create_engine(
-        f"mssql+pyodbc:///?odbc_connect={conn_str_encoded}",
-        pool_pre_ping=True,
-        pool_recycle=1800,
-        pool_size=5,
-        max_overflow=10,
-        connect_args={"timeout": 60},
-        fast_executemany=True,
-    )
-
-    return engine
-
+from mssql_data_nmbai.defs.config import get_mssql_engine
 
 ##### EXTRACT V_facture_dashboard_am #############
 
@@ -0,0 +1,215 @@
+import functools
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+
+##### INSTRUMENTATION DES PHASES
+# Chaque phase du chargement (export, compression, PUT, COPY, DDL, MERGE) est
+# mesurée dans un span: durée, CPU (process + process fils comme bcp ou le pool
+# de compression), pic de RSS, lignes et octets.
+# Les spans sont ajoutés à l'enregistreur actif (recording() dans l'asset);
+# sans enregistreur actif, span() mesure sans rien enregistrer.
+# Le CPU d'un span est celui de tout le process (tous les threads, plus les fils
+# terminés pendant le span): des spans simultanés (put / copy du chargeur en
+# arrière-plan pendant l'export en flux) comptent chacun le CPU de l'autre.
+# Le CPU par phase n'est donc pas additif; la durée et les lignes le sont.
+
+
+def _cpu_seconds() -> float:
+    """CPU consommé par le process et ses fils terminés (bcp, pool de compression)"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def _peak_rss_mb() -> float:
+    """Pic de RSS du process ou d'un de ses fils, depuis le démarrage du process (MB)"""
+    # ru_maxrss: KB sous Linux, octets sous macOS
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    ) / unit
+
+
+@dataclass
+class Span:
+    """
+    Mesures d'une phase; rows et bytes sont renseignés par le code mesuré.
+    cpu_seconds: CPU du process pendant le span, spans simultanés compris
+    """
+
+    phase: str
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    peak_rss_mb: float = 0.0
+    rows: Optional[int] = None
+    bytes: Optional[int] = None
+
+
+class SpanRecorder:
+    """Spans d'une matérialisation, agrégés par phase"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def phases(self) -> Dict[str, dict]:
+        """Totaux par phase: {phase: {count, wall_seconds, cpu_seconds, rows, bytes, peak_rss_mb}}"""
+        totals: Dict[str, dict] = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            total = totals.setdefault(span.phase, {
+                "count": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+                "rows": None, "bytes": None, "peak_rss_mb": 0.0,
+            })
+            total["count"] += 1
+            total["wall_seconds"] += span.wall_seconds
+            total["cpu_seconds"] += span.cpu_seconds
+            total["peak_rss_mb"] = max(total["peak_rss_mb"], span.peak_rss_mb)
+            for counter in ("rows", "bytes"):
+                value = getattr(span, counter)
+                if value is not None:
+                    total[counter] = (total[counter] or 0) + value
+        return totals
+
+    def metadata(self) -> Dict[str, Union[int, float]]:
+        """
+        Valeurs à plat pour les métadonnées de MaterializeResult (tracées dans le temps
+        par Dagster): <phase>_seconds, <phase>_cpu_seconds, <phase>_rows, <phase>_bytes,
+        et peak_rss_mb de la matérialisation
+        """
+        values: Dict[str, Union[int, float]] = {}
+        peak = 0.0
+        for phase, total in self.phases().items():
+            values[f"{phase}_seconds"] = round(total["wall_seconds"], 3)
+            values[f"{phase}_cpu_seconds"] = round(total["cpu_seconds"], 3)
+            if total["rows"] is not None:
+                values[f"{phase}_rows"] = int(total["rows"])
+            if total["bytes"] is not None:
+                values[f"{phase}_bytes"] = int(total["bytes"])
+            peak = max(peak, total["peak_rss_mb"])
+        values["peak_rss_mb"] = round(peak, 1)
+        return values
+
+    def write_openmetrics(self, path: Path, labels: Optional[Dict[str, str]] = None) -> Path:
+        """
+        Écrit les totaux par phase au format OpenMetrics (fichier lu par le textfile
+        collector de node_exporter par ex.). Écriture atomique: un scrape ne lit jamais
+        un fichier à moitié écrit.
+        """
+        labels = {"asset": self.name, **(labels or {})}
+        metrics = {
+            "nmbai_phase_seconds": ("Durée de la phase", "wall_seconds", 1),
+            "nmbai_phase_cpu_seconds": ("CPU de la phase (process et fils)", "cpu_seconds", 1),
+            "nmbai_phase_rows": ("Lignes traitées par la phase", "rows", 1),
+            "nmbai_phase_bytes": ("Octets traités par la phase", "bytes", 1),
+            "nmbai_phase_peak_rss_bytes": ("Pic de RSS à la fin de la phase", "peak_rss_mb", 1024 * 1024),
+        }
+        phases = self.phases()
+        lines = []
+        for metric, (help_text, key, factor) in metrics.items():
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} gauge")
+            for phase, total in phases.items():
+                if total[key] is None:
+                    continue
+                label_text = ",".join(
+                    f'{name}="{_escape_label(value)}"' for name, value in {**labels, "phase": phase}.items()
+                )
+                value = total[key] * factor
+                lines.append(f"{metric}{{{label_text}}} {int(value) if factor != 1 else value}")
+        lines.append("# EOF")
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        os.replace(tmp_path, path)
+        return path
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_current_recorder: ContextVar[Optional[SpanRecorder]] = ContextVar("nmbai_span_recorder", default=None)
+
+
+@contextmanager
+def recording(name: str) -> Iterator[SpanRecorder]:
+    """Enregistreur actif pendant une matérialisation (voir span())"""
+    recorder = SpanRecorder(name)
+    token = _current_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current_recorder.reset(token)
+
+
+@contextmanager
+def span(phase: str, rows: Optional[int] = None, bytes: Optional[int] = None) -> Iterator[Span]:
+    """
+    Mesure une phase et l'ajoute à l'enregistreur actif (même en cas d'erreur).
+    Les threads démarrés sans copie du contexte n'ont pas d'enregistreur actif.
+        with span("copy") as s:
+            ...
+            s.rows = total_rows
+    """
+    current = Span(phase=phase, rows=rows, bytes=bytes)
+    start_wall = time.perf_counter()
+    start_cpu = _cpu_seconds()
+    try:
+        yield current
+    finally:
+        current.wall_seconds = time.perf_counter() - start_wall
+        current.cpu_seconds = _cpu_seconds() - start_cpu
+        current.peak_rss_mb = _peak_rss_mb()
+        recorder = _current_recorder.get()
+        if recorder is not None:
+            recorder.add(current)
+
+
+def spanned(phase: str, rows: Optional[Callable[[Any], int]] = None):
+    """
+    Décorateur: chaque appel de la fonction est un span de la phase
+    rows: lignes de la phase d'après le résultat de la fonction
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(phase) as current:
+                result = func(*args, **kwargs)
+                if rows is not None:
+                    current.rows = rows(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def write_metrics_file(
+    recorder: SpanRecorder,
+    metrics_dir: Optional[Path],
+    partition_key: Optional[str] = None,
+) -> Optional[Path]:
+    """
+    Fichier OpenMetrics de la matérialisation dans metrics_dir (rien si None):
+    <asset>.prom, ou <asset>__<partition>.prom pour un asset partitionné
+    """
+    if metrics_dir is None:
+        return None
+    name = recorder.name if partition_key is None else f"{recorder.name}__{partition_key}"
+    labels = {} if partition_key is None else {"partition": partition_key}
+    return recorder.write_openmetrics(Path(metrics_dir) / f"{name}.prom", labels)
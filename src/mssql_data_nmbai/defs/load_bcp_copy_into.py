@@ -1,4 +1,5 @@
 import os
+import shutil
 import subprocess
 import time
 from pathlib import Path
@@ -6,9 +7,25 @@ from datetime import datetime
 import snowflake.connector
 from dotenv import load_dotenv
 import logging
-from mssql_data_nmbai.defs.config import Config, BCPExporter, export_mssql_bcp
+from mssql_data_nmbai.defs.config import Config, EXPORT_FORMATS, BCPExporter, ChangeTrackingExporter, export_mssql_bcp, export_mssql_bcp_chunked, export_mssql_changes, extract_mssql_table_schema, get_mssql_column_type, get_primary_key_columns, get_resumable_output_path, get_run_output_path, get_run_table_suffix, get_stage_path, normalize_column_name, watermark_literal, watermark_to_text
 ##from mssql import export_mssql_bcp
-from mssql_data_nmbai.defs.snowflake_dest import setup_snowflake,upload_to_stage,copy_into_table,upload_to_snowflake
+from mssql_data_nmbai.defs.parquet_export import export_mssql_parquet
+from mssql_data_nmbai.defs.snowflake_dest import AsyncCopyMonitor,setup_snowflake,upload_to_stage,copy_into_table,upload_to_snowflake,snowflake_session_pool,StagedChunkLoader,remove_stage_files,swap_table,drop_load_table
+from mssql_data_nmbai.defs.snowflake_dest import (
+    create_changes_staging_table,
+    create_file_format,
+    create_stage,
+    create_staging_table,
+    create_watermark_table,
+    ensure_snowflake_table,
+    get_max_value,
+    get_watermark,
+    merge_changes_into_table,
+    merge_into_table,
+    replace_table_slice,
+    set_watermark,
+    table_exists,
+)
 
 load_dotenv()
 logging.basicConfig(
@@ -22,41 +39,126 @@ logger = logging.getLogger(__name__)
 # PIPELINE COMPLET ================================================
 
 def extract_mssql_data(
-    snowflake_database: str = "NEEMBA",
-    snowflake_schema: str, 
     mssql_table_name: str, 
     snowflake_table_name: str,
-    logger
+    logger,
+    snowflake_database: str = "NEEMBA",
+    snowflake_schema: str = "EQUIPEMENT", 
+    streaming: bool = Config.BCP_STREAMING,
+    run_id: str = None,
+    export_format: str = Config.EXPORT_FORMAT,
+    watermark_column: str = None,
+    merge_keys: list = None,
+    change_tracking: bool = False,
+    resume_key: str = None,
+    partition_column: str = None,
+    num_partitions: int = Config.BCP_PARTITIONS,
 ):
     """
     Exécution complète du pipeline
     Reproduction du script PowerShell
+    streaming=True: export en chunks avec PUT/COPY en parallèle (stream_mssql_to_snowflake)
+    export_format: "csv" (bcp) ou "parquet" (colonnes typées, COPY MATCH_BY_COLUMN_NAME)
+    run_id: identifiant du run Dagster; isole le fichier local et le préfixe du stage
+    pour que plusieurs assets puissent tourner en parallèle
+    watermark_column: active le mode incrémental (extract_mssql_data_incremental)
+    change_tracking: delta via SQL Server Change Tracking, suppressions comprises
+    (extract_mssql_data_changes)
+    resume_key: export CSV par tranches de cette clé, repris après échec: les fichiers
+    (get_resumable_output_path) ne sont supprimés qu'après un chargement réussi
+    partition_column / num_partitions: export CSV partitionné (voir export_mssql_bcp)
     """
     
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"❌ Format d'export inconnu: {export_format} (attendu: {', '.join(EXPORT_FORMATS)})")
+    
+    if change_tracking:
+        return extract_mssql_data_changes(
+            mssql_table_name = mssql_table_name,
+            snowflake_table_name = snowflake_table_name,
+            logger = logger,
+            snowflake_database = snowflake_database,
+            snowflake_schema = snowflake_schema,
+            run_id = run_id,
+        )
+
+    if watermark_column:
+        return extract_mssql_data_incremental(
+            mssql_table_name = mssql_table_name,
+            snowflake_table_name = snowflake_table_name,
+            logger = logger,
+            watermark_column = watermark_column,
+            merge_keys = merge_keys,
+            snowflake_database = snowflake_database,
+            snowflake_schema = snowflake_schema,
+            run_id = run_id,
+        )
+
+    if streaming and export_format == "csv":
+        return stream_mssql_to_snowflake(
+            mssql_table_name = mssql_table_name,
+            snowflake_table_name = snowflake_table_name,
+            logger = logger,
+            snowflake_database = snowflake_database,
+            snowflake_schema = snowflake_schema,
+            run_id = run_id,
+        )
+
     start_time = time.time()
     
     logger.info("\n" + "=" * 80)
     logger.info("🚀 PIPELINE MSSQL → SNOWFLAKE")
-    logger.info("📤➡️❄️  Méthode: BCP + COPY INTO")
+    method = 'Parquet' if export_format == "parquet" else 'BCP'
+    logger.info(f"📤➡️❄️  Méthode: {method} + COPY INTO")
     logger.info("=" * 80 + "\n")
     
+    resume_key = resume_key if export_format == "csv" else None
+    if resume_key:
+        output_path = get_resumable_output_path(snowflake_table_name)
+    else:
+        output_path = get_run_output_path(snowflake_table_name, run_id)
+    stage_path = get_stage_path(snowflake_table_name, run_id)
+    
     try:
-        # 1. Export BCP
-        export_mssql_bcp(table_name = mssql_table_name, logger = logger)
-        # Setup Snowflake (Créer file_format, stage et table)
-        setup_snowflake(
+        # 1. Export BCP (CSV) ou Parquet
+        export_stats = None
+        if export_format == "parquet":
+            output_path = output_path.with_suffix(".parquet")
+            export_mssql_parquet(table_name = mssql_table_name, logger = logger, output_path = output_path)
+        else:
+            export_stats = export_mssql_bcp(
+                table_name = mssql_table_name,
+                logger = logger,
+                output_path = output_path,
+                resume_key = resume_key,
+                partition_column = partition_column,
+                num_partitions = num_partitions,
+            )
+        # Setup Snowflake (Créer file_format, stage et table de chargement)
+        load_table = setup_snowflake(
             snowflake_database = snowflake_database,
             snowflake_schema = snowflake_schema, 
-            mssql_table_name = "V_Inventory_Parts_Ops",
-            snowflake_table_name = "AI_V_Inventory_Parts_Ops",
-            logger = logger
+            mssql_table_name = mssql_table_name,
+            snowflake_table_name = snowflake_table_name,
+            logger = logger,
+            run_id = run_id,
         )
         result = upload_to_snowflake(
             snowflake_database = snowflake_database,
             snowflake_schema = snowflake_schema, 
-            snowflake_table_name = "AI_V_Inventory_Parts_Ops",
-            logger = logger
+            snowflake_table_name = snowflake_table_name,
+            logger = logger,
+            output_path = output_path,
+            stage_path = stage_path,
+            export_format = export_format,
+            load_table = load_table,
         )
+        if export_stats:
+            result['export_rows_per_sec'] = export_stats['rows_per_sec']
+        if resume_key:
+            # Chargement réussi: la prochaine exécution repart d'un export neuf
+            shutil.rmtree(output_path.parent, ignore_errors = True)
+            logger.info(f"🗑️  Export par tranches supprimé: {output_path.parent}")
 
 
         # Upload dans le staging (On a utilisé CSV mais peut être changé en parquet dans snowflake_dest.py)
@@ -78,6 +180,706 @@ def extract_mssql_data(
     except Exception as e:
         logger.error(f"\n❌ ERREUR PIPELINE: {e}")
         raise
+    finally:
+        # Export par tranches: conservé en cas d'échec pour la reprise
+        if not resume_key:
+            cleanup_run_output(output_path, run_id, logger)
+
+
+def cleanup_run_output(output_path: Path, run_id: str, logger):
+    """Supprime le répertoire de travail du run (rien à faire sans run_id)."""
+    if run_id is not None and output_path.parent.exists():
+        shutil.rmtree(output_path.parent, ignore_errors = True)
+        logger.info(f"🗑️  Répertoire de travail supprimé: {output_path.parent}")
+
+
+# PLUSIEURS TABLES, COPY INTO ASYNCHRONES ================================================
+
+def extract_mssql_tables(
+    tables: list,
+    logger,
+    snowflake_database: str = "NEEMBA",
+    snowflake_schema: str = "EQUIPEMENT", 
+    run_id: str = None,
+):
+    """
+    Chargement complet de plusieurs tables (export CSV bcp) sans attendre chaque COPY:
+    une table est exportée et uploadée, son COPY INTO est soumis (AsyncCopyMonitor)
+    et l'export de la table suivante démarre pendant que le warehouse charge.
+    Les SWAP (LOAD_MODE = "swap") et la purge du stage suivent la fin de tous les COPY.
+    En cas d'échec (export ou COPY), les tables chargées sont quand même swappées,
+    les tables __SWAP en échec supprimées, puis l'erreur est levée.
+    tables: liste de (mssql_table_name, snowflake_table_name)
+    Returns: dict snowflake_table_name -> résultat du COPY (rows_loaded, errors, duration, ...)
+    """
+    
+    start_time = time.time()
+    
+    logger.info("\n" + "=" * 80)
+    logger.info(f"🚀 PIPELINE MSSQL → SNOWFLAKE ({len(tables)} tables, COPY INTO asynchrones)")
+    logger.info("=" * 80 + "\n")
+    
+    conn = snowflake_session_pool.acquire(database = snowflake_database, schema = snowflake_schema)
+    cursor = conn.cursor()
+    monitor = AsyncCopyMonitor(conn, logger)
+    loads = {}
+    export_error = None
+    
+    try:
+        for mssql_table_name, snowflake_table_name in tables:
+            output_path = get_run_output_path(snowflake_table_name, run_id)
+            stage_path = get_stage_path(snowflake_table_name, run_id)
+            load_table = None
+            try:
+                export_stats = export_mssql_bcp(table_name = mssql_table_name, logger = logger, output_path = output_path)
+                load_table = setup_snowflake(
+                    snowflake_database = snowflake_database,
+                    snowflake_schema = snowflake_schema, 
+                    mssql_table_name = mssql_table_name,
+                    snowflake_table_name = snowflake_table_name,
+                    logger = logger,
+                    run_id = run_id,
+                )
+                upload_to_stage(cursor, logger, output_path = output_path, stage_path = stage_path)
+                monitor.submit(load_table, stage_path = stage_path, label = snowflake_table_name)
+            except Exception as e:
+                # Pas de nouvel export: les COPY déjà soumis sont attendus et swappés
+                logger.error(f"❌ {snowflake_table_name}: {e}")
+                if load_table is not None:
+                    drop_load_table(cursor, snowflake_table_name, load_table, logger)
+                export_error = e
+                break
+            finally:
+                cleanup_run_output(output_path, run_id, logger)
+            
+            loads[snowflake_table_name] = (load_table, stage_path, export_stats)
+        
+        results = monitor.wait(raise_on_error = False)
+        
+        for snowflake_table_name, (load_table, stage_path, export_stats) in loads.items():
+            if snowflake_table_name not in results:
+                # COPY en échec: la cible n'est pas touchée, la copie __SWAP est supprimée
+                drop_load_table(cursor, snowflake_table_name, load_table, logger)
+                continue
+            if load_table != snowflake_table_name:
+                swap_table(cursor, snowflake_table_name, load_table, logger)
+            if run_id is not None:
+                remove_stage_files(cursor, stage_path, logger)
+            results[snowflake_table_name]['export_rows_per_sec'] = export_stats['rows_per_sec']
+        
+        if export_error is not None:
+            raise export_error
+        monitor.raise_failures()
+        
+        total_duration = time.time() - start_time
+        
+        logger.info("\n" + "=" * 80)
+        logger.info("✅ PIPELINE TERMINÉ AVEC SUCCÈS")
+        logger.info(f"🕒 Temps total: {total_duration:.2f}s")
+        for snowflake_table_name, result in results.items():
+            logger.info(f"📊 {snowflake_table_name}: {result['rows_loaded']:,} lignes")
+        logger.info("=" * 80 + "\n")
+        
+        return results
+        
+    except Exception as e:
+        logger.error(f"\n❌ ERREUR PIPELINE: {e}")
+        raise
+    finally:
+        cursor.close()
+        snowflake_session_pool.release(conn)
+
+
+# CHARGEMENT EN DEUX ÉTAPES: EXPORT + PUT, PUIS COPY INTO ================================================
+
+def export_to_stage(
+    mssql_table_name: str,
+    snowflake_table_name: str,
+    logger,
+    snowflake_database: str = "NEEMBA",
+    snowflake_schema: str = "EQUIPEMENT",
+    run_id: str = None,
+) -> dict:
+    """
+    Première étape d'un chargement complet CSV: export bcp, table de chargement
+    (setup_snowflake) et PUT dans le stage du run. Le COPY INTO est soumis par
+    load_from_stage dans une étape séparée: SQL Server est libéré pour l'export
+    suivant pendant que le warehouse charge.
+    Returns: dict load_table, stage_path, export_rows_per_sec (paramètres de load_from_stage)
+    """
+    
+    output_path = get_run_output_path(snowflake_table_name, run_id)
+    stage_path = get_stage_path(snowflake_table_name, run_id)
+    load_table = None
+    conn = snowflake_session_pool.acquire(database = snowflake_database, schema = snowflake_schema)
+    cursor = conn.cursor()
+    
+    try:
+        export_stats = export_mssql_bcp(table_name = mssql_table_name, logger = logger, output_path = output_path)
+        load_table = setup_snowflake(
+            snowflake_database = snowflake_database,
+            snowflake_schema = snowflake_schema, 
+            mssql_table_name = mssql_table_name,
+            snowflake_table_name = snowflake_table_name,
+            logger = logger,
+            run_id = run_id,
+        )
+        upload_to_stage(cursor, logger, output_path = output_path, stage_path = stage_path)
+        
+        return {
+            'load_table': load_table,
+            'stage_path': stage_path,
+            'export_rows_per_sec': export_stats['rows_per_sec'],
+        }
+        
+    except Exception as e:
+        logger.error(f"\n❌ ERREUR EXPORT {snowflake_table_name}: {e}")
+        if load_table is not None:
+            drop_load_table(cursor, snowflake_table_name, load_table, logger)
+        raise
+    finally:
+        cursor.close()
+        snowflake_session_pool.release(conn)
+        cleanup_run_output(output_path, run_id, logger)
+
+
+def load_from_stage(
+    snowflake_table_name: str,
+    load_table: str,
+    stage_path: str,
+    logger,
+    snowflake_database: str = "NEEMBA",
+    snowflake_schema: str = "EQUIPEMENT",
+    run_id: str = None,
+) -> dict:
+    """
+    Seconde étape: COPY INTO des fichiers du stage (export_to_stage) soumis en
+    asynchrone et suivi par AsyncCopyMonitor, puis SWAP (LOAD_MODE = "swap").
+    En cas d'échec, la cible n'est pas touchée et la table __SWAP est supprimée.
+    Le préfixe du run est purgé du stage dans tous les cas.
+    Returns: résultat du COPY (rows_loaded, errors, duration, query_id)
+    """
+    
+    conn = snowflake_session_pool.acquire(database = snowflake_database, schema = snowflake_schema)
+    cursor = conn.cursor()
+    monitor = AsyncCopyMonitor(conn, logger)
+    
+    try:
+        monitor.submit(load_table, stage_path = stage_path, label = snowflake_table_name)
+        result = monitor.wait()[snowflake_table_name]
+        if load_table != snowflake_table_name:
+            swap_table(cursor, snowflake_table_name, load_table, logger)
+        
+        logger.info(f"📊 {snowflake_table_name}: {result['rows_loaded']:,} lignes en {result['duration']:.2f}s")
+        return result
+        
+    except Exception as e:
+        logger.error(f"\n❌ ERREUR COPY INTO {snowflake_table_name}: {e}")
+        drop_load_table(cursor, snowflake_table_name, load_table, logger)
+        raise
+    finally:
+        try:
+            if run_id is not None:
+                remove_stage_files(cursor, stage_path, logger)
+        finally:
+            cursor.close()
+            snowflake_session_pool.release(conn)
+
+
+# PIPELINE INCRÉMENTAL ================================================
+
+def extract_mssql_data_incremental(
+    mssql_table_name: str, 
+    snowflake_table_name: str,
+    logger,
+    watermark_column: str,
+    merge_keys: list = None,
+    snowflake_database: str = "NEEMBA",
+    snowflake_schema: str = "EQUIPEMENT", 
+    run_id: str = None,
+):
+    """
+    Pipeline incrémental par watermark
+    - premier passage (table ou watermark absent): chargement complet, puis
+      enregistrement du MAX(watermark_column) dans Config.WATERMARK_TABLE
+    - ensuite: bcp n'exporte que WHERE watermark_column > dernier watermark,
+      COPY dans une table de staging puis MERGE (merge_keys) ou INSERT dans la cible
+    watermark_column: date de modification ou id strictement croissant
+    merge_keys: clé(s) de la table source; sans clé les lignes sont ajoutées
+    """
+    
+    start_time = time.time()
+    sf_watermark_column = normalize_column_name(watermark_column)
+    
+    logger.info("\n" + "=" * 80)
+    logger.info("🚀 PIPELINE MSSQL → SNOWFLAKE (INCRÉMENTAL)")
+    logger.info(f"📌 Watermark: {watermark_column}")
+    logger.info("=" * 80 + "\n")
+    
+    conn = snowflake_session_pool.acquire(database = snowflake_database, schema = snowflake_schema)
+    cursor = conn.cursor()
+    output_path = get_run_output_path(snowflake_table_name, run_id)
+    stage_path = get_stage_path(snowflake_table_name, run_id)
+    staging_table = None
+    
+    try:
+        create_watermark_table(cursor, logger)
+        watermark = None
+        if table_exists(cursor, snowflake_table_name):
+            watermark = get_watermark(cursor, snowflake_table_name, sf_watermark_column)
+        
+        if watermark is None:
+            logger.info("ℹ️  Aucun watermark: chargement complet initial")
+            result = extract_mssql_data(
+                mssql_table_name = mssql_table_name,
+                snowflake_table_name = snowflake_table_name,
+                logger = logger,
+                snowflake_database = snowflake_database,
+                snowflake_schema = snowflake_schema,
+                run_id = run_id,
+            )
+            if result.get('errors'):
+                # Lignes rejetées: pas de watermark, le prochain run recharge tout
+                logger.error(f"❌ {result['errors']:,} lignes rejetées par COPY: watermark non enregistré")
+                return result
+            max_value = get_max_value(cursor, snowflake_table_name, sf_watermark_column)
+            if max_value is not None:
+                set_watermark(cursor, snowflake_table_name, sf_watermark_column, *watermark_to_text(max_value), logger)
+            return result
+        
+        value, value_type = watermark
+        logger.info(f"📌 Dernier watermark: {value}")
+        # Littéral dans le type de la colonne (DATETIME: pas de ligne relue à chaque run)
+        column_type = get_mssql_column_type(mssql_table_name, watermark_column) if value_type == "timestamp" else None
+        
+        # 1. Export des seules lignes nouvelles / modifiées (pas de TOP: le delta doit être complet)
+        export_mssql_bcp(
+            table_name = mssql_table_name,
+            logger = logger,
+            top_n = None,
+            output_path = output_path,
+            where = f"[{watermark_column}] > {watermark_literal(value, value_type, column_type)}",
+        )
+        
+        # 2. Staging du run + COPY
+        create_file_format(cursor, logger)
+        create_stage(cursor, logger)
+        staging_table = create_staging_table(cursor, snowflake_table_name, logger, suffix = get_run_table_suffix(run_id))
+        upload_to_stage(cursor, logger, output_path = output_path, stage_path = stage_path)
+        # Une ligne rejetée ferait échouer le COPY: le watermark n'avance pas au-delà
+        result = copy_into_table(
+            cursor = cursor,
+            snowflake_table_name = staging_table,
+            logger = logger,
+            stage_path = stage_path,
+            on_error = "ABORT_STATEMENT",
+        )
+        
+        # 3. MERGE dans la cible puis avancement du watermark
+        result.update(merge_into_table(
+            cursor = cursor,
+            snowflake_table_name = snowflake_table_name,
+            staging_table = staging_table,
+            merge_keys = [normalize_column_name(key) for key in merge_keys or []],
+            order_column = sf_watermark_column,
+            logger = logger,
+        ))
+        max_value = get_max_value(cursor, staging_table, sf_watermark_column)
+        if max_value is not None:
+            set_watermark(cursor, snowflake_table_name, sf_watermark_column, *watermark_to_text(max_value), logger)
+        
+        if run_id is not None:
+            remove_stage_files(cursor, stage_path, logger)
+        
+        total_duration = time.time() - start_time
+        
+        logger.info("\n" + "=" * 80)
+        logger.info("✅ PIPELINE INCRÉMENTAL TERMINÉ AVEC SUCCÈS")
+        logger.info(f"🕒 Temps total: {total_duration:.2f}s")
+        logger.info(f"📊 Lignes du delta: {result['rows_loaded']:,}")
+        logger.info("=" * 80 + "\n")
+        
+        return result
+        
+    except Exception as e:
+        logger.error(f"\n❌ ERREUR PIPELINE: {e}")
+        raise
+    finally:
+        # Staging propre au run: supprimé aussi en cas d'échec
+        if staging_table is not None:
+            cursor.execute(f"DROP TABLE IF EXISTS {staging_table}")
+        cursor.close()
+        snowflake_session_pool.release(conn)
+        cleanup_run_output(output_path, run_id, logger)
+
+
+# PIPELINE PAR TRANCHE DE DATES (partitions Dagster) ================================================
+
+def extract_mssql_data_slice(
+    mssql_table_name: str, 
+    snowflake_table_name: str,
+    logger,
+    date_column: str,
+    start: datetime,
+    end: datetime,
+    snowflake_database: str = "NEEMBA",
+    snowflake_schema: str = "EQUIPEMENT", 
+    run_id: str = None,
+    outside: bool = False,
+):
+    """
+    Recharge une seule tranche [start, end[ de date_column (une partition Dagster)
+    - bcp n'exporte que WHERE date_column >= start AND date_column < end
+    - COPY dans une table de staging propre à la tranche et au run, puis DELETE + INSERT
+      de la tranche dans la cible (replace_table_slice); le reste de la table
+      n'est pas touché, plusieurs tranches peuvent tourner en parallèle
+    outside=True: tranche complémentaire des partitions [start, end[ = toutes les
+    partitions: lignes à date NULL, antérieure à start ou postérieure à end
+    La cible est créée au premier passage (DDL généré), jamais recréée ensuite.
+    """
+    
+    start_time = time.time()
+    start_text = start.strftime("%Y-%m-%d %H:%M:%S")
+    end_text = end.strftime("%Y-%m-%d %H:%M:%S")
+    
+    logger.info("\n" + "=" * 80)
+    logger.info("🚀 PIPELINE MSSQL → SNOWFLAKE (TRANCHE)")
+    if outside:
+        logger.info(f"📅 {date_column}: NULL ou hors de [{start_text}, {end_text}[")
+    else:
+        logger.info(f"📅 {date_column}: [{start_text}, {end_text}[")
+    logger.info("=" * 80 + "\n")
+    
+    check_date_column(mssql_table_name, date_column)
+    
+    conn = snowflake_session_pool.acquire(database = snowflake_database, schema = snowflake_schema)
+    cursor = conn.cursor()
+    output_path = get_run_output_path(snowflake_table_name, run_id)
+    stage_path = get_stage_path(snowflake_table_name, run_id)
+    staging_table = None
+    start_literal = watermark_literal(start_text, 'timestamp')
+    end_literal = watermark_literal(end_text, 'timestamp')
+    if outside:
+        where = f"([{date_column}] IS NULL OR [{date_column}] < {start_literal} OR [{date_column}] >= {end_literal})"
+        suffix = "_OUT"
+    else:
+        where = f"[{date_column}] >= {start_literal} AND [{date_column}] < {end_literal}"
+        suffix = start.strftime("_%Y%m%d")
+    # Backfill et run de nuit sur la même tranche: un staging par run
+    suffix += get_run_table_suffix(run_id)
+    
+    try:
+        # 1. Export de la seule tranche (pas de TOP: la tranche doit être complète)
+        export_mssql_bcp(
+            table_name = mssql_table_name,
+            logger = logger,
+            output_path = output_path,
+            where = where,
+        )
+        
+        # 2. Cible (premier passage), staging de la tranche + COPY
+        create_file_format(cursor, logger)
+        create_stage(cursor, logger)
+        ensure_snowflake_table(
+            cursor = cursor,
+            database = snowflake_database,
+            schema = snowflake_schema,
+            mssql_table_name = mssql_table_name,
+            snowflake_table_name = snowflake_table_name,
+            logger = logger,
+        )
+        staging_table = create_staging_table(cursor, snowflake_table_name, logger, suffix = suffix)
+        upload_to_stage(cursor, logger, output_path = output_path, stage_path = stage_path)
+        result = copy_into_table(
+            cursor = cursor,
+            snowflake_table_name = staging_table,
+            logger = logger,
+            stage_path = stage_path,
+        )
+        
+        # 3. Remplacement de la tranche dans la cible
+        result.update(replace_table_slice(
+            cursor = cursor,
+            snowflake_table_name = snowflake_table_name,
+            staging_table = staging_table,
+            date_column = normalize_column_name(date_column),
+            start = start_text,
+            end = end_text,
+            logger = logger,
+            outside = outside,
+        ))
+        if run_id is not None:
+            remove_stage_files(cursor, stage_path, logger)
+        
+        total_duration = time.time() - start_time
+        
+        logger.info("\n" + "=" * 80)
+        logger.info("✅ PIPELINE TRANCHE TERMINÉ AVEC SUCCÈS")
+        logger.info(f"🕒 Temps total: {total_duration:.2f}s")
+        logger.info(f"📊 Lignes de la tranche: {result['rows_loaded']:,}")
+        logger.info("=" * 80 + "\n")
+        
+        return result
+        
+    except Exception as e:
+        logger.error(f"\n❌ ERREUR PIPELINE: {e}")
+        raise
+    finally:
+        if staging_table is not None:
+            cursor.execute(f"DROP TABLE IF EXISTS {staging_table}")
+        cursor.close()
+        snowflake_session_pool.release(conn)
+        cleanup_run_output(output_path, run_id, logger)
+
+
+def check_date_column(mssql_table_name: str, date_column: str):
+    """
+    Vérifie que la colonne des tranches existe dans la source et est une date:
+    sinon chaque tranche échouerait (ou exporterait à vide) sans message clair
+    """
+    columns = {col_name.lower(): col_type for col_name, col_type in extract_mssql_table_schema(mssql_table_name)}
+    col_type = columns.get(date_column.lower())
+    if col_type is None:
+        raise ValueError(
+            f"❌ Colonne de partition {date_column} absente de {mssql_table_name} "
+            f"(time_partition_column du registre tables.py)"
+        )
+    if not col_type.upper().startswith(("DATE", "TIMESTAMP")):
+        raise ValueError(f"❌ Colonne de partition {date_column} de {mssql_table_name}: type {col_type}, date attendue")
+
+
+# PIPELINE CHANGE TRACKING ================================================
+
+CHANGE_VERSION_COLUMN = "SYS_CHANGE_VERSION"
+
+
+def extract_mssql_data_changes(
+    mssql_table_name: str, 
+    snowflake_table_name: str,
+    logger,
+    snowflake_database: str = "NEEMBA",
+    snowflake_schema: str = "EQUIPEMENT", 
+    run_id: str = None,
+):
+    """
+    Pipeline delta via SQL Server Change Tracking (tables avec clé primaire)
+    - premier passage, ou version purgée par la rétention: chargement complet,
+      la version courante est lue avant l'export
+    - ensuite: bcp exporte CHANGETABLE(CHANGES ...) depuis la dernière version,
+      COPY dans une table de staging puis un seul MERGE (insertions,
+      mises à jour et suppressions)
+    La version est persistée dans Config.WATERMARK_TABLE (colonne SYS_CHANGE_VERSION).
+    """
+    
+    start_time = time.time()
+    
+    logger.info("\n" + "=" * 80)
+    logger.info("🚀 PIPELINE MSSQL → SNOWFLAKE (CHANGE TRACKING)")
+    logger.info("=" * 80 + "\n")
+    
+    conn = snowflake_session_pool.acquire(database = snowflake_database, schema = snowflake_schema)
+    cursor = conn.cursor()
+    output_path = get_run_output_path(snowflake_table_name, run_id)
+    stage_path = get_stage_path(snowflake_table_name, run_id)
+    exporter = ChangeTrackingExporter(
+        server = f"{Config.MSSQL_SERVER}",
+        database = Config.MSSQL_DATABASE,
+        username = Config.MSSQL_USER,
+        password = Config.MSSQL_PASSWORD,
+        use_wsl = Config.USE_WSL,
+        trust_server_certificate = True
+    )
+    staging_table = None
+    
+    try:
+        create_watermark_table(cursor, logger)
+        min_version = exporter.min_valid_version(mssql_table_name)
+        if min_version is None:
+            raise ValueError(f"❌ Change Tracking non activé sur la table {mssql_table_name}")
+        
+        watermark = None
+        if table_exists(cursor, snowflake_table_name):
+            watermark = get_watermark(cursor, snowflake_table_name, CHANGE_VERSION_COLUMN)
+        
+        if watermark is None or int(watermark[0]) < min_version:
+            if watermark is not None:
+                logger.warning(f"⚠️  Version {watermark[0]} purgée (minimum {min_version}): rechargement complet")
+            else:
+                logger.info("ℹ️  Aucune version enregistrée: chargement complet initial")
+            to_version = exporter.current_version()
+            result = extract_mssql_data(
+                mssql_table_name = mssql_table_name,
+                snowflake_table_name = snowflake_table_name,
+                logger = logger,
+                snowflake_database = snowflake_database,
+                snowflake_schema = snowflake_schema,
+                run_id = run_id,
+            )
+            if result.get('errors'):
+                # Lignes rejetées: pas de version, le prochain run recharge tout
+                logger.error(f"❌ {result['errors']:,} lignes rejetées par COPY: version non enregistrée")
+                return result
+            set_watermark(cursor, snowflake_table_name, CHANGE_VERSION_COLUMN, str(to_version), "number", logger)
+            return result
+        
+        since_version = int(watermark[0])
+        logger.info(f"📌 Dernière version: {since_version}")
+        
+        # 1. Export du delta (lignes I / U complètes, clés des lignes D)
+        to_version = export_mssql_changes(
+            table_name = mssql_table_name,
+            logger = logger,
+            since_version = since_version,
+            output_path = output_path,
+        )
+        
+        # 2. Staging + COPY
+        create_file_format(cursor, logger)
+        create_stage(cursor, logger)
+        staging_table = create_changes_staging_table(cursor, snowflake_table_name, logger, suffix = get_run_table_suffix(run_id))
+        upload_to_stage(cursor, logger, output_path = output_path, stage_path = stage_path)
+        # Un changement rejeté ferait échouer le COPY: la version n'avance pas au-delà
+        result = copy_into_table(
+            cursor = cursor,
+            snowflake_table_name = staging_table,
+            logger = logger,
+            stage_path = stage_path,
+            on_error = "ABORT_STATEMENT",
+        )
+        
+        # 3. MERGE unique puis avancement de la version
+        result.update(merge_changes_into_table(
+            cursor = cursor,
+            snowflake_table_name = snowflake_table_name,
+            staging_table = staging_table,
+            merge_keys = [normalize_column_name(key) for key in get_primary_key_columns(mssql_table_name)],
+            logger = logger,
+        ))
+        set_watermark(cursor, snowflake_table_name, CHANGE_VERSION_COLUMN, str(to_version), "number", logger)
+        
+        if run_id is not None:
+            remove_stage_files(cursor, stage_path, logger)
+        
+        total_duration = time.time() - start_time
+        
+        logger.info("\n" + "=" * 80)
+        logger.info("✅ PIPELINE CHANGE TRACKING TERMINÉ AVEC SUCCÈS")
+        logger.info(f"🕒 Temps total: {total_duration:.2f}s")
+        logger.info(f"📊 Changements chargés: {result['rows_loaded']:,}")
+        logger.info("=" * 80 + "\n")
+        
+        return result
+        
+    except Exception as e:
+        logger.error(f"\n❌ ERREUR PIPELINE: {e}")
+        raise
+    finally:
+        # Staging propre au run: supprimé aussi en cas d'échec
+        if staging_table is not None:
+            cursor.execute(f"DROP TABLE IF EXISTS {staging_table}")
+        cursor.close()
+        snowflake_session_pool.release(conn)
+        cleanup_run_output(output_path, run_id, logger)
+
+
+# PIPELINE EN FLUX ================================================
+
+def stream_mssql_to_snowflake(
+    mssql_table_name: str, 
+    snowflake_table_name: str,
+    logger,
+    snowflake_database: str = "NEEMBA",
+    snowflake_schema: str = "EQUIPEMENT", 
+    chunk_rows: int = Config.STREAM_CHUNK_ROWS,
+    chunk_mb: int = Config.STREAM_CHUNK_MB,
+    copy_every: int = Config.STREAM_COPY_EVERY,
+    run_id: str = None,
+):
+    """
+    Pipeline en flux: le setup Snowflake est fait avant l'export, puis chaque
+    chunk fermé par bcp est PUT en arrière-plan et COPY INTO démarre sur les
+    fichiers déjà stagés sans attendre la fin de l'extraction.
+    La durée totale tend vers la phase la plus lente au lieu de leur somme.
+    """
+    
+    start_time = time.time()
+    
+    logger.info("\n" + "=" * 80)
+    logger.info("🚀 PIPELINE MSSQL → SNOWFLAKE (EN FLUX)")
+    logger.info("📤➡️❄️  Méthode: BCP en chunks + PUT/COPY INTO en parallèle")
+    logger.info("=" * 80 + "\n")
+    
+    output_path = get_run_output_path(snowflake_table_name, run_id)
+    stage_path = get_stage_path(snowflake_table_name, run_id)
+    
+    # Setup Snowflake d'abord: la table doit exister avant le premier COPY
+    load_table = setup_snowflake(
+        snowflake_database = snowflake_database,
+        snowflake_schema = snowflake_schema, 
+        mssql_table_name = mssql_table_name,
+        snowflake_table_name = snowflake_table_name,
+        logger = logger,
+        run_id = run_id,
+    )
+    
+    conn = snowflake_session_pool.acquire(database = snowflake_database, schema = snowflake_schema)
+    loader = StagedChunkLoader(
+        conn = conn,
+        snowflake_table_name = load_table,
+        logger = logger,
+        copy_every = copy_every,
+        stage_path = stage_path,
+    ).start()
+    
+    try:
+        try:
+            export_mssql_bcp_chunked(
+                table_name = mssql_table_name,
+                logger = logger,
+                on_chunk = loader.submit,
+                chunk_rows = chunk_rows,
+                chunk_mb = chunk_mb,
+                output_path = output_path,
+            )
+        except Exception:
+            loader.close(abort = True)
+            raise
+        
+        export_duration = time.time() - start_time
+        logger.info(f"⏳ Export terminé en {export_duration:.2f}s, attente des derniers PUT/COPY...")
+        result = loader.close()
+        cursor = conn.cursor()
+        try:
+            if load_table != snowflake_table_name:
+                swap_table(cursor, snowflake_table_name, load_table, logger)
+            if run_id is not None:
+                remove_stage_files(cursor, stage_path, logger)
+        finally:
+            cursor.close()
+        
+        total_duration = time.time() - start_time
+        
+        logger.info("\n" + "=" * 80)
+        logger.info("✅ PIPELINE EN FLUX TERMINÉ AVEC SUCCÈS")
+        logger.info(f"🕒 Temps total: {total_duration:.2f}s (export {export_duration:.2f}s)")
+        logger.info(f"📁 Fichiers chargés: {result['nb_files']}")
+        logger.info(f"📊 Total lignes insérées: {result['rows_loaded']:,}")
+        logger.info(f"⚡ Débit: {result['rows_loaded'] / total_duration:.0f} rows/sec")
+        logger.info("=" * 80 + "\n")
+        
+        return result
+        
+    except Exception as e:
+        logger.error(f"\n❌ ERREUR PIPELINE: {e}")
+        cursor = conn.cursor()
+        try:
+            drop_load_table(cursor, snowflake_table_name, load_table, logger)
+        finally:
+            cursor.close()
+        raise
+    finally:
+        snowflake_session_pool.release(conn)
+        cleanup_run_output(output_path, run_id, logger)
 
 
 if __name__ == "__main__":
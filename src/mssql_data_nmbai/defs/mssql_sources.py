@@ -1,84 +1,440 @@
 import dlt
 from dlt.sources.sql_database import sql_database
 
-import urllib.parse
-import os
-
-from sqlalchemy import create_engine, text
+import importlib.util
+import queue
+import threading
+
+import sqlalchemy as sa
+from sqlalchemy import text
+from sqlalchemy.dialects.mssql import DATETIMEOFFSET, MONEY, SMALLMONEY
+from sqlalchemy.engine import Engine
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from mssql_data_nmbai.defs.config import (
+    Config,
+    build_connectorx_url,
+    build_odbc_connection_string,
+    build_partition_conditions,
+    get_mssql_engine,
+    get_mssql_row_count,
+)
 import logging
 logger = logging.getLogger(__name__)
 
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow requis seulement par les lecteurs de chunks Arrow
+    pa = None
 
-### Get mssql connexion
-def get_mssql_engine():
-
-    driver   = os.getenv("MSSQL_DRIVER")
-    server   = os.getenv("MSSQL_SERVER")
-    database = os.getenv("MSSQL_DATABASE")
-    username = os.getenv("MSSQL_USER")
-    password = os.getenv("MSSQL_PASSWORD")
-
-    conn_str = (
-        f"DRIVER={driver};"
-        f"SERVER={server};"
-        f"DATABASE={database};"
-        f"UID={username};"
-        f"PWD={password};"
-        "Encrypt=yes;"
-        "TrustServerCertificate=yes;"
-        "MARS_Connection=yes;"
-        "Packet Size=32767;"
-        "Connection Timeout=60;"
-        "Command Timeout=300;"
-    )
-
-    conn_str_encoded = urllib.parse.quote_plus(conn_str)
 
-    return f"mssql+pyodbc:///?odbc_connect={conn_str_encoded}"
+def require_pyarrow():
+    """Erreur explicite si pyarrow manque (lecteurs de chunks Arrow de ce module)"""
+    if pa is None:
+        raise RuntimeError("❌ Arrow chunk readers: install pyarrow (pip install pyarrow)")
 
 
 ##### Nb lines----
 
-def get_nb_rows(db_source_name: str) -> int:
+def get_nb_rows(db_source_name: str, exact: bool = False) -> Optional[int]:
+    """
+    Nombre de lignes pour le % de progression: métadonnées SQL Server par défaut
+    (pas d'évaluation de la vue), COUNT_BIG(*) seulement si exact=True.
+    Returns: None si inconnu (vue non indexée)
+    """
     #logger = dlt.current.logger
-    logger.info(f"🔍 Executing row count for {db_source_name}")
+    logger.info(f"🔍 Row count for {db_source_name} ({'exact' if exact else 'metadata'})")
 
-    engine = create_engine(get_mssql_engine())
+    total = get_mssql_row_count(db_source_name, exact=exact, config_key="dlt")
+
+    if total is None:
+        logger.info(f"ℹ️  Row count unknown for {db_source_name} (view): progress without %")
+    else:
+        logger.info(f"✅ Total rows in {db_source_name}: {total:,}")
+    
+    return total
 
-    query = text(f"SELECT COUNT(*) AS nb_rows FROM {db_source_name} (nolock)")
+
+##### Bounded-memory chunks
+# Chunks Arrow d'environ chunk_mb MB quelle que soit la largeur de la vue: la taille
+# des fetch suit les octets par ligne mesurés, et une file bornée entre la lecture
+# SQL Server et dlt bloque la lecture quand dlt n'avance pas (backpressure).
+# Mémoire de pointe ~ (queue_chunks + 2) chunks, indépendante de la taille de la table.
+
+# Fetch par chunk: les lignes Python d'un fetch (plusieurs fois leur taille Arrow)
+# ne représentent qu'une fraction du chunk
+FETCHES_PER_CHUNK = 4
+MAX_FETCH_ROWS = 1_000_000
+
+
+def arrow_column_type(column_type: sa.types.TypeEngine) -> Tuple["pa.DataType", Optional[Callable]]:
+    """
+    Type Arrow d'une colonne reflétée par SQLAlchemy
+    Returns: Tuple (type Arrow, conversion des valeurs non NULL ou None)
+    """
+    if isinstance(column_type, sa.Boolean):
+        return pa.bool_(), None
+    if isinstance(column_type, sa.Integer):
+        return pa.int64(), None
+    if isinstance(column_type, (MONEY, SMALLMONEY)):
+        return pa.decimal128(19, 4), None
+    if isinstance(column_type, sa.Float):
+        return pa.float64(), float
+    if isinstance(column_type, sa.Numeric):
+        if column_type.precision:
+            return pa.decimal128(column_type.precision, column_type.scale or 0), None
+        return pa.float64(), float
+    if isinstance(column_type, DATETIMEOFFSET):
+        # Sous-classe de DateTime: testé avant, un timestamp naïf perdrait le décalage
+        return pa.string(), str
+    if isinstance(column_type, sa.DateTime):
+        return pa.timestamp("us"), None
+    if isinstance(column_type, sa.Date):
+        return pa.date32(), None
+    if isinstance(column_type, sa.Time):
+        return pa.time64("us"), None
+    if isinstance(column_type, sa.LargeBinary):
+        return pa.binary(), None
+    if isinstance(column_type, sa.String):
+        return pa.string(), None
+    # UNIQUEIDENTIFIER, SQL_VARIANT...: texte
+    return pa.string(), str
+
+
+def reflect_arrow_schema(engine: Engine, db_source_name: str) -> Tuple[sa.Table, "pa.Schema", List[Optional[Callable]]]:
+    """Table / vue reflétée, schéma Arrow et conversions par colonne"""
+    require_pyarrow()
+    schema_name, _, table_name = db_source_name.rpartition(".")
+    table = sa.Table(table_name, sa.MetaData(), schema=schema_name or None, autoload_with=engine)
+    fields, converters = [], []
+    for column in table.columns:
+        arrow_type, converter = arrow_column_type(column.type)
+        fields.append(pa.field(column.name, arrow_type))
+        converters.append(converter)
+    return table, pa.schema(fields), converters
+
+
+def iter_arrow_chunks(
+    engine: Engine,
+    db_source_name: str,
+    chunk_mb: int = Config.DLT_CHUNK_MB,
+    fetch_rows: int = Config.DLT_FETCH_ROWS,
+    where: Optional[str] = None,
+) -> Iterator["pa.Table"]:
+    """
+    Lecture en flux (curseur côté serveur) en tables Arrow d'environ chunk_mb MB
+    - premier fetch de fetch_rows lignes, puis fetch de chunk_mb / FETCHES_PER_CHUNK
+      d'après les octets par ligne mesurés (moyenne glissante)
+    - un chunk est rendu dès que le fetch suivant lui ferait dépasser chunk_mb
+    - where: condition T-SQL d'une partition (build_partition_conditions)
+    """
+    table, schema, converters = reflect_arrow_schema(engine, db_source_name)
+    target_bytes = chunk_mb * 1024 * 1024
+    bytes_per_row = None
+    size = fetch_rows
+    batches = []
+    chunk_bytes = 0
+
+    query = sa.select(table)
+    if where:
+        query = query.where(text(where))
 
     with engine.connect() as conn:
-        total = conn.execute(query).scalar()
+        result = conn.execution_options(stream_results=True).execute(query)
+        while True:
+            rows = result.fetchmany(size)
+            if not rows:
+                break
+
+            values = list(zip(*rows))
+            del rows
+            batch = pa.record_batch(
+                [
+                    pa.array(
+                        column if converter is None else [None if v is None else converter(v) for v in column],
+                        type=field.type,
+                    )
+                    for column, converter, field in zip(values, converters, schema)
+                ],
+                schema=schema,
+            )
+            del values
+            batches.append(batch)
+            chunk_bytes += batch.nbytes
+
+            measured = batch.nbytes / batch.num_rows
+            bytes_per_row = measured if bytes_per_row is None else 0.5 * bytes_per_row + 0.5 * measured
+            size = min(max(int(target_bytes / FETCHES_PER_CHUNK / bytes_per_row), 1), MAX_FETCH_ROWS)
+
+            if chunk_bytes + size * bytes_per_row > target_bytes:
+                yield pa.Table.from_batches(batches, schema=schema)
+                batches = []
+                chunk_bytes = 0
+
+    if batches:
+        yield pa.Table.from_batches(batches, schema=schema)
+
+
+_END_OF_CHUNKS = object()
+
+
+def iter_bounded(make_iterator: Callable[[], Iterator], max_items: int = Config.DLT_QUEUE_CHUNKS) -> Iterator:
+    """
+    Produit les éléments de make_iterator() dans un thread, via une file de max_items
+    éléments: le producteur attend quand la file est pleine (backpressure).
+    Une erreur du producteur est relevée côté consommateur; l'arrêt du consommateur
+    (générateur fermé) arrête le producteur.
+    """
+    return iter_bounded_many([make_iterator], max_items)
+
+
+def iter_bounded_many(make_iterators: List[Callable[[], Iterator]], max_items: int = Config.DLT_QUEUE_CHUNKS) -> Iterator:
+    """
+    iter_bounded avec un thread producteur par itérateur (lectures partitionnées):
+    une seule file bornée pour tous, éléments rendus dans leur ordre d'arrivée
+    """
+    items = queue.Queue(maxsize=max_items)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce(make_iterator):
+        iterator = None
+        try:
+            iterator = make_iterator()
+            for item in iterator:
+                if not put(item):
+                    return
+            put(_END_OF_CHUNKS)
+        except BaseException as e:
+            put(e)
+        finally:
+            if iterator is not None:
+                iterator.close()
+
+    producers = [
+        threading.Thread(target=produce, args=(make_iterator,), name=f"bounded-extract-{i}", daemon=True)
+        for i, make_iterator in enumerate(make_iterators)
+    ]
+    for producer in producers:
+        producer.start()
+    try:
+        running = len(producers)
+        while running:
+            item = items.get()
+            if item is _END_OF_CHUNKS:
+                running -= 1
+                continue
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+            # Pas de référence au chunk pendant l'attente du suivant
+            item = None
+    finally:
+        stop.set()
+        for producer in producers:
+            producer.join(timeout=5)
+
+
+##### Arrow readers
+# Lecteur des chunks Arrow de extract_from_mssql (Config.DLT_READER):
+# - "sqlalchemy": fetchmany pyodbc puis conversion en colonnes (iter_arrow_chunks)
+# - "connectorx": client Rust, lignes écrites directement en record batches Arrow
+# - "turbodbc": buffers ODBC en colonnes convertis en Arrow côté C++
+# Les lecteurs natifs ne créent pas d'objets Python par valeur (gain surtout sur
+# les vues larges). Les chunks sont convertis au schéma reflété par SQLAlchemy:
+# mêmes types Arrow quel que soit le lecteur.
+
+# Module requis par lecteur (None: toujours disponible)
+ARROW_READERS = {
+    "sqlalchemy": None,
+    "connectorx": "connectorx",
+    "turbodbc": "turbodbc",
+}
+
+# Lignes par record batch connectorx, regroupés ensuite en chunks de chunk_mb MB
+CONNECTORX_BATCH_ROWS = 10_000
+
+
+def resolve_reader(reader: str) -> str:
+    """Lecteur utilisable: "sqlalchemy" si reader est inconnu ou son module absent"""
+    if reader not in ARROW_READERS:
+        logger.warning(f"⚠️  Unknown Arrow reader '{reader}', using sqlalchemy")
+        return "sqlalchemy"
+    module = ARROW_READERS[reader]
+    if module is not None and importlib.util.find_spec(module) is None:
+        logger.warning(f"⚠️  Arrow reader '{reader}' not installed (pip install {module}), using sqlalchemy")
+        return "sqlalchemy"
+    return reader
+
+
+def select_query(engine: Engine, table: sa.Table, where: Optional[str] = None) -> str:
+    """SELECT de la table reflétée, compilé pour le dialecte de l'engine (lecteurs natifs)"""
+    query = sa.select(table)
+    if where:
+        query = query.where(text(where))
+    return str(query.compile(engine, compile_kwargs={"literal_binds": True}))
+
+
+def iter_grouped(batches: Iterator["pa.RecordBatch"], chunk_mb: int) -> Iterator["pa.Table"]:
+    """Regroupe des record batches en tables Arrow d'environ chunk_mb MB"""
+    target_bytes = chunk_mb * 1024 * 1024
+    group = []
+    group_bytes = 0
+    for batch in batches:
+        group.append(batch)
+        group_bytes += batch.nbytes
+        if group_bytes >= target_bytes:
+            yield pa.Table.from_batches(group)
+            group = []
+            group_bytes = 0
+    if group:
+        yield pa.Table.from_batches(group)
+
+
+def iter_connectorx_chunks(query: str, chunk_mb: int) -> Iterator["pa.Table"]:
+    """Lecture connectorx en flux (arrow_stream) d'une requête"""
+    import connectorx
+
+    reader = connectorx.read_sql(
+        build_connectorx_url("dlt"),
+        query,
+        return_type="arrow_stream",
+        batch_size=CONNECTORX_BATCH_ROWS,
+    )
+    yield from iter_grouped(iter(reader), chunk_mb)
 
-    logger.info(f"✅ Total rows in {db_source_name}: {total:,}")
-    
-    return total
+
+def iter_turbodbc_chunks(query: str, chunk_mb: int) -> Iterator["pa.Table"]:
+    """Lecture turbodbc d'une requête en tables Arrow (buffer de lecture de chunk_mb MB)"""
+    import turbodbc
+
+    options = turbodbc.make_options(
+        read_buffer_size=turbodbc.Megabytes(chunk_mb),
+        prefer_unicode=True,
+        # Buffer suivant lu pendant que dlt traite le chunk courant
+        use_async_io=True,
+    )
+    connection = turbodbc.connect(
+        connection_string=build_odbc_connection_string("dlt"),
+        turbodbc_options=options,
+    )
+    try:
+        cursor = connection.cursor()
+        cursor.execute(query)
+        yield from cursor.fetcharrowbatches()
+    finally:
+        connection.close()
+
+
+def iter_reader_chunks(
+    db_source_name: str,
+    reader: str = Config.DLT_READER,
+    chunk_mb: int = Config.DLT_CHUNK_MB,
+    queue_chunks: int = Config.DLT_QUEUE_CHUNKS,
+    partition_column: Optional[str] = None,
+    num_partitions: int = 1,
+    strategy: str = "range",
+) -> Iterator["pa.Table"]:
+    """
+    Chunks Arrow d'environ chunk_mb MB lus par reader, file bornée de queue_chunks
+    chunks (iter_bounded_many)
+    - partition_column et num_partitions > 1: une lecture par partition
+      (build_partition_conditions), chacune sur sa connexion, en parallèle;
+      "range" par défaut (colonne indexée), "hash" relit toute la vue par partition
+    - un lecteur natif en échec avant son premier chunk (conversion au schéma reflété
+      impossible sans perte comprise) est remplacé par "sqlalchemy"; après un premier
+      chunk l'erreur est relevée (pas de lignes en double)
+    """
+    reader = resolve_reader(reader)
+    engine = get_mssql_engine("dlt")
+    conditions = (
+        build_partition_conditions(db_source_name, partition_column, num_partitions, strategy)
+        if partition_column and num_partitions > 1
+        else [None]
+    )
+
+    def sqlalchemy_chunks():
+        return iter_bounded_many(
+            [lambda c=c: iter_arrow_chunks(engine, db_source_name, chunk_mb, where=c) for c in conditions],
+            queue_chunks,
+        )
+
+    if reader == "sqlalchemy":
+        yield from sqlalchemy_chunks()
+        return
+
+    read = iter_connectorx_chunks if reader == "connectorx" else iter_turbodbc_chunks
+    yielded = False
+    try:
+        table, schema, _ = reflect_arrow_schema(engine, db_source_name)
+        queries = [select_query(engine, table, c) for c in conditions]
+        for chunk in iter_bounded_many([lambda q=q: read(q, chunk_mb) for q in queries], queue_chunks):
+            # safe=True: une valeur tronquée / hors plage lève une erreur au lieu d'être altérée
+            chunk = chunk.cast(schema, safe=True)
+            yielded = True
+            yield chunk
+    except Exception as e:
+        if yielded:
+            raise
+        logger.error(f"❌ Arrow reader '{reader}' failed for {db_source_name} ({e}), falling back to sqlalchemy")
+        yield from sqlalchemy_chunks()
 
 
 ### Extract from mssql
 def extract_from_mssql(
     db_source_name: str,
-    log_every: int = 200_000
+    log_every: int = 200_000,
+    chunk_mb: int = Config.DLT_CHUNK_MB,
+    queue_chunks: int = Config.DLT_QUEUE_CHUNKS,
+    reader: str = Config.DLT_READER,
+    partition_column: Optional[str] = None,
+    num_partitions: int = 1,
 ):
+    """
+    Chunks Arrow d'une table / vue SQL Server pour une ressource dlt
+    - chunk_mb > 0: chunks d'environ chunk_mb MB lus par reader ("sqlalchemy",
+      "connectorx", "turbodbc") et file bornée de queue_chunks chunks
+      (iter_reader_chunks): mémoire bornée sur les vues larges; lectures
+      parallèles par partition si partition_column est défini
+    - chunk_mb = 0: sql_database dlt, chunks fixes de 300 000 lignes en parallèle
+    """
     #logger = dlt.current.logger
 
     # Nb rows
     total_rows = get_nb_rows(db_source_name)
 
-    logger.info(f"🚀 Starting multi-thread extraction for {db_source_name}")
-
     extracted_rows = 0
 
-    # DLT source multi-threads
-    source = (
-        sql_database(
-            get_mssql_engine(),
-            backend="pyarrow",
-            chunk_size=300_000,
-            reflection_level="minimal",
-            include_views=True,
-        ).with_resources(db_source_name).parallelize()
-    )
+    if chunk_mb:
+        logger.info(
+            f"🚀 Starting bounded-memory extraction for {db_source_name} "
+            f"(~{chunk_mb} MB chunks, queue of {queue_chunks}, {reader} reader"
+            + (f", {num_partitions} partitions on {partition_column})" if partition_column else ")")
+        )
+        source = iter_reader_chunks(
+            db_source_name, reader, chunk_mb, queue_chunks, partition_column, num_partitions,
+        )
+    else:
+        logger.info(f"🚀 Starting multi-thread extraction for {db_source_name}")
+
+        # DLT source multi-threads
+        source = (
+            sql_database(
+                get_mssql_engine("dlt"),
+                backend="pyarrow",
+                chunk_size=300_000,
+                reflection_level="minimal",
+                include_views=True,
+            ).with_resources(db_source_name).parallelize()
+        )
 
     # Data stream in chunks 
     for chunk in source:
@@ -88,19 +444,22 @@ def extract_from_mssql(
 
         # Progress %
         if extracted_rows % log_every < chunk_size:
-            pct = (extracted_rows / total_rows) * 100 if total_rows else 0
-
-            logger.info(
-                f"📊 {db_source_name} progress: "
-                f"{extracted_rows:,}/{total_rows:,} rows "
-                f"({pct:.1f}%)"
-            )
+            if total_rows:
+                pct = (extracted_rows / total_rows) * 100
+                logger.info(
+                    f"📊 {db_source_name} progress: "
+                    f"{extracted_rows:,}/{total_rows:,} rows "
+                    f"({pct:.1f}%)"
+                )
+            else:
+                logger.info(f"📊 {db_source_name} progress: {extracted_rows:,} rows")
 
         yield chunk
 
     logger.info(
         f"✅ Finished extraction for {db_source_name}: "
-        f"{extracted_rows:,}/{total_rows:,} rows loaded (100%)"
+        f"{extracted_rows:,} rows loaded"
+        + (f" (estimated {total_rows:,})" if total_rows is not None else "")
     )
 
 
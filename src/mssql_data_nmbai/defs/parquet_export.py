@@ -0,0 +1,540 @@
+import re
+import struct
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+import logging
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+from mssql_data_nmbai.defs.config import (
+    BCPExporter,
+    Config,
+    extract_mssql_table_schema,
+    get_mssql_engine,
+    get_partition_path,
+    normalize_column_name,
+)
+from mssql_data_nmbai.defs.instrumentation import span
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow requis seulement pour EXPORT_FORMAT parquet et le décodage natif
+    pa = pq = None
+
+load_dotenv()
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def require_pyarrow():
+    """Erreur explicite si pyarrow manque (le chemin CSV / bcp n'en a pas besoin)"""
+    if pa is None:
+        raise RuntimeError("❌ Export Parquet / natif: installer pyarrow (pip install pyarrow)")
+
+
+## Mapping SNOWFLAKE to Arrow ==========================
+
+def map_snowflake_to_arrow(snowflake_type: str) -> "pa.DataType":
+    """
+    Convertit un type Snowflake (sortie de extract_mssql_table_schema) en type Arrow,
+    pour que les colonnes Parquet correspondent exactement au DDL généré.
+
+    Args:
+        snowflake_type: Type Snowflake (ex: 'NUMBER(10,0)', 'VARCHAR(255) NULL')
+
+    Returns:
+        Type Arrow équivalent
+    """
+
+    sf_type = snowflake_type.upper().replace(" NULL", "").strip()
+
+    number = re.match(r"NUMBER\((\d+),(\d+)\)", sf_type)
+    if number:
+        return pa.decimal128(int(number.group(1)), int(number.group(2)))
+
+    type_mapping = {
+        'BOOLEAN': pa.bool_(),
+        'FLOAT': pa.float64(),
+        'DATE': pa.date32(),
+        'TIMESTAMP_NTZ': pa.timestamp('us'),
+        'TIME': pa.time64('us'),
+        'BINARY': pa.binary(),
+    }
+
+    # VARCHAR(n), TIMESTAMP_TZ, VARIANT, GEOGRAPHY, GEOMETRY: convertis en texte côté SQL Server
+    return type_mapping.get(sf_type, pa.string())
+
+
+def build_parquet_select(
+    table_name: str,
+    columns: List[Tuple[str, str]],
+    top_n: Optional[int] = None,
+    native: bool = False,
+) -> str:
+    """
+    Construit le SELECT explicite de l'export Parquet.
+    Les types que pyodbc ne sait pas lire (datetimeoffset, xml, spatial) sont
+    convertis en texte; Snowflake les re-type au COPY.
+    native=True (export bcp -n): le texte est lu en NVARCHAR (UTF-16, sans page de
+    code), les dates en DATETIME2(7) / TIME(7) pour un seul encodage binaire à décoder.
+    """
+
+    select_list = []
+    for col_name, col_type in columns:
+        sf_type = col_type.upper().replace(" NULL", "").strip()
+        alias = normalize_column_name(col_name)
+
+        if sf_type == 'TIMESTAMP_TZ':
+            expression = f"CONVERT(VARCHAR(40), [{col_name}], 127)"
+        elif sf_type == 'VARIANT':
+            expression = f"CAST([{col_name}] AS NVARCHAR(MAX))"
+        elif sf_type in ('GEOGRAPHY', 'GEOMETRY'):
+            expression = f"[{col_name}].STAsText()"
+        else:
+            expression = f"[{col_name}]"
+
+        if native:
+            varchar = re.match(r"VARCHAR\((\d+)\)", sf_type)
+            if sf_type == 'TIMESTAMP_NTZ':
+                expression = f"CAST({expression} AS DATETIME2(7))"
+            elif sf_type == 'TIME':
+                expression = f"CAST({expression} AS TIME(7))"
+            elif varchar and int(varchar.group(1)) <= 4000:
+                expression = f"CAST({expression} AS NVARCHAR({varchar.group(1)}))"
+            elif varchar or sf_type in ('TIMESTAMP_TZ', 'VARIANT', 'GEOGRAPHY', 'GEOMETRY'):
+                expression = f"CAST({expression} AS NVARCHAR(MAX))"
+
+        select_list.append(f"{expression} AS [{alias}]")
+
+    top = f"TOP {top_n} " if top_n else ""
+    return f"SELECT {top}{', '.join(select_list)} FROM {table_name} WITH (NOLOCK)"
+
+
+# ===EXPORT PARQUET ============
+
+def export_parquet(
+    table_name: str,
+    output_path: Path,
+    top_n: Optional[int] = None,
+    batch_rows: int = Config.PARQUET_BATCH_ROWS,
+    rows_per_file: int = Config.PARQUET_ROWS_PER_FILE,
+) -> Tuple[bool, float, float, List[Path]]:
+    """
+    Export SQL Server → Parquet en flux: lecture par lots de batch_rows lignes
+    (curseur côté serveur), écriture en row groups typés, un nouveau fichier
+    tous les rows_per_file lignes.
+    - table_name: nom de la table / vue (ex: v_Inventory_Parts_Ops)
+    - output_path: chemin de base (.parquet), les fichiers sont suffixés _partNNN
+    Returns: Tuple (success, duration_seconds, total_size_MB, files)
+    """
+    require_pyarrow()
+
+    start = time.time()
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    columns = extract_mssql_table_schema(table_name)
+    schema = pa.schema([
+        pa.field(normalize_column_name(col_name), map_snowflake_to_arrow(col_type))
+        for col_name, col_type in columns
+    ])
+    query = build_parquet_select(table_name, columns, top_n)
+    logger.info(f"🔄 Requête Parquet: {query[:200]}...")
+
+    files = []
+    writer = None
+    rows_in_file = 0
+    total_rows = 0
+
+    engine = get_mssql_engine()
+    try:
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(text(query))
+
+            while True:
+                rows = result.fetchmany(batch_rows)
+                if not rows:
+                    break
+
+                values = list(zip(*rows))
+                batch = pa.record_batch(
+                    [pa.array(values[i], type=field.type) for i, field in enumerate(schema)],
+                    schema=schema,
+                )
+
+                if writer is None:
+                    path = get_partition_path(output_path, len(files))
+                    writer = pq.ParquetWriter(path, schema, compression="snappy")
+                    files.append(path)
+                    rows_in_file = 0
+
+                writer.write_batch(batch)
+                rows_in_file += batch.num_rows
+                total_rows += batch.num_rows
+
+                if rows_in_file >= rows_per_file:
+                    writer.close()
+                    writer = None
+                    logger.info(f"   ✓ {files[-1].name}: {rows_in_file:,} lignes")
+    finally:
+        if writer is not None:
+            writer.close()
+            logger.info(f"   ✓ {files[-1].name}: {rows_in_file:,} lignes")
+
+    duration = time.time() - start
+    size_mb = sum(f.stat().st_size for f in files) / (1024 * 1024)
+    logger.info(
+        f"✅ Export Parquet réussi: {total_rows:,} lignes, Durée {duration:.2f}s, "
+        f"Taille {size_mb:.2f} MB, {len(files)} fichiers"
+    )
+    return True, duration, size_mb, files
+
+
+# ===DÉCODAGE BCP NATIF (-n) ============
+# Décodage ligne à ligne en Python (quelques µs par valeur), plus lent que l'export
+# CSV (chemin "native" de benchmarks/run.py face à "bcp"): pas proposé dans
+# EXPORT_FORMATS tant que le benchmark ne le montre pas plus rapide.
+
+XSI_TYPE = "{http://www.w3.org/2001/XMLSchema-instance}type"
+BCP_FORMAT_NS = "{http://schemas.microsoft.com/sqlserver/2004/bulkload/format}"
+DATETIME_EPOCH = datetime(1900, 1, 1)
+DATE_EPOCH = date(1, 1, 1)
+
+
+def read_bcp_format_file(format_path: Path) -> List[Tuple[str, str, int, int, int]]:
+    """
+    Lit un fichier de format XML bcp (bcp ... format nul -n -x).
+    Returns: liste (nom, type SQL, longueur du préfixe, longueur fixe, échelle)
+    dans l'ordre des champs du fichier de données
+    """
+    root = ET.parse(format_path).getroot()
+    columns = {
+        column.get("SOURCE"): column
+        for column in root.iter(f"{BCP_FORMAT_NS}COLUMN")
+    }
+
+    fields = []
+    for field in root.iter(f"{BCP_FORMAT_NS}FIELD"):
+        column = columns[field.get("ID")]
+        fields.append((
+            column.get("NAME"),
+            column.get(XSI_TYPE),
+            int(field.get("PREFIX_LENGTH", 0)),
+            int(field.get("LENGTH", 0)),
+            int(column.get("SCALE", 7)),
+        ))
+    return fields
+
+
+def _decode_time(data: bytes, scale: int) -> timedelta:
+    """time(n) natif: nombre d'unités de 10^-n secondes depuis minuit (3 à 5 octets)"""
+    units = int.from_bytes(data, "little")
+    return timedelta(microseconds=units * 1_000_000 // 10 ** scale)
+
+
+def native_decoder(sql_type: str, scale: int) -> Callable[[bytes], object]:
+    """
+    Décodeur d'une valeur bcp native (représentation binaire SQL Server)
+    vers la valeur Python attendue par pyarrow
+    """
+    if sql_type in ('SQLNCHAR', 'SQLNVARCHAR', 'SQLNTEXT'):
+        return lambda data: data.decode("utf-16-le")
+    if sql_type in ('SQLCHAR', 'SQLVARYCHAR', 'SQLTEXT'):
+        return lambda data: data.decode("utf-8", errors="replace")
+    if sql_type in ('SQLBINARY', 'SQLVARYBIN', 'SQLIMAGE'):
+        return bytes
+    if sql_type == 'SQLBIT':
+        return lambda data: data[0] != 0
+    if sql_type == 'SQLTINYINT':
+        return lambda data: data[0]
+    if sql_type in ('SQLSMALLINT', 'SQLINT', 'SQLBIGINT'):
+        return lambda data: int.from_bytes(data, "little", signed=True)
+    if sql_type == 'SQLFLT8':
+        return lambda data: struct.unpack("<d", data)[0]
+    if sql_type == 'SQLFLT4':
+        return lambda data: struct.unpack("<f", data)[0]
+    if sql_type == 'SQLMONEY':
+        # 8 octets: partie haute signée puis partie basse, en 1/10000
+        def decode_money(data):
+            high, low = struct.unpack("<iI", data)
+            return Decimal((high << 32) | low).scaleb(-4)
+        return decode_money
+    if sql_type == 'SQLMONEY4':
+        return lambda data: Decimal(int.from_bytes(data, "little", signed=True)).scaleb(-4)
+    if sql_type in ('SQLDECIMAL', 'SQLNUMERIC'):
+        # 19 octets: précision, échelle, signe (1 = positif), mantisse 16 octets
+        def decode_decimal(data):
+            value = int.from_bytes(data[3:19], "little")
+            return Decimal(value if data[2] == 1 else -value).scaleb(-data[1])
+        return decode_decimal
+    if sql_type == 'SQLDATETIME':
+        # jours depuis 1900-01-01 puis 1/300 de seconde
+        def decode_datetime(data):
+            days, ticks = struct.unpack("<iI", data)
+            return DATETIME_EPOCH + timedelta(days=days, microseconds=ticks * 10_000 // 3)
+        return decode_datetime
+    if sql_type == 'SQLDATETIM4':
+        def decode_smalldatetime(data):
+            days, minutes = struct.unpack("<HH", data)
+            return DATETIME_EPOCH + timedelta(days=days, minutes=minutes)
+        return decode_smalldatetime
+    if sql_type == 'SQLDATE':
+        return lambda data: DATE_EPOCH + timedelta(days=int.from_bytes(data, "little"))
+    if sql_type == 'SQLTIME':
+        return lambda data: (datetime.min + _decode_time(data, scale)).time()
+    if sql_type == 'SQLDATETIME2':
+        # time(n) puis date (3 octets)
+        def decode_datetime2(data):
+            days = int.from_bytes(data[-3:], "little")
+            return datetime.combine(DATE_EPOCH + timedelta(days=days), datetime.min.time()) + _decode_time(data[:-3], scale)
+        return decode_datetime2
+    if sql_type == 'SQLUNIQUEID':
+        return lambda data: str(uuid.UUID(bytes_le=bytes(data))).upper()
+
+    raise ValueError(f"Type bcp natif non supporté: {sql_type}")
+
+
+class NativeFileReader:
+    """Lecture bufferisée d'un fichier de données bcp natif"""
+
+    def __init__(self, data_path: Path, buffer_size: int = 8 * 1024 * 1024):
+        self.file = open(data_path, "rb")
+        self.buffer_size = buffer_size
+        self.buffer = b""
+        self.position = 0
+
+    def at_end(self) -> bool:
+        if self.position < len(self.buffer):
+            return False
+        self.buffer = self.file.read(self.buffer_size)
+        self.position = 0
+        return not self.buffer
+
+    def take(self, size: int) -> bytes:
+        end = self.position + size
+        if end > len(self.buffer):
+            # Valeur à cheval sur deux blocs
+            rest = self.buffer[self.position:]
+            self.buffer = rest + self.file.read(max(self.buffer_size, size - len(rest)))
+            self.position, end = 0, size
+            if end > len(self.buffer):
+                raise EOFError("Fichier bcp natif tronqué")
+        data = self.buffer[self.position:end]
+        self.position = end
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def iter_bcp_native_rows(
+    data_path: Path,
+    fields: List[Tuple[str, str, int, int, int]],
+) -> Iterator[list]:
+    """
+    Lignes d'un fichier bcp natif, décodées en valeurs Python.
+    Champ à préfixe: longueur sur 1, 2, 4 ou 8 octets, NULL si tous les bits à 1.
+    """
+    decoders = [
+        (prefix_length, fixed_length, (1 << (8 * prefix_length)) - 1, native_decoder(sql_type, scale))
+        for _, sql_type, prefix_length, fixed_length, scale in fields
+    ]
+    reader = NativeFileReader(data_path)
+    try:
+        while not reader.at_end():
+            row = []
+            for prefix_length, fixed_length, null_marker, decode in decoders:
+                if prefix_length:
+                    length = int.from_bytes(reader.take(prefix_length), "little")
+                    if length == null_marker:
+                        row.append(None)
+                        continue
+                else:
+                    length = fixed_length
+                row.append(decode(reader.take(length)))
+            yield row
+    finally:
+        reader.close()
+
+
+def convert_bcp_native_to_parquet(
+    data_path: Path,
+    format_path: Path,
+    schema: "pa.Schema",
+    output_path: Path,
+    batch_rows: int = Config.PARQUET_BATCH_ROWS,
+    rows_per_file: int = Config.PARQUET_ROWS_PER_FILE,
+) -> Tuple[int, List[Path]]:
+    """
+    Convertit un export bcp natif en fichiers Parquet typés (schema), sans passer
+    par du texte. Un nouveau fichier tous les rows_per_file lignes (_partNNN).
+    Returns: Tuple (nombre de lignes, fichiers)
+    """
+    fields = read_bcp_format_file(format_path)
+    if len(fields) != len(schema):
+        raise ValueError(f"Format bcp ({len(fields)} champs) incompatible avec le schéma ({len(schema)} colonnes)")
+
+    files = []
+    writer = None
+    rows_in_file = 0
+    total_rows = 0
+    batch = []
+
+    def flush():
+        nonlocal writer, rows_in_file, total_rows
+        if writer is None:
+            path = get_partition_path(output_path, len(files))
+            writer = pq.ParquetWriter(path, schema, compression="snappy")
+            files.append(path)
+            rows_in_file = 0
+        values = list(zip(*batch))
+        writer.write_batch(pa.record_batch(
+            [pa.array(values[i], type=field.type) for i, field in enumerate(schema)],
+            schema=schema,
+        ))
+        rows_in_file += len(batch)
+        total_rows += len(batch)
+        batch.clear()
+
+    try:
+        for row in iter_bcp_native_rows(data_path, fields):
+            batch.append(row)
+            if len(batch) >= batch_rows:
+                flush()
+                if rows_in_file >= rows_per_file:
+                    writer.close()
+                    writer = None
+                    logger.info(f"   ✓ {files[-1].name}: {rows_in_file:,} lignes")
+        if batch:
+            flush()
+    finally:
+        if writer is not None:
+            writer.close()
+            logger.info(f"   ✓ {files[-1].name}: {rows_in_file:,} lignes")
+
+    return total_rows, files
+
+
+def export_mssql_native_parquet(
+    table_name: str,
+    logger,
+    top_n: Optional[int] = None,
+    output_path: Optional[Path] = None,
+) -> bool:
+    """
+    Export bcp en format natif (-n) puis conversion locale en Parquet.
+    Pas de formatage texte des dates / décimaux côté SQL Server ni de parsing
+    côté Snowflake; COPY en MATCH_BY_COLUMN_NAME comme l'export Parquet.
+    Pas branché sur extract_mssql_data (hors EXPORT_FORMATS): sert à mesurer le
+    décodage sur les vraies tables avant de le proposer.
+    output_path: chemin de base, Config.OUTPUT_PATH en .parquet par défaut
+    """
+    require_pyarrow()
+
+    output_path = (output_path or Config.OUTPUT_PATH).with_suffix(".parquet")
+    data_path = output_path.with_suffix(".dat")
+
+    logger.info("=" * 80)
+    logger.info(f"📤 Export BCP natif depuis SQL Server pour la table {table_name}")
+    logger.info("=" * 80)
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    for existing in output_path.parent.glob(f"{output_path.stem}*{output_path.suffix}"):
+        existing.unlink()
+        logger.info(f"🗑️  Fichier existant supprimé: {existing}")
+
+    columns = extract_mssql_table_schema(table_name)
+    schema = pa.schema([
+        pa.field(normalize_column_name(col_name), map_snowflake_to_arrow(col_type))
+        for col_name, col_type in columns
+    ])
+
+    exporter = BCPExporter(
+        server=f"{Config.MSSQL_SERVER}",
+        database=Config.MSSQL_DATABASE,
+        username=Config.MSSQL_USER,
+        password=Config.MSSQL_PASSWORD,
+        use_wsl=Config.USE_WSL,
+        trust_server_certificate=True
+    )
+
+    format_path = None
+    try:
+        with span("export") as export_span:
+            _, bcp_duration, data_size_mb, format_path = exporter.export_native(
+                table_name=table_name,
+                output_path=data_path,
+                query=build_parquet_select(table_name, columns, top_n, native=True),
+            )
+
+            start = time.time()
+            total_rows, files = convert_bcp_native_to_parquet(data_path, format_path, schema, output_path)
+            convert_duration = time.time() - start
+            export_span.rows = total_rows
+            export_span.bytes = sum(f.stat().st_size for f in files)
+
+        logger.info(f"✅ Export BCP natif terminé: {total_rows:,} lignes")
+        logger.info(f"   Temps BCP: {bcp_duration:.2f}s ({data_size_mb:.2f} MB), conversion Parquet: {convert_duration:.2f}s")
+        logger.info(f"   Fichiers: {', '.join(str(f) for f in files)}")
+
+        return True
+
+    except Exception as e:
+        logger.error(f"❌ Erreur export BCP natif: {e}")
+        raise
+    finally:
+        data_path.unlink(missing_ok=True)
+        if format_path is not None:
+            format_path.unlink(missing_ok=True)
+
+
+def export_mssql_parquet(
+    table_name: str,
+    logger,
+    top_n: Optional[int] = None,
+    output_path: Optional[Path] = None,
+) -> bool:
+    """
+    Export Parquet depuis SQL Server (alternative au CSV bcp).
+    output_path: chemin de base, Config.OUTPUT_PATH en .parquet par défaut
+    """
+    require_pyarrow()
+
+    output_path = (output_path or Config.OUTPUT_PATH).with_suffix(".parquet")
+
+    logger.info("=" * 80)
+    logger.info(f"📤 Export Parquet depuis SQL Server pour la table {table_name}")
+    logger.info("=" * 80)
+
+    # Supprimer les fichiers d'un export précédent
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    for existing in output_path.parent.glob(f"{output_path.stem}*{output_path.suffix}"):
+        existing.unlink()
+        logger.info(f"🗑️  Fichier existant supprimé: {existing}")
+
+    try:
+        with span("export") as export_span:
+            success, duration, file_size_mb, files = export_parquet(
+                table_name=table_name,
+                output_path=output_path,
+                top_n=top_n,
+            )
+            # Lignes lues dans les métadonnées Parquet (pas de relecture des données)
+            export_span.rows = sum(pq.ParquetFile(f).metadata.num_rows for f in files)
+            export_span.bytes = int(file_size_mb * 1024 * 1024)
+
+        logger.info(f"✅ Export Parquet terminé en {duration:.2f}s")
+        logger.info(f"   Fichiers: {', '.join(str(f) for f in files)}")
+        logger.info(f"   Taille: {file_size_mb:.2f} MB")
+
+        return success
+
+    except Exception as e:
+        logger.error(f"❌ Erreur export Parquet: {e}")
+        raise
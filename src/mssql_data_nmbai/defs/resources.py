@@ -0,0 +1,35 @@
+from contextlib import contextmanager
+
+import dagster as dg
+
+from mssql_data_nmbai.defs.config import Config
+from mssql_data_nmbai.defs.snowflake_dest import snowflake_session_pool
+
+
+##### RESSOURCES DAGSTER
+
+class SnowflakeSessionResource(dg.ConfigurableResource):
+    """
+    Sessions Snowflake partagées (pool du process, voir SnowflakeSessionPool).
+    Les fonctions du pipeline BCP + COPY INTO prennent leurs sessions dans ce pool;
+    la ressource fixe sa taille au démarrage du step et ferme ses sessions
+    inactives à la fin (les sessions en cours d'utilisation ne sont pas touchées).
+    """
+
+    max_idle_sessions: int = Config.SF_POOL_MAX_IDLE
+    idle_timeout_seconds: int = Config.SF_POOL_IDLE_TIMEOUT
+
+    def setup_for_execution(self, context: dg.InitResourceContext) -> None:
+        snowflake_session_pool.configure(
+            max_idle = self.max_idle_sessions,
+            idle_timeout = self.idle_timeout_seconds,
+        )
+
+    def teardown_after_execution(self, context: dg.InitResourceContext) -> None:
+        snowflake_session_pool.close_all()
+
+    @contextmanager
+    def get_session(self, database: str = Config.SF_DATABASE, schema: str = Config.SF_SCHEMA):
+        """Session du pool, rendue à la sortie du bloc with"""
+        with snowflake_session_pool.session(database, schema) as conn:
+            yield conn
@@ -0,0 +1,46 @@
+from typing import Dict
+
+from mssql_data_nmbai.defs.config import Config
+
+
+##### ORDONNANCEMENT DES JOBS DE NUIT
+# Les jobs de nuit (tables complètes, partitions récentes, lignes hors partitions)
+# partent à des heures décalées (Config.*_CRON) et partagent deux pools Dagster:
+# - pool SQL Server (MSSQL_EXTRACT_POOL): étapes qui exportent de SQL Server. Une
+#   étape en un seul op (partition, incrémental, flux...) charge aussi son COPY INTO
+#   en gardant ce créneau
+# - pool Snowflake (SNOWFLAKE_LOAD_POOL): COPY INTO séparés de leur export (tables
+#   en chargement complet, build_full_load_asset)
+# Les pools sont des limites de l'instance Dagster, valables pour toutes les runs
+# (un backfill ne double pas la charge sur SQL Server), et non de l'executor d'une run:
+#   dagster instance concurrency set mssql_extract <Config.MSSQL_EXTRACT_SLOTS>
+#   dagster instance concurrency set snowflake_load <Config.SNOWFLAKE_LOAD_SLOTS>
+# Sans limite définie sur l'instance, un pool ne limite rien.
+# Tag dagster/priority: durée attendue de l'asset (TableSpec.expected_duration),
+# les plus longs démarrent d'abord. Valeur du registre, et non mesure locale:
+# les définitions sont les mêmes sur tous les hôtes. Les durées observées sont
+# dans les métadonnées des matérialisations (duration_seconds).
+
+MSSQL_EXTRACT_POOL = "mssql_extract"
+SNOWFLAKE_LOAD_POOL = "snowflake_load"
+
+
+def bcp_asset_tags(expected_duration: int) -> Dict[str, str]:
+    """
+    op_tags d'un asset BCP + COPY INTO (le créneau est le pool de l'op)
+    Priorité = durée attendue en secondes (les plus longs d'abord)
+    """
+    return {"dagster/priority": str(int(expected_duration))}
+
+
+def nightly_executor_config(max_concurrent: int = Config.NIGHTLY_MAX_CONCURRENT) -> dict:
+    """Config d'exécution d'un job de nuit: executor multiprocess (les pools bornent SQL Server et Snowflake)"""
+    return {
+        "execution": {
+            "config": {
+                "multiprocess": {
+                    "max_concurrent": max_concurrent,
+                }
+            }
+        }
+    }
@@ -5,14 +5,31 @@ from datetime import datetime
 import snowflake.connector
 from dotenv import load_dotenv
 import logging
-from mssql_data_nmbai.defs.config import Config, generate_snowflake_ddl 
+from mssql_data_nmbai.defs.config import Config, ddl_digest, extract_mssql_table_schema, generate_snowflake_ddl, get_cached_ddl_digest, get_run_table_suffix, normalize_column_name, set_cached_ddl_digest
+from mssql_data_nmbai.defs.instrumentation import span, spanned
 import os
 import subprocess
 import time
 from pathlib import Path
 import logging
+import glob
+import gzip
+import atexit
+import contextvars
+import hashlib
+import queue
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
-from typing import Optional, Tuple, List
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple, List, Union
+
+try:
+    import zstandard
+except ImportError:  # compression zstd optionnelle
+    zstandard = None
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -30,22 +47,105 @@ def get_snowflake_connection(database: str = Config.SF_DATABASE, schema: str = C
         database=database,
         schema=schema,
         role=Config.SF_ROLE,
+        client_session_keep_alive=True,
     )
 
 
+class SnowflakeSessionPool:
+    """
+    Pool de sessions Snowflake partagé par le process (une file par base / schéma).
+    Les étapes d'un asset (setup, PUT, COPY) et les assets qui s'enchaînent dans le
+    même process réutilisent une session déjà authentifiée au lieu de se reconnecter.
+    Les sessions sont maintenues avec client_session_keep_alive.
+    """
+
+    def __init__(
+        self,
+        max_idle: int = Config.SF_POOL_MAX_IDLE,
+        idle_timeout: int = Config.SF_POOL_IDLE_TIMEOUT,
+    ):
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._idle: Dict[Tuple[str, str], List[Tuple[object, float]]] = {}
+        self._keys: Dict[int, Tuple[str, str]] = {}
+
+    def configure(self, max_idle: int, idle_timeout: int):
+        """Paramètres du pool (Config.SF_POOL_* par défaut, voir SnowflakeSessionResource)"""
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+
+    def acquire(self, database: str = Config.SF_DATABASE, schema: str = Config.SF_SCHEMA):
+        """Session inactive de la file (base, schéma), ou nouvelle connexion"""
+        key = (database.upper(), schema.upper())
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                conn, released_at = idle.pop()
+                if not conn.is_closed() and time.time() - released_at < self.idle_timeout:
+                    return conn
+                self._discard(conn)
+
+        conn = get_snowflake_connection(database = database, schema = schema)
+        with self._lock:
+            self._keys[id(conn)] = key
+        return conn
+
+    def release(self, conn):
+        """Rend une session au pool (fermée si le pool est plein)"""
+        with self._lock:
+            key = self._keys.get(id(conn))
+            idle = self._idle.setdefault(key, [])
+            if key is None or conn.is_closed() or len(idle) >= self.max_idle:
+                self._discard(conn)
+                return
+            idle.append((conn, time.time()))
+
+    def _discard(self, conn):
+        self._keys.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception as e:
+            logger.warning(f"⚠️  Fermeture de session Snowflake: {e}")
+
+    def close_all(self):
+        """Ferme toutes les sessions inactives"""
+        with self._lock:
+            for idle in self._idle.values():
+                for conn, _ in idle:
+                    self._discard(conn)
+            self._idle.clear()
+
+    @contextmanager
+    def session(self, database: str = Config.SF_DATABASE, schema: str = Config.SF_SCHEMA):
+        conn = self.acquire(database, schema)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+
+snowflake_session_pool = SnowflakeSessionPool()
+# Sessions inactives fermées à la sortie du process, hors Dagster
+# (dans un step, SnowflakeSessionResource les ferme en fin d'exécution)
+atexit.register(snowflake_session_pool.close_all)
+
+
 def create_file_format(cursor, logger):
     """
-    Créer le format de fichier CSV s'il n'existe pas déjà --- on pourrait aussi utiliser parquet à la place
+    Créer (ou mettre à jour) le format de fichier CSV --- on pourrait aussi utiliser parquet à la place
     Équivalent: CREATE OR REPLACE FILE FORMAT...
+    SKIP_HEADER s'applique à chaque fichier du stage: bcp queryout n'écrit pas
+    d'en-tête, une valeur à 1 perdrait la première ligne de chaque partition.
     """
     
     logger.info("🔧 Création du file format CSV...")
     
     sql = f"""
-    CREATE FILE FORMAT IF NOT EXISTS {Config.FILE_FORMAT_NAME}
+    CREATE OR REPLACE FILE FORMAT {Config.FILE_FORMAT_NAME}
         TYPE = CSV
         FIELD_DELIMITER = '|'
-        SKIP_HEADER = 1
+        SKIP_HEADER = {Config.CSV_SKIP_HEADER}
         FIELD_OPTIONALLY_ENCLOSED_BY = '"'
         NULL_IF = ('NULL', '')
         EMPTY_FIELD_AS_NULL = TRUE
@@ -56,6 +156,25 @@ def create_file_format(cursor, logger):
     logger.info(f"✅ File format {Config.FILE_FORMAT_NAME} créé")
 
 
+def create_parquet_file_format(cursor, logger):
+    """
+    Créer le format de fichier Parquet s'il n'existe pas déjà
+    USE_LOGICAL_TYPE: les TIMESTAMP / DECIMAL Parquet sont chargés avec leur type
+    """
+    
+    logger.info("🔧 Création du file format Parquet...")
+    
+    sql = f"""
+    CREATE FILE FORMAT IF NOT EXISTS {Config.PARQUET_FILE_FORMAT_NAME}
+        TYPE = PARQUET
+        USE_LOGICAL_TYPE = TRUE
+        BINARY_AS_TEXT = FALSE
+    """
+    
+    cursor.execute(sql)
+    logger.info(f"✅ File format {Config.PARQUET_FILE_FORMAT_NAME} créé")
+
+
 def create_stage(cursor, logger):
     """
     Créer le stage interne s'il n'existe pas déjà dans le schéma
@@ -83,6 +202,8 @@ def create_snowflake_table(
 ) -> None:
     """
     Créer une table Snowflake avec schéma personnalisable
+    Si le DDL est identique au dernier exécuté (cache des schémas) et que la
+    table existe, elle est seulement vidée (TRUNCATE) au lieu d'être recréée.
     
     Args:
         cursor: Snowflake cursor
@@ -110,35 +231,59 @@ def create_snowflake_table(
         snowflake_database = database,
         snowflake_schema = schema
     )
+    target = f"{database}.{schema}.{snowflake_table_name}"
+    if get_cached_ddl_digest(target) == ddl_digest(sql_ddl) and table_exists(cursor, snowflake_table_name):
+        cursor.execute(f"TRUNCATE TABLE {target}")
+        logger.info(f"✅ Schéma inchangé: table {snowflake_table_name} vidée sans DDL")
+        return
+    
     # Exécuter
     cursor.execute(sql_ddl)
+    set_cached_ddl_digest(target, sql_ddl)
     
     logger.info(f"✅ Table {mssql_table_name} créée avec succès")
     logger.info(f"   Localisation: {database}.{schema}.{mssql_table_name}")
 
 
 ### Créer format de fichier, stage et table dans snowflake==============
+@spanned("ddl")
 def setup_snowflake(
     snowflake_database: str,
     snowflake_schema: str, 
     mssql_table_name: str, 
     snowflake_table_name: str, 
-    logger
-):
+    logger,
+    load_mode: str = Config.LOAD_MODE,
+    run_id: Optional[str] = None,
+) -> str:
     """
     Setup des objets Snowflake
+    load_mode "swap": la table cible n'est pas recréée (voir prepare_swap_table)
+    run_id: nom de la table à échanger propre au run
+    Returns: table dans laquelle charger (la cible, ou la table à échanger)
     """
     
     logger.info("=" * 80)
     logger.info("🔧 Setup Snowflake")
     logger.info("=" * 80)
     
-    conn = get_snowflake_connection(database = snowflake_database, schema = snowflake_schema)
+    conn = snowflake_session_pool.acquire(database = snowflake_database, schema = snowflake_schema)
     cursor = conn.cursor()
     
     try:
         create_file_format(cursor, logger)
+        create_parquet_file_format(cursor, logger)
         create_stage(cursor, logger)
+        if load_mode == "swap":
+            return prepare_swap_table(
+                cursor = cursor,
+                database = snowflake_database,
+                schema = snowflake_schema,
+                mssql_table_name = mssql_table_name,
+                snowflake_table_name = snowflake_table_name,
+                logger = logger,
+                run_id = run_id,
+            )
         create_snowflake_table(
             cursor = cursor, 
             database = snowflake_database, #"NEEMBA",
@@ -147,43 +292,173 @@ def setup_snowflake(
             snowflake_table_name = snowflake_table_name, 
             logger = logger
         )
+        return snowflake_table_name
         
     finally:
         cursor.close()
-        conn.close()
+        snowflake_session_pool.release(conn)
 
 # Upload du fichier dans le stage de snowflake avec la commande PUT==============
 
-def upload_to_stage(cursor, logger):
+def _compress_file(source: str, target_dir: str, compression: str) -> Tuple[str, str]:
     """
-    Upload du fichier vers le stage
-    Équivalent: PUT file://... @STAGE AUTO_COMPRESS=TRUE
+    Compresse un fichier pour le PUT (exécuté dans un process du pool).
+    Le md5 de la source est inclus dans le nom produit: un fichier déjà
+    stagé sous ce nom a le même contenu et peut être ignoré.
+    Returns: Tuple (fichier produit, md5)
     """
+    source = Path(source)
+    digest = hashlib.md5()
+    tmp_path = Path(target_dir) / f"{source.name}.tmp"
+
+    if source.suffix == ".parquet" or compression == "none":
+        # Déjà compressé (Parquet) ou compression désactivée: simple copie
+        with open(source, "rb") as src, open(tmp_path, "wb") as dst:
+            for block in iter(lambda: src.read(8 * 1024 * 1024), b""):
+                digest.update(block)
+                dst.write(block)
+        suffix = ""
+    elif compression == "zstd":
+        compressor = zstandard.ZstdCompressor(level=3, threads=0)
+        with open(source, "rb") as src, open(tmp_path, "wb") as raw:
+            with compressor.stream_writer(raw) as dst:
+                for block in iter(lambda: src.read(8 * 1024 * 1024), b""):
+                    digest.update(block)
+                    dst.write(block)
+        suffix = ".zst"
+    else:
+        # mtime=0: même source -> même fichier gzip
+        with open(source, "rb") as src, open(tmp_path, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) as dst:
+                for block in iter(lambda: src.read(8 * 1024 * 1024), b""):
+                    digest.update(block)
+                    dst.write(block)
+        suffix = ".gz"
+
+    md5 = digest.hexdigest()
+    target = Path(target_dir) / f"{source.stem}.{md5[:16]}{source.suffix}{suffix}"
+    tmp_path.replace(target)
+    return str(target), md5
+
+
+def upload_files_to_stage(
+    cursor,
+    files: Union[str, Iterable[Path]],
+    logger,
+    stage_path: Optional[str] = None,
+    compression: str = Config.PUT_COMPRESSION,
+    parallel: int = Config.PUT_PARALLEL,
+    max_workers: Optional[int] = Config.COMPRESS_WORKERS,
+) -> List[str]:
+    """
+    Upload multi-fichiers vers le stage
+    - compression côté client dans un pool de process (gzip ou zstd) au lieu
+      du AUTO_COMPRESS mono-thread du connecteur
+    - un seul PUT ... PARALLEL=n pour tous les fichiers
+    - les fichiers dont le checksum est déjà présent dans le stage sont ignorés
+    
+    Args:
+        files: liste de fichiers ou motif glob (ex: "/tmp/run/mssql_export*.csv")
+        compression: "gzip", "zstd" (module zstandard requis) ou "none"
+        parallel: threads d'upload du PUT (1-99)
+    
+    Returns:
+        Noms des fichiers uploadés
+    """
+    stage_path = stage_path or Config.STAGE_NAME
+    
+    if isinstance(files, str):
+        files = [Path(f) for f in sorted(glob.glob(files))]
+    files = [Path(f) for f in files]
+    if not files:
+        logger.warning("⚠️ Aucun fichier à uploader")
+        return []
+    
+    if compression == "zstd" and zstandard is None:
+        logger.warning("⚠️ Module zstandard absent, compression gzip utilisée")
+        compression = "gzip"
+    
+    # Fichiers compressés à côté des sources, dans un dossier propre à cet appel:
+    # deux runs (ou deux tables) sur le même dossier ne partagent jamais ce dossier
+    staging_dir = Path(tempfile.mkdtemp(prefix="_put_", dir=files[0].parent))
+    
+    try:
+        logger.info(f"🗜️  Compression {compression} de {len(files)} fichier(s)...")
+        start_time = time.time()
+        with span("compress", bytes=sum(f.stat().st_size for f in files)):
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                compressed = list(executor.map(
+                    _compress_file,
+                    [str(f) for f in files],
+                    [str(staging_dir)] * len(files),
+                    [compression] * len(files),
+                ))
+        logger.info(f"✅ Compression terminée en {time.time() - start_time:.2f}s")
+        
+        # Checksum déjà dans le stage (même nom = même md5): on ne renvoie pas
+        cursor.execute(f"LIST @{stage_path}")
+        staged = {row[0].rsplit("/", 1)[-1] for row in cursor.fetchall()}
+        to_upload = []
+        for path, _ in compressed:
+            path = Path(path)
+            if path.name in staged:
+                logger.info(f"⏭️  {path.name} déjà dans le stage, ignoré")
+                path.unlink()
+            else:
+                to_upload.append(path.name)
+        
+        if not to_upload:
+            logger.info("✅ Tous les fichiers sont déjà dans le stage")
+            return []
+        
+        put_path = str(staging_dir / "*").replace("\\", "/")
+        sql_put = f"""
+        PUT file://{put_path} @{stage_path}
+        AUTO_COMPRESS=FALSE
+        PARALLEL={parallel}
+        OVERWRITE=FALSE
+        """
+        
+        logger.info(f"🔄 Upload de {len(to_upload)} fichier(s), PARALLEL={parallel}...")
+        start_time = time.time()
+        with span("put", bytes=sum((staging_dir / name).stat().st_size for name in to_upload)):
+            cursor.execute(sql_put)
+        logger.info(f"✅ Upload terminé en {time.time() - start_time:.2f}s")
+        
+        return to_upload
+    
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def upload_to_stage(cursor, logger, output_path: Optional[Path] = None, stage_path: Optional[str] = None):
+    """
+    Upload du fichier (ou des fichiers de partition) vers le stage
+    Équivalent: PUT file://... @STAGE, avec compression parallèle (upload_files_to_stage)
+    output_path / stage_path: fichier local et préfixe du stage du run
+    (voir get_run_output_path / get_stage_path), valeurs globales par défaut
+    """
+    output_path = output_path or Config.OUTPUT_PATH
+    stage_path = stage_path or Config.STAGE_NAME
     
     logger.info("=" * 80)
     logger.info("📤 Upload vers Snowflake Stage")
     logger.info("=" * 80)
         
     try:
-        # PUT command (utiliser forward slashes)
-        file_path = str(Config.OUTPUT_PATH).replace("\\", "/")
+        # Le joker couvre mssql_export.csv et mssql_export_partNNN.csv
+        pattern = str(output_path.with_name(f"{output_path.stem}*{output_path.suffix}"))
         
-        sql_put = f"""
-        PUT file://{file_path} @{Config.STAGE_NAME}
-        AUTO_COMPRESS=TRUE
-        OVERWRITE=TRUE
-        """
-        
-        logger.info(f"🔄 Upload de {Config.OUTPUT_PATH.name}...")
+        logger.info(f"🔄 Upload de {Path(pattern).name}...")
         start_time = time.time()
         
-        cursor.execute(sql_put)
+        upload_files_to_stage(cursor, pattern, logger, stage_path = stage_path)
         
         duration = time.time() - start_time
         logger.info(f"✅ Upload terminé en {duration:.2f}s")
         
         # Lister les fichiers dans le stage
-        cursor.execute(f"LIST @{Config.STAGE_NAME}")
+        cursor.execute(f"LIST @{stage_path}")
         files = cursor.fetchall()
         logger.info(f"📁 Fichiers dans le stage: {len(files)}")
         
@@ -195,58 +470,107 @@ def upload_to_stage(cursor, logger):
 
 # COPY INTO des données dans la table finale==============
 
-def copy_into_table(cursor, snowflake_table_name: str, logger):
+def build_copy_sql(
+    snowflake_table_name: str,
+    stage_path: Optional[str] = None,
+    export_format: str = "csv",
+    files: Optional[List[str]] = None,
+    on_error: str = "CONTINUE",
+) -> str:
+    """
+    Requête COPY INTO table FROM @stage
+    export_format: "csv" (ordre des colonnes) ou "parquet" (MATCH_BY_COLUMN_NAME)
+    files: noms des fichiers du stage à charger (groupe de fichiers), tout le préfixe par défaut
+    on_error: "CONTINUE" (lignes rejetées ignorées, chargement complet rejoué au
+    prochain run) ou "ABORT_STATEMENT" (deltas: une ligne rejetée serait perdue
+    une fois le watermark avancé)
+    """
+    stage_path = stage_path or Config.STAGE_NAME
+    
+    if export_format == "parquet":
+        format_options = f"""FILE_FORMAT = (FORMAT_NAME = {Config.PARQUET_FILE_FORMAT_NAME})
+        MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE"""
+    else:
+        format_options = f"FILE_FORMAT = (FORMAT_NAME = {Config.FILE_FORMAT_NAME})"
+    files_option = ""
+    if files:
+        files_option = "FILES = (" + ", ".join(f"'{name}'" for name in files) + ")"
+    
+    return f"""
+        COPY INTO {snowflake_table_name}
+        FROM @{stage_path}
+        {files_option}
+        {format_options}
+        ON_ERROR = '{on_error}'
+        PURGE = TRUE
+        """
+
+
+def summarize_copy_results(cursor, logger) -> Tuple[int, int]:
+    """
+    Lignes chargées et erreurs d'un COPY INTO, lues dans son résultat
+    (une ligne par fichier: file, status, rows_parsed, rows_loaded, ..., errors_seen)
+    Ce sont les compteurs du chargement: pas de COUNT(*) sur la table ensuite.
+    Returns: Tuple (rows_loaded, errors)
+    """
+    columns = [col[0].lower() for col in cursor.description]
+    total_rows = 0
+    total_errors = 0
+    
+    for row in cursor.fetchall():
+        values = dict(zip(columns, row))
+        if "rows_loaded" not in values:
+            # Aucun fichier à charger: "Copy executed with 0 files processed."
+            logger.info(f"   {values.get('status')}")
+            continue
+        
+        rows_loaded = values["rows_loaded"] or 0
+        errors = values.get("errors_seen") or 0
+        total_rows += rows_loaded
+        total_errors += errors
+        
+        logger.info(f"   ✓ {values['file']}: {rows_loaded:,} lignes" + (f", {errors:,} erreurs" if errors else ""))
+    return total_rows, total_errors
+
+
+@spanned("copy", rows=lambda result: result["rows_loaded"])
+def copy_into_table(
+    cursor,
+    snowflake_table_name: str,
+    logger,
+    stage_path: Optional[str] = None,
+    export_format: str = "csv",
+    on_error: str = "CONTINUE",
+):
     """
     Chargement final avec COPY INTO
     Équivalent: COPY INTO table FROM @STAGE...
+    stage_path: préfixe du stage à charger (et purger), tout le stage par défaut
+    export_format: "csv" (ordre des colonnes) ou "parquet" (MATCH_BY_COLUMN_NAME)
+    on_error: voir build_copy_sql
+    Version bloquante; voir AsyncCopyMonitor pour plusieurs COPY en parallèle
     """
-    
     logger.info("=" * 80)
     logger.info("📥 COPY INTO Snowflake")
     logger.info("=" * 80)
     
     try:
-        sql_truncate = f"Truncate table {snowflake_table_name}"
-        sql_copy = f"""
-        COPY INTO {snowflake_table_name}
-        FROM @{Config.STAGE_NAME}
-        FILE_FORMAT = (FORMAT_NAME = {Config.FILE_FORMAT_NAME})
-        --ON_ERROR = 'ABORT_STATEMENT'
-        ON_ERROR = 'CONTINUE' 
-        PURGE = TRUE
-        """
+        sql_copy = build_copy_sql(snowflake_table_name, stage_path, export_format, on_error=on_error)
         
         logger.info(f"🔄 Chargement dans {snowflake_table_name}...")
         start_time = time.time()
         
         cursor.execute(sql_copy)
-        results = cursor.fetchall()
         
         duration = time.time() - start_time
         
         # Analyser les résultats
-        total_rows = 0
-        total_errors = 0
-        
-        for row in results:
-            file_name = row[0]
-            rows_loaded = row[2]
-            errors = row[5]
-            
-            total_rows += rows_loaded
-            total_errors += errors
-            
-            logger.info(f"   ✓ {file_name}: {rows_loaded:,} lignes")
+        total_rows, total_errors = summarize_copy_results(cursor, logger)
         
         logger.info(f"✅ COPY INTO terminé en {duration:.2f}s")
         logger.info(f"📊✅ Nombre de lignes chargées : {total_rows:,}")
         logger.info(f"📊❌ Nombre d'erreurs : {total_errors:,}")
         
-        # Vérification finale
-        cursor.execute(f"SELECT COUNT(*) FROM {snowflake_table_name}")
-        final_count = cursor.fetchone()[0]
-        logger.info(f"📊 Total dans la table {snowflake_table_name}: {final_count:,}")
-        
         return {
             'rows_loaded': total_rows,
             'errors': total_errors,
@@ -259,31 +583,851 @@ def copy_into_table(cursor, snowflake_table_name: str, logger):
         #conn.close()
 
 
+# COPY INTO asynchrone: plusieurs chargements soumis puis suivis ensemble==============
+
+class AsyncCopyMonitor:
+    """
+    COPY INTO soumis sans attendre (cursor.execute_async), suivis par leur query id.
+    Le warehouse charge pendant que le process continue (export suivant, PUT...);
+    wait() interroge tous les COPY en cours ensemble (get_query_status) et
+    récupère les résultats de chacun avec get_results_from_sfqid.
+    Les requêtes asynchrones d'une même session tournent en parallèle côté
+    warehouse; la session doit rester ouverte jusqu'à la fin de wait().
+    """
+
+    def __init__(
+        self,
+        conn,
+        logger,
+        poll_interval: int = Config.COPY_POLL_INTERVAL,
+        progress_interval: int = Config.COPY_PROGRESS_INTERVAL,
+    ):
+        self.conn = conn
+        self.logger = logger
+        self.poll_interval = poll_interval
+        self.progress_interval = progress_interval
+        # query id -> {label, table, start, status, end}
+        self.queries: Dict[str, dict] = {}
+        # (label, erreur) des COPY en échec du dernier wait()
+        self.failures: List[Tuple[str, Exception]] = []
+
+    def submit(
+        self,
+        snowflake_table_name: str,
+        stage_path: Optional[str] = None,
+        export_format: str = "csv",
+        files: Optional[List[str]] = None,
+        label: Optional[str] = None,
+    ) -> str:
+        """
+        Soumet un COPY INTO (table entière du préfixe, ou groupe de fichiers) et rend la main.
+        label: nom du chargement dans les logs et dans le résultat de wait(), la table par défaut
+        Returns: query id Snowflake
+        """
+        label = label or snowflake_table_name
+        if any(query["label"] == label for query in self.queries.values()):
+            raise ValueError(f"❌ Chargement déjà soumis: {label}")
+
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute_async(build_copy_sql(snowflake_table_name, stage_path, export_format, files))
+            query_id = cursor.sfqid
+        finally:
+            cursor.close()
+
+        self.queries[query_id] = {
+            "label": label,
+            "table": snowflake_table_name,
+            "start": time.time(),
+            "status": None,
+        }
+        self.logger.info(f"🚀 COPY INTO {snowflake_table_name} soumis ({label}): {query_id}")
+        return query_id
+
+    def poll(self) -> Dict[str, str]:
+        """
+        Statut de chaque COPY soumis (QUEUED, RUNNING, SUCCESS, FAILED_WITH_ERROR...),
+        logué à chaque changement
+        Returns: dict label -> statut
+        """
+        statuses = {}
+        for query_id, query in self.queries.items():
+            status = self.conn.get_query_status(query_id)
+            if status != query["status"]:
+                elapsed = time.time() - query["start"]
+                self.logger.info(f"   ⏳ {query['label']}: {status.name} ({elapsed:.0f}s)")
+                query["status"] = status
+                if not self.conn.is_still_running(status):
+                    query["end"] = time.time()
+            statuses[query["label"]] = status.name
+        return statuses
+
+    def _running(self) -> List[dict]:
+        return [
+            query for query in self.queries.values()
+            if query["status"] is None or self.conn.is_still_running(query["status"])
+        ]
+
+    def _collect(self, query_id: str, query: dict) -> dict:
+        """Résultat d'un COPY terminé, même format que copy_into_table"""
+        self.conn.get_query_status_throw_if_error(query_id)
+        cursor = self.conn.cursor()
+        try:
+            cursor.get_results_from_sfqid(query_id)
+            total_rows, total_errors = summarize_copy_results(cursor, self.logger)
+        finally:
+            cursor.close()
+
+        duration = query.get("end", time.time()) - query["start"]
+        self.logger.info(
+            f"✅ COPY INTO {query['table']} ({query['label']}) terminé en {duration:.2f}s: "
+            f"{total_rows:,} lignes, {total_errors:,} erreurs"
+        )
+        return {
+            'rows_loaded': total_rows,
+            'errors': total_errors,
+            'duration': duration,
+            'query_id': query_id,
+        }
+
+    @spanned("copy", rows=lambda results: sum(result["rows_loaded"] for result in results.values()))
+    def wait(self, timeout: Optional[int] = None, raise_on_error: bool = True) -> Dict[str, dict]:
+        """
+        Attend la fin de tous les COPY soumis.
+        Un COPY en échec n'interrompt pas le suivi des autres: l'erreur est levée
+        une fois tous les chargements terminés.
+        timeout: secondes, sans limite par défaut (les COPY continuent alors côté Snowflake)
+        raise_on_error=False: pas d'erreur levée, les COPY en échec sont absents du
+        résultat et listés dans self.failures (swap des autres avant de lever)
+        Returns: dict label -> résultat (rows_loaded, errors, duration, query_id)
+        """
+        start = time.time()
+        last_report = start
+        while True:
+            self.poll()
+            running = self._running()
+            if not running:
+                break
+
+            now = time.time()
+            if timeout and now - start > timeout:
+                labels = ", ".join(query["label"] for query in running)
+                raise TimeoutError(f"COPY INTO toujours en cours après {timeout}s: {labels}")
+            if now - last_report >= self.progress_interval:
+                last_report = now
+                self.logger.info(
+                    f"⏳ COPY INTO: {len(self.queries) - len(running)}/{len(self.queries)} terminés, "
+                    f"en cours: {', '.join(query['label'] for query in running)}"
+                )
+            time.sleep(self.poll_interval)
+
+        results = {}
+        self.failures = []
+        for query_id, query in self.queries.items():
+            try:
+                results[query["label"]] = self._collect(query_id, query)
+            except Exception as e:
+                self.logger.error(f"❌ COPY INTO {query['table']} ({query['label']}) en échec: {e}")
+                self.failures.append((query["label"], e))
+        self.queries = {}
+
+        if self.failures and raise_on_error:
+            self.raise_failures()
+        return results
+
+    def raise_failures(self):
+        """Lève l'erreur des COPY en échec du dernier wait() (rien s'il n'y en a pas)"""
+        if self.failures:
+            labels = ", ".join(label for label, _ in self.failures)
+            raise RuntimeError(f"❌ COPY INTO en échec: {labels}") from self.failures[0][1]
+
+
+# Chargement en flux: PUT + COPY des chunks pendant que l'export continue==============
+
+def upload_file_to_stage(cursor, file_path: Path, logger, stage_path: Optional[str] = None) -> str:
+    """
+    Upload d'un seul fichier vers le stage
+    Équivalent: PUT file://... @STAGE AUTO_COMPRESS=TRUE
+    Returns: nom du fichier dans le stage (compressé: .gz ajouté)
+    """
+    stage_path = stage_path or Config.STAGE_NAME
+    
+    put_path = str(file_path).replace("\\", "/")
+    sql_put = f"""
+    PUT file://{put_path} @{stage_path}
+    AUTO_COMPRESS=TRUE
+    OVERWRITE=TRUE
+    """
+    
+    start_time = time.time()
+    with span("put", bytes=file_path.stat().st_size):
+        cursor.execute(sql_put)
+    # Résultat du PUT: source, target, source_size, target_size, ...
+    staged_name = cursor.fetchone()[1]
+    logger.info(f"✅ {file_path.name} uploadé en {time.time() - start_time:.2f}s")
+    return staged_name
+
+
+class StagedChunkLoader:
+    """
+    Chargeur en arrière-plan: un thread PUT chaque chunk fermé dans le stage,
+    puis soumet un COPY INTO asynchrone (AsyncCopyMonitor) des fichiers uploadés
+    tous les copy_every chunks, et une dernière fois à la fermeture. Chaque COPY
+    ne charge que ses fichiers (FILES): le thread continue les PUT pendant que
+    le warehouse charge, close() attend la fin de tous les COPY.
+    max_pending: chunks fermés en attente de PUT; au-delà, submit() bloque
+    l'export (disque local borné quand PUT/COPY est plus lent que bcp).
+    """
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        conn,
+        snowflake_table_name: str,
+        logger,
+        copy_every: int = Config.STREAM_COPY_EVERY,
+        delete_after_upload: bool = True,
+        stage_path: Optional[str] = None,
+        max_pending: int = Config.STREAM_MAX_PENDING_CHUNKS,
+    ):
+        self.conn = conn
+        self.snowflake_table_name = snowflake_table_name
+        self.logger = logger
+        self.stage_path = stage_path
+        self.copy_every = copy_every
+        self.delete_after_upload = delete_after_upload
+
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.monitor = AsyncCopyMonitor(conn, logger)
+        self.error = None
+        self.nb_uploaded = 0
+        self._staged: List[str] = []
+        self._nb_copies = 0
+        self._aborted = False
+        # Le thread garde l'enregistreur de spans actif de l'asset (PUT en flux)
+        self._thread = threading.Thread(target=contextvars.copy_context().run, args=(self._run,), daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def submit(self, file_path: Path):
+        """Callback on_chunk: met le fichier fermé en file d'attente d'upload (bloque si la file est pleine)."""
+        while True:
+            if self.error is not None:
+                # Inutile de continuer l'export si l'upload est déjà en échec
+                raise RuntimeError(f"❌ Upload en échec: {self.error}") from self.error
+            try:
+                self.queue.put(file_path, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def _copy(self):
+        self._nb_copies += 1
+        self.monitor.submit(
+            self.snowflake_table_name,
+            stage_path=self.stage_path,
+            files=self._staged,
+            label=f"{self.snowflake_table_name} #{self._nb_copies}",
+        )
+        self._staged = []
+
+    def _run(self):
+        cursor = self.conn.cursor()
+        try:
+            while True:
+                item = self.queue.get()
+                if item is self._STOP or self._aborted:
+                    break
+                self._staged.append(upload_file_to_stage(cursor, item, self.logger, stage_path=self.stage_path))
+                self.nb_uploaded += 1
+                if self.delete_after_upload:
+                    item.unlink(missing_ok=True)
+                if len(self._staged) >= self.copy_every:
+                    self._copy()
+            if self._staged and not self._aborted:
+                self._copy()
+        except Exception as e:
+            self.logger.error(f"❌ Erreur upload/COPY en flux: {e}")
+            self.error = e
+        finally:
+            cursor.close()
+
+    def close(self, abort: bool = False):
+        """
+        Attend la fin des uploads et de tous les COPY soumis.
+        abort=True: l'export a échoué, on arrête sans dernier COPY; les COPY déjà
+        soumis sont attendus sans lever d'erreur (table de chargement supprimée ensuite).
+        Returns: dict (rows_loaded, errors, duration, nb_files)
+        """
+        self._aborted = abort
+        while self._thread.is_alive():
+            try:
+                self.queue.put(self._STOP, timeout=1)
+                break
+            except queue.Full:
+                continue
+        self._thread.join()
+
+        results = self.monitor.wait(raise_on_error=not abort and self.error is None)
+        if self.error is not None and not abort:
+            raise self.error
+
+        return {
+            'rows_loaded': sum(result['rows_loaded'] for result in results.values()),
+            'errors': sum(result['errors'] for result in results.values()),
+            'duration': sum(result['duration'] for result in results.values()),
+            'nb_files': self.nb_uploaded,
+        }
+
+
+# Chargement incrémental: watermark + table de staging + MERGE==============
+
+def table_exists(cursor, snowflake_table_name: str) -> bool:
+    """Vérifie l'existence d'une table dans le schéma courant"""
+    cursor.execute(
+        """
+        SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = CURRENT_SCHEMA() AND TABLE_NAME = %s
+        """,
+        (snowflake_table_name.upper(),),
+    )
+    return cursor.fetchone()[0] > 0
+
+
+def get_snowflake_row_count(cursor, snowflake_table_name: str, exact: bool = False) -> Optional[int]:
+    """
+    Nombre de lignes d'une table du schéma courant.
+    - par défaut: ROW_COUNT de INFORMATION_SCHEMA.TABLES (métadonnées, sans warehouse)
+    - exact=True: SELECT COUNT(*) (vues, tables externes)
+    Returns: None si la table n'existe pas (ou n'a pas de ROW_COUNT, ex: une vue)
+    """
+    if exact:
+        cursor.execute(f"SELECT COUNT(*) FROM {snowflake_table_name}")
+        return cursor.fetchone()[0]
+    cursor.execute(
+        """
+        SELECT ROW_COUNT FROM INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = CURRENT_SCHEMA() AND TABLE_NAME = %s
+        """,
+        (snowflake_table_name.upper(),),
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def get_table_columns(cursor, snowflake_table_name: str) -> List[str]:
+    """Colonnes d'une table du schéma courant, dans l'ordre"""
+    cursor.execute(
+        """
+        SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = CURRENT_SCHEMA() AND TABLE_NAME = %s
+        ORDER BY ORDINAL_POSITION
+        """,
+        (snowflake_table_name.upper(),),
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def create_watermark_table(cursor, logger):
+    """
+    Créer la table des watermarks si elle n'existe pas
+    Une ligne par (table, colonne): dernière valeur chargée
+    """
+    
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS {Config.WATERMARK_TABLE} (
+        TABLE_NAME VARCHAR,
+        WATERMARK_COLUMN VARCHAR,
+        WATERMARK_VALUE VARCHAR,
+        WATERMARK_TYPE VARCHAR,
+        UPDATED_AT TIMESTAMP_NTZ
+    )
+    """)
+    logger.info(f"✅ Table {Config.WATERMARK_TABLE} prête")
+
+
+def get_watermark(cursor, snowflake_table_name: str, watermark_column: str) -> Optional[Tuple[str, str]]:
+    """
+    Dernier watermark persisté
+    Returns: Tuple (valeur, type) ou None si aucun chargement précédent
+    """
+    cursor.execute(
+        f"""
+        SELECT WATERMARK_VALUE, WATERMARK_TYPE FROM {Config.WATERMARK_TABLE}
+        WHERE TABLE_NAME = %s AND WATERMARK_COLUMN = %s
+        """,
+        (snowflake_table_name.upper(), watermark_column.upper()),
+    )
+    row = cursor.fetchone()
+    return (row[0], row[1]) if row and row[0] is not None else None
+
+
+def set_watermark(
+    cursor,
+    snowflake_table_name: str,
+    watermark_column: str,
+    value: str,
+    value_type: str,
+    logger,
+):
+    """Enregistre le nouveau watermark (MERGE sur table + colonne)"""
+    cursor.execute(
+        f"""
+        MERGE INTO {Config.WATERMARK_TABLE} w
+        USING (SELECT %s AS TABLE_NAME, %s AS WATERMARK_COLUMN, %s AS WATERMARK_VALUE, %s AS WATERMARK_TYPE) s
+        ON w.TABLE_NAME = s.TABLE_NAME AND w.WATERMARK_COLUMN = s.WATERMARK_COLUMN
+        WHEN MATCHED THEN UPDATE SET
+            w.WATERMARK_VALUE = s.WATERMARK_VALUE,
+            w.WATERMARK_TYPE = s.WATERMARK_TYPE,
+            w.UPDATED_AT = CURRENT_TIMESTAMP()::TIMESTAMP_NTZ
+        WHEN NOT MATCHED THEN INSERT (TABLE_NAME, WATERMARK_COLUMN, WATERMARK_VALUE, WATERMARK_TYPE, UPDATED_AT)
+            VALUES (s.TABLE_NAME, s.WATERMARK_COLUMN, s.WATERMARK_VALUE, s.WATERMARK_TYPE, CURRENT_TIMESTAMP()::TIMESTAMP_NTZ)
+        """,
+        (snowflake_table_name.upper(), watermark_column.upper(), value, value_type),
+    )
+    logger.info(f"📌 Watermark {snowflake_table_name}.{watermark_column} = {value}")
+
+
+def get_max_value(cursor, snowflake_table_name: str, column: str):
+    """MAX(column) d'une table Snowflake (valeur Python, None si table vide)"""
+    cursor.execute(f"SELECT MAX({column}) FROM {snowflake_table_name}")
+    return cursor.fetchone()[0]
+
+
+@spanned("ddl")
+def create_staging_table(cursor, snowflake_table_name: str, logger, suffix: str = "") -> str:
+    """
+    Créer une table de staging transitoire vide avec la structure de la cible
+    suffix: distingue les stagings de runs simultanés sur la même cible (ex: partitions)
+    Returns: nom de la table de staging
+    """
+    staging_table = f"{snowflake_table_name}__STG{suffix}"
+    cursor.execute(f"CREATE OR REPLACE TRANSIENT TABLE {staging_table} LIKE {snowflake_table_name}")
+    logger.info(f"🔧 Table de staging {staging_table} créée")
+    return staging_table
+
+
+@spanned("merge", rows=lambda result: sum(result.values()))
+def merge_into_table(
+    cursor,
+    snowflake_table_name: str,
+    staging_table: str,
+    merge_keys: Optional[List[str]],
+    order_column: str,
+    logger,
+) -> dict:
+    """
+    Applique la table de staging sur la cible
+    - merge_keys fournis: MERGE (mise à jour des lignes existantes, insertion des nouvelles),
+      en ne gardant que la version la plus récente (order_column) de chaque clé
+    - sans clé (id croissant, lignes jamais modifiées): simple INSERT
+    Returns: dict (rows_inserted, rows_updated)
+    """
+    
+    logger.info(f"🔀 Fusion de {staging_table} dans {snowflake_table_name}...")
+    start_time = time.time()
+    
+    if not merge_keys:
+        cursor.execute(f"INSERT INTO {snowflake_table_name} SELECT * FROM {staging_table}")
+        rows_inserted = cursor.fetchone()[0]
+        logger.info(f"✅ INSERT terminé en {time.time() - start_time:.2f}s: {rows_inserted:,} lignes")
+        return {'rows_inserted': rows_inserted, 'rows_updated': 0}
+    
+    columns = get_table_columns(cursor, snowflake_table_name)
+    keys = [key.upper() for key in merge_keys]
+    on_clause = " AND ".join(f"t.{key} = s.{key}" for key in keys)
+    update_clause = ", ".join(f"t.{col} = s.{col}" for col in columns if col not in keys)
+    insert_columns = ", ".join(columns)
+    insert_values = ", ".join(f"s.{col}" for col in columns)
+    # Table composée uniquement de clés: rien à mettre à jour
+    when_matched = f"WHEN MATCHED THEN UPDATE SET {update_clause}" if update_clause else ""
+    
+    sql_merge = f"""
+    MERGE INTO {snowflake_table_name} t
+    USING (
+        SELECT * FROM {staging_table}
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY {", ".join(keys)} ORDER BY {order_column} DESC) = 1
+    ) s
+    ON {on_clause}
+    {when_matched}
+    WHEN NOT MATCHED THEN INSERT ({insert_columns}) VALUES ({insert_values})
+    """
+    
+    cursor.execute(sql_merge)
+    row = cursor.fetchone()
+    rows_inserted = row[0]
+    rows_updated = row[1] if len(row) > 1 else 0
+    
+    logger.info(f"✅ MERGE terminé en {time.time() - start_time:.2f}s")
+    logger.info(f"   Lignes insérées: {rows_inserted:,}")
+    logger.info(f"   Lignes mises à jour: {rows_updated:,}")
+    
+    return {'rows_inserted': rows_inserted, 'rows_updated': rows_updated}
+
+
+# Chargement par tranche de dates: DELETE + INSERT de la seule tranche==============
+
+@spanned("ddl")
+def ensure_snowflake_table(
+    cursor,
+    database: str,
+    schema: str,
+    mssql_table_name: str,
+    snowflake_table_name: str,
+    logger,
+) -> None:
+    """
+    Crée la table cible (DDL généré) si elle n'existe pas encore, sans jamais la vider.
+    CREATE TABLE IF NOT EXISTS: deux runs de partitions qui créent la cible en même
+    temps ne se remplacent pas l'une l'autre (la seconde création est sans effet).
+    Table existante dont le DDL a changé (ou inconnue du cache, ex: ancienne cible d'un
+    chargement complet): colonnes alignées par ALTER sur la cible; un écart non
+    rattrapable par ALTER lève une erreur (supprimer la cible puis tout recharger).
+    """
+    sql_ddl = generate_snowflake_ddl(
+        mssql_table_name = mssql_table_name,
+        snowflake_table_name = snowflake_table_name,
+        snowflake_database = database,
+        snowflake_schema = schema,
+        if_not_exists = True,
+    )
+    target = f"{database}.{schema}.{snowflake_table_name}"
+    
+    if not table_exists(cursor, snowflake_table_name):
+        cursor.execute(sql_ddl)
+        set_cached_ddl_digest(target, sql_ddl)
+        logger.info(f"✅ Table {snowflake_table_name} créée (si absente)")
+        return
+    if get_cached_ddl_digest(target) == ddl_digest(sql_ddl):
+        return
+    
+    desired = [
+        (normalize_column_name(col_name).upper(), canonical_snowflake_type(col_type))
+        for col_name, col_type in extract_mssql_table_schema(mssql_table_name)
+    ]
+    alters = plan_column_changes(snowflake_table_name, get_table_definition(cursor, snowflake_table_name), desired)
+    if alters is None:
+        raise RuntimeError(
+            f"❌ {snowflake_table_name}: colonnes incompatibles avec {mssql_table_name}, "
+            f"supprimer la table puis recharger toutes les tranches (backfill)"
+        )
+    for alter in alters:
+        logger.info(f"🔧 {alter}")
+        cursor.execute(alter)
+    set_cached_ddl_digest(target, sql_ddl)
+    logger.warning(
+        f"⚠️  Table {snowflake_table_name} existante conservée: les tranches non rechargées "
+        f"gardent le contenu précédent (backfill pour tout recharger)"
+    )
+
+
+@spanned("merge", rows=lambda result: sum(result.values()))
+def replace_table_slice(
+    cursor,
+    snowflake_table_name: str,
+    staging_table: str,
+    date_column: str,
+    start: str,
+    end: str,
+    logger,
+    outside: bool = False,
+) -> dict:
+    """
+    Remplace la tranche [start, end[ de date_column dans la cible par le contenu
+    de la table de staging: DELETE + INSERT dans une seule transaction, les
+    lecteurs voient l'ancienne ou la nouvelle tranche, jamais une tranche vide.
+    start / end: 'YYYY-MM-DD HH:MM:SS'
+    outside=True: remplace au contraire les lignes hors de [start, end[ (date NULL comprise)
+    Returns: dict (rows_deleted, rows_inserted)
+    """
+    if outside:
+        logger.info(f"🔀 Remplacement des lignes hors de [{start}, {end}[ de {snowflake_table_name}...")
+        condition = (
+            f"{date_column} IS NULL OR {date_column} < %s::TIMESTAMP_NTZ "
+            f"OR {date_column} >= %s::TIMESTAMP_NTZ"
+        )
+    else:
+        logger.info(f"🔀 Remplacement de la tranche [{start}, {end}[ de {snowflake_table_name}...")
+        condition = f"{date_column} >= %s::TIMESTAMP_NTZ AND {date_column} < %s::TIMESTAMP_NTZ"
+    start_time = time.time()
+    
+    try:
+        cursor.execute("BEGIN")
+        cursor.execute(f"DELETE FROM {snowflake_table_name} WHERE {condition}", (start, end))
+        rows_deleted = cursor.fetchone()[0]
+        cursor.execute(f"INSERT INTO {snowflake_table_name} SELECT * FROM {staging_table}")
+        rows_inserted = cursor.fetchone()[0]
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+    
+    logger.info(f"✅ Tranche remplacée en {time.time() - start_time:.2f}s")
+    logger.info(f"   Lignes supprimées: {rows_deleted:,}")
+    logger.info(f"   Lignes insérées: {rows_inserted:,}")
+    
+    return {'rows_deleted': rows_deleted, 'rows_inserted': rows_inserted}
+
+
+# Chargement Change Tracking: delta (I, U, D) + MERGE avec suppressions==============
+
+def create_changes_staging_table(cursor, snowflake_table_name: str, logger, suffix: str = "") -> str:
+    """
+    Table de staging du delta Change Tracking: structure de la cible
+    suivie de SYS_CHANGE_OPERATION (ordre des colonnes du fichier bcp)
+    suffix: staging propre au run (voir create_staging_table)
+    Returns: nom de la table de staging
+    """
+    staging_table = create_staging_table(cursor, snowflake_table_name, logger, suffix = suffix)
+    cursor.execute(f"ALTER TABLE {staging_table} ADD COLUMN SYS_CHANGE_OPERATION VARCHAR(1)")
+    return staging_table
+
+
+@spanned("merge", rows=lambda result: sum(result.values()))
+def merge_changes_into_table(
+    cursor,
+    snowflake_table_name: str,
+    staging_table: str,
+    merge_keys: List[str],
+    logger,
+) -> dict:
+    """
+    Applique le delta Change Tracking en un seul MERGE
+    - D: suppression de la ligne cible
+    - I / U: mise à jour si la clé existe, insertion sinon
+    Returns: dict (rows_inserted, rows_updated, rows_deleted)
+    """
+    
+    logger.info(f"🔀 Application des changements de {staging_table} sur {snowflake_table_name}...")
+    start_time = time.time()
+    
+    columns = get_table_columns(cursor, snowflake_table_name)
+    keys = [key.upper() for key in merge_keys]
+    on_clause = " AND ".join(f"t.{key} = s.{key}" for key in keys)
+    update_clause = ", ".join(f"t.{col} = s.{col}" for col in columns if col not in keys)
+    insert_columns = ", ".join(columns)
+    insert_values = ", ".join(f"s.{col}" for col in columns)
+    # Table composée uniquement de clés: rien à mettre à jour
+    when_matched = (
+        f"WHEN MATCHED AND s.SYS_CHANGE_OPERATION <> 'D' THEN UPDATE SET {update_clause}"
+        if update_clause else ""
+    )
+    
+    sql_merge = f"""
+    MERGE INTO {snowflake_table_name} t
+    USING {staging_table} s
+    ON {on_clause}
+    WHEN MATCHED AND s.SYS_CHANGE_OPERATION = 'D' THEN DELETE
+    {when_matched}
+    WHEN NOT MATCHED AND s.SYS_CHANGE_OPERATION <> 'D' THEN INSERT ({insert_columns}) VALUES ({insert_values})
+    """
+    
+    cursor.execute(sql_merge)
+    row = dict(zip([col[0].lower() for col in cursor.description], cursor.fetchone()))
+    result = {
+        'rows_inserted': row.get('number of rows inserted', 0),
+        'rows_updated': row.get('number of rows updated', 0),
+        'rows_deleted': row.get('number of rows deleted', 0),
+    }
+    
+    logger.info(f"✅ MERGE terminé en {time.time() - start_time:.2f}s")
+    logger.info(f"   Lignes insérées: {result['rows_inserted']:,}")
+    logger.info(f"   Lignes mises à jour: {result['rows_updated']:,}")
+    logger.info(f"   Lignes supprimées: {result['rows_deleted']:,}")
+    
+    return result
+
+
+# Chargement par SWAP: la cible reste lisible pendant le rechargement==============
+
+def canonical_snowflake_type(snowflake_type: str) -> str:
+    """Type Snowflake tel que renvoyé par DESC TABLE (précisions par défaut explicites)"""
+    sf_type = snowflake_type.upper().replace(" NULL", "").strip()
+    defaults = {
+        'TIMESTAMP_NTZ': 'TIMESTAMP_NTZ(9)',
+        'TIMESTAMP_TZ': 'TIMESTAMP_TZ(9)',
+        'TIME': 'TIME(9)',
+        'BINARY': 'BINARY(8388608)',
+        'VARCHAR': 'VARCHAR(16777216)',
+    }
+    return defaults.get(sf_type, sf_type)
+
+
+def get_table_definition(cursor, snowflake_table_name: str) -> List[Tuple[str, str]]:
+    """Colonnes (nom, type) d'une table Snowflake, dans l'ordre"""
+    cursor.execute(f"DESC TABLE {snowflake_table_name}")
+    return [(row[0], row[1]) for row in cursor.fetchall()]
+
+
+def plan_column_changes(
+    snowflake_table_name: str,
+    existing: List[Tuple[str, str]],
+    desired: List[Tuple[str, str]],
+) -> Optional[List[str]]:
+    """
+    ALTER TABLE nécessaires pour passer de existing à desired
+    - colonnes ajoutées en fin de table: ADD COLUMN
+    - type modifié: ALTER COLUMN ... SET DATA TYPE
+    Le COPY CSV charge par position: une colonne supprimée, renommée ou insérée
+    au milieu ne peut pas se rattraper par ALTER.
+    Returns: liste d'ordres ALTER (vide si identique), None si non applicable
+    """
+    if len(desired) < len(existing):
+        return None
+    
+    alters = []
+    for (existing_name, existing_type), (name, sf_type) in zip(existing, desired):
+        if existing_name != name:
+            return None
+        if existing_type != sf_type:
+            alters.append(f"ALTER TABLE {snowflake_table_name} ALTER COLUMN {name} SET DATA TYPE {sf_type}")
+    
+    for name, sf_type in desired[len(existing):]:
+        alters.append(f"ALTER TABLE {snowflake_table_name} ADD COLUMN {name} {sf_type}")
+    
+    return alters
+
+
+def prepare_swap_table(
+    cursor,
+    database: str,
+    schema: str,
+    mssql_table_name: str,
+    snowflake_table_name: str,
+    logger,
+    run_id: Optional[str] = None,
+) -> str:
+    """
+    Prépare le chargement par SWAP
+    - cible absente: création directe (rien à protéger), on charge dans la cible
+    - même colonnes (ou écart rattrapable par ALTER ADD / ALTER COLUMN): table de
+      chargement LIKE la cible (clustering et grants conservés), les ALTER sont
+      appliqués à cette copie seulement: la cible n'est modifiée que par le SWAP
+    - sinon: table de chargement créée avec le DDL généré, le SWAP applique le nouveau schéma
+    La table de chargement {cible}__SWAP_<run_id> est propre au run: un job manuel
+    en même temps que le job de nuit (ou une relance) ne remplace pas, n'échange
+    pas et ne supprime pas la table de chargement de l'autre run.
+    Returns: table dans laquelle charger
+    """
+    
+    if not table_exists(cursor, snowflake_table_name):
+        create_snowflake_table(cursor, database, schema, mssql_table_name, snowflake_table_name, logger)
+        return snowflake_table_name
+    
+    swap_table = f"{snowflake_table_name}__SWAP{get_run_table_suffix(run_id)}"
+    desired = [
+        (normalize_column_name(col_name).upper(), canonical_snowflake_type(col_type))
+        for col_name, col_type in extract_mssql_table_schema(mssql_table_name)
+    ]
+    existing = get_table_definition(cursor, snowflake_table_name)
+    alters = plan_column_changes(swap_table, existing, desired)
+    
+    if alters is not None:
+        cursor.execute(f"CREATE OR REPLACE TABLE {swap_table} LIKE {snowflake_table_name} COPY GRANTS")
+        try:
+            for alter in alters:
+                logger.info(f"🔧 {alter}")
+                cursor.execute(alter)
+        except snowflake.connector.errors.ProgrammingError as e:
+            # ex: réduction de longueur ou changement de famille de type
+            logger.warning(f"⚠️  ALTER impossible ({e}): la table sera reconstruite par SWAP")
+            alters = None
+    
+    if alters is None:
+        cursor.execute(generate_snowflake_ddl(
+            mssql_table_name = mssql_table_name,
+            snowflake_table_name = swap_table,
+            snowflake_database = database,
+            snowflake_schema = schema,
+        ))
+    
+    logger.info(f"🔧 Table de chargement {swap_table} créée")
+    return swap_table
+
+
+@spanned("ddl")
+def swap_table(cursor, snowflake_table_name: str, swap_table: str, logger):
+    """Échange atomique de la cible avec la table chargée, puis suppression de l'ancienne version"""
+    cursor.execute(f"ALTER TABLE {snowflake_table_name} SWAP WITH {swap_table}")
+    cursor.execute(f"DROP TABLE IF EXISTS {swap_table}")
+    logger.info(f"🔁 {swap_table} échangée avec {snowflake_table_name}")
+
+
+def drop_load_table(cursor, snowflake_table_name: str, load_table: str, logger):
+    """
+    Supprime la table de chargement d'un SWAP en échec (rien si on chargeait la cible).
+    Appelée pendant la gestion d'une erreur: un échec du DROP n'est que journalisé.
+    """
+    if load_table == snowflake_table_name:
+        return
+    try:
+        cursor.execute(f"DROP TABLE IF EXISTS {load_table}")
+        logger.info(f"🗑️  Table de chargement {load_table} supprimée")
+    except Exception as e:
+        logger.warning(f"⚠️  Table de chargement {load_table} non supprimée: {e}")
+
+
+def remove_stage_files(cursor, stage_path: str, logger):
+    """
+    Supprime ce qui reste sous le préfixe du run (fichiers rejetés par COPY ON_ERROR=CONTINUE)
+    Équivalent: REMOVE @STAGE/...
+    """
+    cursor.execute(f"REMOVE @{stage_path}")
+    removed = cursor.fetchall()
+    if removed:
+        logger.info(f"🗑️  {len(removed)} fichier(s) restant(s) supprimé(s) de @{stage_path}")
+
+
 ### Créer format de fichier, stage et table dans snowflake==============
 def upload_to_snowflake(
     snowflake_database: str,
     snowflake_schema: str, 
     snowflake_table_name: str, 
-    logger
+    logger,
+    output_path: Optional[Path] = None,
+    stage_path: Optional[str] = None,
+    export_format: str = "csv",
+    load_table: Optional[str] = None,
 ):
     """
     Upload + copy into
+    load_table: table de chargement renvoyée par setup_snowflake; si elle diffère
+    de la cible, elle est échangée avec la cible (SWAP) après le COPY
     """
+    load_table = load_table or snowflake_table_name
     
     logger.info("=" * 80)
     logger.info("🔧 Upload + copy into Snowflake")
     logger.info("=" * 80)
     
-    conn = get_snowflake_connection(database = snowflake_database, schema = snowflake_schema)
+    conn = snowflake_session_pool.acquire(database = snowflake_database, schema = snowflake_schema)
     cursor = conn.cursor()
     
     try:
-        upload_to_stage(cursor, logger)
-        result = copy_into_table(cursor = cursor, snowflake_table_name = snowflake_table_name, logger = logger)
+        try:
+            upload_to_stage(cursor, logger, output_path = output_path, stage_path = stage_path)
+            result = copy_into_table(
+                cursor = cursor,
+                snowflake_table_name = load_table,
+                logger = logger,
+                stage_path = stage_path,
+                export_format = export_format,
+            )
+            if load_table != snowflake_table_name:
+                swap_table(cursor, snowflake_table_name, load_table, logger)
+        except Exception:
+            # Pas de __SWAP orphelin: la cible n'a pas été touchée
+            drop_load_table(cursor, snowflake_table_name, load_table, logger)
+            raise
+        if stage_path:
+            remove_stage_files(cursor, stage_path, logger)
         return result
     finally:
         cursor.close()
-        conn.close()
+        snowflake_session_pool.release(conn)
 
 
 if __name__ == "__main__":
@@ -267,11 +267,6 @@ def copy_into_table(table_name: str):
         logger.info(f"✅📊 Nombre de lignes chargées : {total_rows:,}")
         logger.info(f"📊❌ Nombre d'erreurs : {total_errors:,}")
         
-        # Vérification finale
-        cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-        final_count = cursor.fetchone()[0]
-        logger.info(f"📊 Total dans la table {table_name}: {final_count:,}")
-        
         return {
             'rows_loaded': total_rows,
             'errors': total_errors,
@@ -0,0 +1,236 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from mssql_data_nmbai.defs.config import EXPORT_FORMATS, Config
+
+
+##### REGISTRE DES TABLES
+# Une entrée par table: les assets BCP + COPY INTO, les jobs et schedules
+# (assets.py, definitions.py) et les ressources dlt (dlt_mssql_source.py)
+# sont générés à partir de cette liste.
+
+LOAD_STRATEGIES = ("full", "incremental", "change_tracking", "streaming")
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    """
+    Description d'une table à charger de SQL Server vers Snowflake
+    - asset_name: nom de l'asset Dagster (et de la ressource dlt)
+    - source / target: table ou vue SQL Server, table Snowflake
+    - loader: "bcp" (asset BCP + COPY INTO) ou "dlt" (ressource dlt seulement)
+    - load_strategy: "full", "incremental" (watermark_column, merge_keys),
+      "change_tracking" (clé primaire) ou "streaming" (export en chunks + COPY en flux)
+    - export_format: "csv" ou "parquet" (EXPORT_FORMATS), Config.EXPORT_FORMAT par défaut
+    - partition_column / num_partitions: export bcp partitionné en parallèle, et
+      lectures dlt parallèles par partition (make_dlt_source, tranches "range":
+      colonne numérique indexée)
+    - resume_key: export complet par tranches de clé, repris après échec
+    - time_partition_column: colonne date des partitions mensuelles Dagster; chaque
+      partition ne recharge que sa tranche (extract_mssql_data_slice), les lignes hors
+      partitions sont rechargées par out_of_range_rows_job. Existence et type de la
+      colonne vérifiés à chaque tranche (check_date_column)
+    - decimal_hints: {colonne: (précision, échelle)} pour la ressource dlt
+    - job_name: job de lancement manuel de la table
+    - schedule: cron d'un schedule propre à la table, en plus du job de nuit
+    - expected_duration: durée attendue en secondes, priorité dans le job de nuit
+      (les plus longs démarrent d'abord, voir scheduling.py)
+    """
+
+    asset_name: str
+    source: str
+    target: str
+    job_name: str
+    description: Optional[str] = None
+    loader: str = "bcp"
+    load_strategy: str = "full"
+    snowflake_schema: str = Config.SF_SCHEMA
+    export_format: Optional[str] = None
+    watermark_column: Optional[str] = None
+    merge_keys: Tuple[str, ...] = ()
+    partition_column: Optional[str] = None
+    num_partitions: int = Config.BCP_PARTITIONS
+    resume_key: Optional[str] = None
+    time_partition_column: Optional[str] = None
+    decimal_hints: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+    schedule: Optional[str] = None
+    expected_duration: int = Config.DEFAULT_ASSET_DURATION
+    group_name: str = "data_for_nmbai"
+
+    def __post_init__(self):
+        if self.load_strategy not in LOAD_STRATEGIES:
+            raise ValueError(f"❌ {self.asset_name}: stratégie de chargement inconnue {self.load_strategy}")
+        if self.export_format and self.export_format not in EXPORT_FORMATS:
+            raise ValueError(f"❌ {self.asset_name}: format d'export inconnu {self.export_format}")
+        if self.load_strategy == "incremental" and not self.watermark_column:
+            raise ValueError(f"❌ {self.asset_name}: le chargement incrémental exige watermark_column")
+        if self.time_partition_column and self.load_strategy != "full":
+            raise ValueError(f"❌ {self.asset_name}: les partitions par date remplacent le chargement complet")
+
+    def extract_kwargs(self) -> dict:
+        """Paramètres de extract_mssql_data pour cette table (hors logger / run_id)"""
+        kwargs = {
+            "mssql_table_name": self.source,
+            "snowflake_table_name": self.target,
+            "snowflake_schema": self.snowflake_schema,
+            "streaming": self.load_strategy == "streaming",
+            "change_tracking": self.load_strategy == "change_tracking",
+            "partition_column": self.partition_column,
+            "num_partitions": self.num_partitions,
+            "resume_key": self.resume_key,
+        }
+        if self.export_format:
+            kwargs["export_format"] = self.export_format
+        if self.load_strategy == "incremental":
+            kwargs["watermark_column"] = self.watermark_column
+            kwargs["merge_keys"] = list(self.merge_keys)
+        return kwargs
+
+    def dlt_column_hints(self) -> Dict[str, dict]:
+        """Hints de colonnes dlt (apply_hints) pour les colonnes décimales"""
+        return {
+            column: {"data_type": "decimal", "precision": precision, "scale": scale}
+            for column, (precision, scale) in self.decimal_hints.items()
+        }
+
+
+# Vues facture / devis / commande: chargement complet tant que la colonne date des
+# partitions mensuelles n'est pas vérifiée sur la vue (check_date_column: existe,
+# type date). Colonnes candidates: gfd_date_facture, date_devis, gcd_date_commande.
+# Une colonne fausse ferait échouer chaque tranche; une colonne de date secondaire
+# (date de saisie au lieu de la date métier) rechargerait les mauvais mois.
+
+# Montants des vues facture / tiers (mêmes colonnes gfd_*)
+_GFD_DECIMALS = {
+    "gfd_prix_unitaire_achat_euro": (38, 6),
+    "gfd_prix_unitaire_vente_euros": (38, 6),
+    "gfd_quantite": (38, 6),
+    "gfd_montant_achat_euros": (38, 6),
+    "gfd_montant_vente_euros": (38, 6),
+    "gfd_montant_vente_devise_locale": (38, 6),
+}
+
+
+TABLES: List[TableSpec] = [
+    TableSpec(
+        asset_name="v_Inventory_Parts_Ops",
+        source="V_Inventory_Parts_Ops",
+        target="AI_V_Inventory_Parts_Ops",
+        job_name="inventory_parts_ops_job",
+        description="Inventory Parts Ops from MSSQL → Snowflake via BCP + COPY INTO",
+        decimal_hints={
+            "Age_Stock": (38, 6),
+            "Qte_En_Stock": (38, 6),
+        },
+    ),
+    TableSpec(
+        asset_name="V_Equipment",
+        source="V_Equipment",
+        target="AI_V_Equipment",
+        job_name="equipment_dashboard_job",
+        description="Equipment from MSSQL → Snowflake via BCP + COPY INTO",
+        decimal_hints={
+            "Eqcat_Part_Sales_Previous_12m": (38, 6),
+            "Eqcat_Labor_Sales_Previous_12m": (38, 6),
+            "Eqcat_Total_Sales_Previous_12m": (38, 6),
+            "Eqcat_Part_Opportunity_Previous_12m": (38, 6),
+            "Eqcat_Labor_Opportunity_Previous_12m": (38, 6),
+            "Eqcat_Total_Opportunity_Previous_12m": (38, 6),
+            "Eqcat_Part_Opportunity_Future_12m": (38, 6),
+            "Eqcat_Labor_Opportunity_Future_12m": (38, 6),
+            "Eqcat_Total_Opportunity_Future_12m": (38, 6),
+            "Eqcat_Boost_Previous_12m": (38, 3),
+            "Eqcat_Base_Previous_12_m": (38, 6),
+            "Eqcat_Base_Future_12_m": (38, 6),
+            "Op_Cat_Labor_Hours": (38, 0),
+            "Op_Cat_Labor_Value": (38, 0),
+            "Op_Cat_Base": (38, 0),
+            "Op_Cat_Total_Value": (38, 0),
+            "Op_Cat_Confidence_Index_pctg": (38, 0),
+        },
+    ),
+    TableSpec(
+        asset_name="V_facture_dashboard_am",
+        source="V_facture_dashboard_am",
+        target="AI_V_facture_dashboard_am",
+        job_name="facture_dashboard_job",
+        description="Facture_dashboard_am from MSSQL → Snowflake via BCP + COPY INTO",
+        decimal_hints=_GFD_DECIMALS,
+    ),
+    TableSpec(
+        asset_name="V_tiers_dashboard_am",
+        source="V_tiers_dashboard_am",
+        target="AI_V_tiers_dashboard_am",
+        job_name="tiers_dashboard_job",
+        description="Tiers_dashboard_am from MSSQL → Snowflake via BCP + COPY INTO",
+        decimal_hints=_GFD_DECIMALS,
+    ),
+    TableSpec(
+        asset_name="GCM_Retour_Donnees_OLGA",
+        source="GCM_Retour_Donnees_OLGA",
+        target="AI_GCM_Retour_Donnees_OLGA",
+        job_name="gcm_retour_donnees_olga_job",
+        description="GCM_Retour_Donnees_OLGA from MSSQL → Snowflake via BCP + COPY INTO",
+    ),
+    TableSpec(
+        asset_name="V_LEAD_PSE_Facture_Comm_Devis",
+        source="V_LEAD_PSE_Facture_Comm_Devis",
+        target="V_LEAD_PSE_Facture_Comm_Devis",
+        job_name="v_lean_pse_facture_comm_devis_assets_job",
+        description="V_LEAD_PSE_Facture_Comm_Devis from MSSQL → Snowflake via BCP + COPY INTO",
+    ),
+    TableSpec(
+        asset_name="V_devis_dashboard_am",
+        source="V_devis_dashboard_am",
+        target="AI_V_devis_dashboard_am",
+        job_name="devis_dashboard_job",
+        description="Devis_dashboard_am from MSSQL → Snowflake via BCP + COPY INTO",
+        decimal_hints={
+            "quantite_devis": (38, 6),
+            "quantite_restante_a_facturer": (38, 6),
+            "montant_vente_euros": (38, 6),
+            "gcd_quantite_commande": (38, 6),
+            "gcd_montant_vente_euros": (38, 6),
+            "gfd_quantite_facture": (38, 6),
+            "gfd_montant_vente_euros": (38, 6),
+        },
+    ),
+    TableSpec(
+        asset_name="V_commande_dashboard_am",
+        source="V_commande_dashboard_am",
+        target="AI_V_commande_dashboard_am",
+        job_name="commande_dashboard_job",
+        description="Commande_dashboard_am from MSSQL → Snowflake via BCP + COPY INTO",
+    ),
+]
+
+
+def get_table_spec(asset_name: str) -> TableSpec:
+    """Entrée du registre d'un asset"""
+    for spec in TABLES:
+        if spec.asset_name == asset_name:
+            return spec
+    raise KeyError(f"❌ Table absente du registre: {asset_name}")
+
+
+def partitioned_tables() -> List[TableSpec]:
+    """Tables BCP partitionnées par date"""
+    return [spec for spec in bcp_tables() if spec.time_partition_column]
+
+
+def bcp_tables() -> List[TableSpec]:
+    """Tables chargées par un asset BCP + COPY INTO"""
+    return [spec for spec in TABLES if spec.loader == "bcp"]
+
+
+def full_load_tables() -> List[TableSpec]:
+    """
+    Tables BCP en chargement complet CSV simple (sans partition, reprise ni Parquet):
+    asset en deux étapes, export + PUT puis COPY INTO (build_full_load_asset)
+    """
+    return [
+        spec for spec in bcp_tables()
+        if spec.load_strategy == "full"
+        and not (spec.time_partition_column or spec.partition_column or spec.resume_key)
+        and (spec.export_format or Config.EXPORT_FORMAT) == "csv"
+    ]
@@ -7,45 +7,11 @@ import logging
 import unicodedata
 import re
 from typing import Dict, List, Tuple
+from mssql_data_nmbai.defs.config import get_mssql_engine
 
 
 logger = logging.getLogger(__name__)
 
-def get_mssql_engine():
-
-    driver   = os.getenv("MSSQL_DRIVER")
-    server   = os.getenv("MSSQL_SERVER")
-    port     = os.getenv("MSSQL_PORT")
-    database = os.getenv("MSSQL_DATABASE")
-    username = os.getenv("MSSQL_USER")
-    password = os.getenv("MSSQL_PASSWORD")
-
-    conn_str = (
-        f"DRIVER={driver};"
-        f"SERVER={server};"
-        f"DATABASE={database};"
-        f"UID={username};"
-        f"PWD={password};"
-        "Encrypt=yes;"
-        "TrustServerCertificate=yes;"
-        "Connection Timeout=60;"
-    )
-
-    conn_str_encoded = urllib.parse.quote_plus(conn_str)
-
-    engine = create_engine(
-        f"mssql+pyodbc:///?odbc_connect={conn_str_encoded}",
-        pool_pre_ping=True,
-        pool_recycle=1800,
-        pool_size=5,
-        max_overflow=10,
-        connect_args={"timeout": 60},
-        fast_executemany=True,
-    )
-
-    return engine
-
-
 ## Mapping Mssql to SNOWFLAKE ==========================
 
 def map_mssql_to_snowflake(
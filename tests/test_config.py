@@ -0,0 +1,234 @@
+import multiprocessing
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+
+from mssql_data_nmbai.defs import config
+from mssql_data_nmbai.defs.config import (
+    BCPExporter,
+    build_partition_conditions,
+    generate_snowflake_ddl,
+    get_run_table_suffix,
+    split_export_file,
+    watermark_literal,
+)
+
+
+##### DÉCOUPAGE DES EXPORTS CSV
+
+HEADER = b"id|label\n"
+
+
+@pytest.fixture
+def no_compression(monkeypatch):
+    """Ratio de compression 1: la cible compressée est la taille brute"""
+    monkeypatch.setattr(config, "estimate_compression_ratio", lambda path: 1.0)
+
+
+def _write_export(path, lines, header=HEADER):
+    body = b"".join(lines)
+    path.write_bytes(header + body)
+    return body
+
+
+def test_split_export_file_small_file_untouched(tmp_path, no_compression):
+    path = tmp_path / "export.csv"
+    _write_export(path, [b"1|a\n", b"2|b\n"])
+
+    assert split_export_file(path, target_mb=1, skip_header=1) == [path]
+    assert path.exists()
+
+
+def test_split_export_file_repeats_header_and_cuts_on_lines(tmp_path, no_compression):
+    path = tmp_path / "export.csv"
+    body = _write_export(path, [f"{i}|label_{i:05d}\n".encode() for i in range(2000)])
+    target_mb = 4096 / (1024 * 1024)
+
+    pieces = split_export_file(path, target_mb=target_mb, skip_header=1)
+
+    assert len(pieces) > 1
+    assert not path.exists()
+    contents = [piece.read_bytes() for piece in pieces]
+    for content in contents:
+        assert content.startswith(HEADER)
+        assert content.endswith(b"\n")
+        assert len(content) <= 4096 + len(HEADER)
+    # Aucune ligne perdue, coupée ou dupliquée
+    assert b"".join(content[len(HEADER):] for content in contents) == body
+
+
+def test_split_export_file_keeps_long_line_whole(tmp_path, no_compression):
+    path = tmp_path / "export.csv"
+    long_line = b"1|" + b"x" * 10_000 + b"\n"
+    body = _write_export(path, [b"0|a\n", long_line, b"2|b\n"], header=b"")
+
+    pieces = split_export_file(path, target_mb=1024 / (1024 * 1024), skip_header=0)
+
+    contents = [piece.read_bytes() for piece in pieces]
+    assert long_line in contents
+    assert b"".join(contents) == body
+
+
+##### PARTITIONS
+
+def test_build_partition_conditions_hash():
+    assert build_partition_conditions("dbo.T", "Id", 3, "hash") == [
+        f"ABS(CAST(CHECKSUM([Id]) AS BIGINT)) % 3 = {i}" for i in range(3)
+    ]
+
+
+class FakeEngine:
+    """Engine dont la requête MIN / MAX rend des valeurs fixes"""
+
+    def __init__(self, min_value, max_value):
+        self.bounds = (min_value, max_value)
+        self.queries = []
+
+    @contextmanager
+    def connect(self):
+        engine = self
+
+        class Result:
+            def one(self):
+                return engine.bounds
+
+        class Connection:
+            def execute(self, query):
+                engine.queries.append(str(query))
+                return Result()
+
+        yield Connection()
+
+
+@pytest.fixture
+def sample_table():
+    """Valeurs 0..100 et deux NULL, pour évaluer les conditions (SQLite accepte les [crochets])"""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (Id INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(101)] + [(None,), (None,)])
+    yield conn
+    conn.close()
+
+
+def test_build_partition_conditions_range_covers_each_row_once(monkeypatch, sample_table):
+    engine = FakeEngine(0, 100)
+    monkeypatch.setattr(config, "get_mssql_engine", lambda *args: engine)
+
+    conditions = build_partition_conditions("dbo.T", "Id", 4, "range", where="[Actif] = 1")
+
+    assert "WHERE ([Actif] = 1)" in engine.queries[0]
+    assert len(conditions) == 4
+    counts = [
+        sample_table.execute(f"SELECT COUNT(*) FROM t WHERE {condition}").fetchone()[0]
+        for condition in conditions
+    ]
+    assert sum(counts) == 103
+    # NULL rattachés à la première tranche, dernière tranche sans borne haute (MAX compris)
+    assert "IS NULL" in conditions[0]
+    assert counts[0] == 25 + 2
+    assert "<" not in conditions[-1]
+
+
+def test_build_partition_conditions_range_empty_table(monkeypatch):
+    monkeypatch.setattr(config, "get_mssql_engine", lambda *args: FakeEngine(None, None))
+
+    assert build_partition_conditions("dbo.T", "Id", 4, "range") == ["1 = 1"]
+
+
+def test_build_partition_conditions_unknown_strategy():
+    with pytest.raises(ValueError):
+        build_partition_conditions("dbo.T", "Id", 4, "modulo")
+
+
+def test_build_partition_conditions_range_rejects_dates(monkeypatch):
+    engine = FakeEngine(datetime(2024, 1, 1), datetime(2024, 12, 31))
+    monkeypatch.setattr(config, "get_mssql_engine", lambda *args: engine)
+
+    with pytest.raises(ValueError, match="numérique"):
+        build_partition_conditions("dbo.T", "DateCreation", 4, "range")
+
+
+##### EXPORT PARTITIONNÉ
+
+def test_export_partitioned_kills_running_bcp_on_failure(tmp_path, monkeypatch):
+    exporter = BCPExporter("server", "db", "user", "password", stall_timeout=0)
+    commands = iter([
+        [sys.executable, "-c", "import sys; sys.exit(1)"],
+        [sys.executable, "-c", "import time; time.sleep(60)"],
+    ])
+    monkeypatch.setattr(exporter, "_build_command", lambda *args: next(commands))
+
+    start = time.time()
+    with pytest.raises(Exception):
+        exporter.export_partitioned("dbo.T", tmp_path / "export.csv", "Id", num_partitions=2, max_parallel=2)
+
+    # Le bcp encore en cours est tué, pas attendu jusqu'à sa fin
+    assert time.time() - start < 20
+
+
+##### WATERMARKS
+
+def test_watermark_literal_number():
+    assert watermark_literal("12345", "number") == "12345"
+
+
+def test_watermark_literal_timestamp_default_datetime2():
+    assert watermark_literal("2024-01-31 23:59:59.123456", "timestamp") == (
+        "CAST('2024-01-31 23:59:59.123456' AS DATETIME2(7))"
+    )
+
+
+def test_watermark_literal_timestamp_in_column_type():
+    # Colonne DATETIME: comparée dans son type, la valeur .123 persistée retombe sur le même tic de 1/300 s
+    assert watermark_literal("2024-01-31 23:59:59.123000", "timestamp", "datetime") == (
+        "CAST(CAST('2024-01-31 23:59:59.123000' AS DATETIME2(7)) AS DATETIME)"
+    )
+    assert watermark_literal("2024-01-31 23:59:59", "timestamp", "DATETIME2(7)") == (
+        "CAST('2024-01-31 23:59:59' AS DATETIME2(7))"
+    )
+
+
+def test_watermark_literal_string_escapes_quotes():
+    assert watermark_literal("O'Brien", "string") == "'O''Brien'"
+
+
+def test_get_run_table_suffix():
+    assert get_run_table_suffix(None) == ""
+    assert get_run_table_suffix("01139b63-a8ed-4e16") == "_01139b63_a8ed_4e16"
+
+
+##### CACHE DES SCHÉMAS
+
+def _update_cache_entries(worker: int, count: int):
+    for i in range(count):
+        config.update_schema_cache("tables", f"T{worker}_{i}", {"fingerprint": str(i), "columns": []})
+
+
+def test_update_schema_cache_across_processes(tmp_path, monkeypatch):
+    monkeypatch.setattr(config.Config, "SCHEMA_CACHE_PATH", tmp_path / "schema_cache.json")
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_update_cache_entries, args=(worker, 25)) for worker in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    # Aucune mise à jour perdue entre les process
+    assert len(config.load_schema_cache()["tables"]) == 4 * 25
+
+
+##### DDL SNOWFLAKE
+
+def test_generate_snowflake_ddl_if_not_exists(monkeypatch):
+    monkeypatch.setattr(config, "extract_mssql_table_schema", lambda table: [("Id", "NUMBER(38,0)")])
+
+    assert generate_snowflake_ddl("V_T", "AI_V_T").startswith("CREATE OR REPLACE TABLE NEEMBA.EQUIPEMENT.AI_V_T (")
+    # Cible des partitions: jamais remplacée par une run concurrente
+    assert generate_snowflake_ddl("V_T", "AI_V_T", if_not_exists=True).startswith(
+        "CREATE TABLE IF NOT EXISTS NEEMBA.EQUIPEMENT.AI_V_T ("
+    )
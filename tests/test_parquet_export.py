@@ -0,0 +1,143 @@
+import struct
+import uuid
+from datetime import date, datetime, time
+from decimal import Decimal
+
+import pytest
+
+from mssql_data_nmbai.defs.parquet_export import (
+    NativeFileReader,
+    iter_bcp_native_rows,
+    native_decoder,
+)
+
+
+##### DÉCODEURS DES VALEURS NATIVES
+
+def test_native_decoder_integers():
+    assert native_decoder("SQLINT", 0)((42).to_bytes(4, "little", signed=True)) == 42
+    assert native_decoder("SQLBIGINT", 0)((-7).to_bytes(8, "little", signed=True)) == -7
+    assert native_decoder("SQLSMALLINT", 0)(b"\xff\xff") == -1
+    assert native_decoder("SQLTINYINT", 0)(b"\xff") == 255
+
+
+def test_native_decoder_bit():
+    decode = native_decoder("SQLBIT", 0)
+    assert decode(b"\x01") is True
+    assert decode(b"\x00") is False
+
+
+def test_native_decoder_floats():
+    assert native_decoder("SQLFLT8", 0)(struct.pack("<d", 1.25)) == 1.25
+    assert native_decoder("SQLFLT4", 0)(struct.pack("<f", -0.5)) == -0.5
+
+
+def test_native_decoder_decimal_sign_and_scale():
+    decode = native_decoder("SQLDECIMAL", 2)
+    mantissa = (12345).to_bytes(16, "little")
+    assert decode(bytes([38, 2, 1]) + mantissa) == Decimal("123.45")
+    assert decode(bytes([38, 2, 0]) + mantissa) == Decimal("-123.45")
+
+
+def test_native_decoder_money():
+    # -1.2345 = -12345 dix-millièmes: partie haute signée puis partie basse
+    value = -12345
+    data = struct.pack("<iI", value >> 32, value & 0xFFFFFFFF)
+    assert native_decoder("SQLMONEY", 0)(data) == Decimal("-1.2345")
+    assert native_decoder("SQLMONEY4", 0)((15000).to_bytes(4, "little", signed=True)) == Decimal("1.5")
+
+
+def test_native_decoder_datetime():
+    # 1 jour après 1900-01-01 puis 300 tics de 1/300 s
+    assert native_decoder("SQLDATETIME", 0)(struct.pack("<iI", 1, 300)) == datetime(1900, 1, 2, 0, 0, 1)
+    assert native_decoder("SQLDATETIM4", 0)(struct.pack("<HH", 2, 90)) == datetime(1900, 1, 3, 1, 30)
+
+
+def test_native_decoder_date_time_datetime2():
+    days = (date(2024, 1, 2) - date(1, 1, 1)).days
+    units = (12 * 3600 * 10 + 5) * 1_000_000  # 12:00:00.5 en unités de 10^-7 s
+    assert native_decoder("SQLDATE", 0)(days.to_bytes(3, "little")) == date(2024, 1, 2)
+    assert native_decoder("SQLTIME", 7)(units.to_bytes(5, "little")) == time(12, 0, 0, 500_000)
+    assert native_decoder("SQLDATETIME2", 7)(
+        units.to_bytes(5, "little") + days.to_bytes(3, "little")
+    ) == datetime(2024, 1, 2, 12, 0, 0, 500_000)
+
+
+def test_native_decoder_text():
+    assert native_decoder("SQLNCHAR", 0)("héllo €".encode("utf-16-le")) == "héllo €"
+    assert native_decoder("SQLCHAR", 0)("abc".encode("utf-8")) == "abc"
+
+
+def test_native_decoder_uniqueidentifier():
+    value = uuid.UUID("6F9619FF-8B86-D011-B42D-00C04FC964FF")
+    assert native_decoder("SQLUNIQUEID", 0)(value.bytes_le) == "6F9619FF-8B86-D011-B42D-00C04FC964FF"
+
+
+def test_native_decoder_unsupported_type():
+    with pytest.raises(ValueError):
+        native_decoder("SQLVARIANT", 0)
+
+
+##### LECTURE DU FICHIER NATIF
+
+FIELDS = [
+    # (nom, type bcp, longueur du préfixe, longueur fixe, échelle)
+    ("id", "SQLINT", 0, 4, 0),
+    ("amount", "SQLDECIMAL", 1, 19, 2),
+    ("label", "SQLNCHAR", 2, 0, 0),
+]
+
+
+def _row(row_id, amount, label) -> bytes:
+    data = row_id.to_bytes(4, "little", signed=True)
+    if amount is None:
+        data += b"\xff"
+    else:
+        data += bytes([19, 38, 2, 1]) + amount.to_bytes(16, "little")
+    if label is None:
+        data += b"\xff\xff"
+    else:
+        encoded = label.encode("utf-16-le")
+        data += len(encoded).to_bytes(2, "little") + encoded
+    return data
+
+
+def test_iter_bcp_native_rows_null_prefixes(tmp_path):
+    data_path = tmp_path / "export.dat"
+    data_path.write_bytes(_row(1, 150, "a") + _row(2, None, None) + _row(3, 5, ""))
+
+    assert list(iter_bcp_native_rows(data_path, FIELDS)) == [
+        [1, Decimal("1.50"), "a"],
+        [2, None, None],
+        [3, Decimal("0.05"), ""],
+    ]
+
+
+def test_iter_bcp_native_rows_empty_file(tmp_path):
+    data_path = tmp_path / "export.dat"
+    data_path.write_bytes(b"")
+
+    assert list(iter_bcp_native_rows(data_path, FIELDS)) == []
+
+
+def test_native_file_reader_value_across_buffers(tmp_path):
+    data_path = tmp_path / "export.dat"
+    data_path.write_bytes(b"abcdefgh")
+
+    reader = NativeFileReader(data_path, buffer_size=3)
+    try:
+        assert not reader.at_end()
+        assert reader.take(2) == b"ab"
+        assert reader.take(5) == b"cdefg"
+        assert reader.take(1) == b"h"
+        assert reader.at_end()
+    finally:
+        reader.close()
+
+
+def test_native_file_reader_truncated(tmp_path):
+    data_path = tmp_path / "export.dat"
+    data_path.write_bytes(_row(1, 150, "abc")[:-1])
+
+    with pytest.raises(EOFError):
+        list(iter_bcp_native_rows(data_path, FIELDS))
@@ -0,0 +1,138 @@
+import enum
+import logging
+import threading
+import time
+
+import pytest
+
+from mssql_data_nmbai.defs.snowflake_dest import StagedChunkLoader
+
+logger = logging.getLogger(__name__)
+
+
+##### CONNEXION SNOWFLAKE SIMULÉE
+
+class Status(enum.Enum):
+    RUNNING = 1
+    SUCCESS = 2
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.sfqid = None
+        self.description = None
+        self._rows = []
+
+    def execute(self, sql):
+        self.conn.put_allowed.wait(timeout=10)
+        name = sql.split("file://")[1].split()[0].rsplit("/", 1)[-1]
+        self.conn.statements.append(("PUT", name))
+        self._rows = [(name, f"{name}.gz")]
+
+    def fetchone(self):
+        return self._rows[0]
+
+    def execute_async(self, sql):
+        files = sql.split("FILES = (")[1].split(")")[0] if "FILES = (" in sql else ""
+        self.sfqid = f"q{len(self.conn.copies)}"
+        self.conn.copies[self.sfqid] = files
+        self.conn.statements.append(("COPY", files))
+
+    def get_results_from_sfqid(self, query_id):
+        self.description = [("file",), ("status",), ("rows_loaded",), ("errors_seen",)]
+        self._rows = [("chunk", "LOADED", 10, 0)]
+
+    def fetchall(self):
+        return self._rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.statements = []
+        self.copies = {}
+        self.put_allowed = threading.Event()
+        self.put_allowed.set()
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_query_status(self, query_id):
+        return Status.SUCCESS
+
+    def is_still_running(self, status):
+        return status == Status.RUNNING
+
+    def get_query_status_throw_if_error(self, query_id):
+        return Status.SUCCESS
+
+
+def _chunks(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"chunk_{i:04d}.csv"
+        path.write_text("1|a\n")
+        paths.append(path)
+    return paths
+
+
+##### CHARGEMENT EN FLUX
+
+def test_staged_chunk_loader_copies_each_batch_of_files(tmp_path):
+    conn = FakeConnection()
+    loader = StagedChunkLoader(conn, "T", logger=logger, copy_every=2, stage_path="STG/run").start()
+    loader.monitor.poll_interval = 0
+
+    for path in _chunks(tmp_path, 5):
+        loader.submit(path)
+    result = loader.close()
+
+    assert result["nb_files"] == 5
+    assert result["rows_loaded"] == 10 * 3
+    # Chaque COPY ne charge que les fichiers uploadés depuis le précédent
+    assert sorted(conn.copies.values()) == [
+        "'chunk_0000.csv.gz', 'chunk_0001.csv.gz'",
+        "'chunk_0002.csv.gz', 'chunk_0003.csv.gz'",
+        "'chunk_0004.csv.gz'",
+    ]
+    assert not any(path.exists() for path in tmp_path.iterdir())
+
+
+def test_staged_chunk_loader_blocks_export_when_queue_full(tmp_path):
+    conn = FakeConnection()
+    conn.put_allowed.clear()
+    loader = StagedChunkLoader(conn, "T", logger=logger, copy_every=10, max_pending=2).start()
+    loader.monitor.poll_interval = 0
+    paths = _chunks(tmp_path, 6)
+    submitted = []
+
+    def export():
+        for path in paths:
+            loader.submit(path)
+            submitted.append(path)
+
+    exporter = threading.Thread(target=export)
+    exporter.start()
+    time.sleep(0.5)
+    # Un chunk en cours de PUT + 2 en file: l'export attend
+    assert len(submitted) <= 3
+    conn.put_allowed.set()
+    exporter.join(timeout=10)
+    assert len(submitted) == 6
+    assert loader.close()["nb_files"] == 6
+
+
+def test_staged_chunk_loader_submit_fails_after_upload_error(tmp_path):
+    conn = FakeConnection()
+    loader = StagedChunkLoader(conn, "T", logger=logger, max_pending=1).start()
+    missing = tmp_path / "missing.csv"
+
+    loader.submit(missing)
+    with pytest.raises(RuntimeError, match="Upload en échec"):
+        for path in _chunks(tmp_path, 5):
+            loader.submit(path)
+    with pytest.raises(FileNotFoundError):
+        loader.close()